@@ -1,4 +1,44 @@
 from enum import Enum  # Import Enum to create enumerators
+import json
+import threading
+from array import array
+from functools import lru_cache
+from operator import attrgetter
+from types import MappingProxyType
+from collections import Counter
+from itertools import chain, repeat
+from decimal import Decimal, ROUND_HALF_UP
+
+
+# every price is kept as integer cents; dollars only appear at the edges
+# (receipts, printing and the float accessors kept for compatibility).
+TAX_BASIS_POINTS = 725  # 7.25% sales tax, in hundredths of a percent.
+
+
+def to_cents(dollars):
+    """converts a dollar amount (int, float, str or Decimal) into integer cents, rounding half up."""
+    return int((Decimal(str(dollars)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_dollars(cents):
+    """converts integer cents into a dollar amount for display."""
+    return cents / 100
+
+
+def format_cents(cents):
+    """formats integer cents as a dollar string, such as $1,234.05."""
+    sign = "-" if cents < 0 else ""
+    dollars, cents = divmod(abs(cents), 100)
+    return f"{sign}${dollars:,}.{cents:02d}"
+
+
+def tax_cents(subtotal_cents):
+    """returns the tax owed on a subtotal in cents.
+
+    tax is charged once on the order subtotal, never per item, and rounded
+    half up to the nearest cent: 7.25% of 30 cents is 2.175 cents, billed as 2.
+    """
+    return (subtotal_cents * TAX_BASIS_POINTS + 5000) // 10000
 
 
 # defines enumerators for drink sizes.
@@ -26,30 +66,297 @@ class Flavor(Enum):
     BLUEBERRY = "blueberry"
     LIME = "lime"
 
-class Drink:
+class BitSet:
+    """A set of menu options stored as one integer bitmask.
+
+    Each option is numbered by its position (ordinal) in a fixed tuple, and
+    BitSet.over() makes a subclass for one such tuple, so an instance only
+    carries its mask. Union, membership and counting are integer operations.
+    """
+
+    __slots__ = ("_mask",)
+
+    _members = ()
+    _ordinals = {}
+
+    @classmethod
+    def over(cls, name, members):
+        """returns a BitSet subclass over the given options, in ordinal order."""
+        members = tuple(members)
+        ordinals = {member: ordinal for ordinal, member in enumerate(members)}
+        return type(name, (cls,), {"__slots__": (), "_members": members, "_ordinals": ordinals})
+
+    @classmethod
+    def from_mask(cls, mask):
+        """returns a set with the given bitmask."""
+        if mask >> len(cls._members):
+            raise ValueError(f"Mask {mask:#x} has bits outside {cls.__name__}.")
+        bits = cls.__new__(cls)
+        bits._mask = mask
+        return bits
+
+    @classmethod
+    def bit(cls, member):
+        """returns the single-bit mask of an option."""
+        return 1 << cls._ordinals[member]
+
+    @classmethod
+    def price_table(cls, prices):
+        """returns a list giving the summed price of every mask.
+
+        prices maps each option on sale to its price; entry m of the result
+        is the total of the options in mask m, so pricing a set is one
+        lookup, or None if mask m holds an option prices lacks.
+        """
+        table = [0] * (1 << len(cls._members))
+        for mask in range(1, len(table)):
+            low = mask & -mask
+            rest = table[mask ^ low]
+            price = prices.get(cls._members[low.bit_length() - 1])
+            table[mask] = None if rest is None or price is None else rest + price
+        return table
+
+    def __init__(self, members=()):
+        mask = 0
+        ordinals = self._ordinals
+        for member in members:
+            mask |= 1 << ordinals[member]
+        self._mask = mask
+
+    @property
+    def mask(self):
+        """the bitmask of the options in the set."""
+        return self._mask
+
+    def add(self, member):
+        self._mask |= 1 << self._ordinals[member]
+
+    def discard(self, member):
+        ordinal = self._ordinals.get(member)
+        if ordinal is not None:
+            self._mask &= ~(1 << ordinal)
+
+    def copy(self):
+        return self.from_mask(self._mask)
+
+    def __contains__(self, member):
+        ordinal = self._ordinals.get(member)
+        return ordinal is not None and (self._mask >> ordinal) & 1 == 1
+
+    def __len__(self):
+        return self._mask.bit_count()
+
+    def __iter__(self):
+        members = self._members
+        mask = self._mask
+        while mask:
+            low = mask & -mask
+            yield members[low.bit_length() - 1]
+            mask ^= low
+
+    def __or__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.from_mask(self._mask | other._mask)
+
+    def __and__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.from_mask(self._mask & other._mask)
+
+    def __sub__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.from_mask(self._mask & ~other._mask)
+
+    def union(self, *others):
+        mask = self._mask
+        for other in others:
+            mask |= other._mask if type(other) is type(self) else type(self)(other)._mask
+        return self.from_mask(mask)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._mask == other._mask
+
+    # the set is mutable, so like set it is unhashable; hash .mask instead.
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self)!r})"
+
+# the flavor bits of a drink, ordered as Flavor is declared.
+FlavorSet = BitSet.over("FlavorSet", Flavor)
+
+# a drink configuration packs into one small integer, its price key:
+# base ordinal, then size ordinal, then the flavor mask in the low bits.
+# the *_BITS widths are public, for code indexing a Menu's price tables.
+_BASES = tuple(Base)
+_SIZES = tuple(Size)
+_BASE_ORDINALS = {base: ordinal for ordinal, base in enumerate(_BASES)}
+_SIZE_ORDINALS = {size: ordinal for ordinal, size in enumerate(_SIZES)}
+SIZE_BITS = (len(Size) - 1).bit_length()
+FLAVOR_BITS = len(Flavor)
+
+
+def _drink_row(base, size):
+    """returns the price key of a drink with no flavors."""
+    return ((_BASE_ORDINALS[base] << SIZE_BITS) | _SIZE_ORDINALS[size]) << FLAVOR_BITS
+
+# a SKU packs any orderable configuration into one unsigned 32-bit integer:
+#   bits 28-31  item kind, one of the SKU_* constants
+#   bits 20-27  base, food type or ice storm flavor ordinal
+#   bits 16-19  size ordinal, drinks only
+#   bits  0-15  flavor or topping mask
+SKU_DRINK = 1
+SKU_FOOD = 2
+SKU_ICE_STORM = 3
+_SKU_KIND_SHIFT = 28
+_SKU_VARIANT_SHIFT = 20
+_SKU_SIZE_SHIFT = 16
+_SKU_OPTIONS = 0xFFFF
+
+
+def _pack_sku(kind, variant, size, mask):
+    """returns the SKU of a configuration given as ordinals and an option mask."""
+    return (kind << _SKU_KIND_SHIFT) | (variant << _SKU_VARIANT_SHIFT) | (size << _SKU_SIZE_SHIFT) | mask
+
+class MenuItem:
+    """Base for everything an Order can hold.
+
+    A new menu category subclasses MenuItem, sets _kind, implements
+    get_total_cents, get_customizations and get_sku, and registers a receipt
+    line serializer with register_line_serializer; Order needs no change.
+    """
+
+    __slots__ = ()
+
+    _kind = None  # name of the menu category, such as "drink"
+
+    def get_kind(self):
+        """returns the menu category of the item."""
+        return self._kind
+
+    def get_total_cents(self):
+        """returns the price of the item in cents."""
+        raise NotImplementedError
+
+    def get_total(self):
+        """returns the price of the item in dollars."""
+        return to_dollars(self.get_total_cents())
+
+    def get_customizations(self):
+        """returns the names of the flavors or toppings chosen for the item."""
+        raise NotImplementedError
+
+    def get_sku(self):
+        """returns the item's configuration as a 32-bit SKU."""
+        raise NotImplementedError
+
+    def get_spec(self):
+        """returns the item's immutable configuration; items that never change are their own."""
+        return self
+
+    def _price_in(self, menu):
+        """returns the item's price in cents on a Menu, None if the menu does not sell it.
+
+        categories the Menu does not price keep their own price.
+        """
+        return self.get_total_cents()
+
+    # items that never change leave their orders nothing to watch.
+    def _watch(self, order):
+        pass
+
+    def _unwatch(self, order):
+        pass
+
+class _Watched(MenuItem):
+    """mixin for menu items that tell the orders holding them when they change.
+
+    _watchers is a tuple: items sit in one order at a time almost always, and
+    a one-element tuple is smaller than a list; the empty tuple is shared.
+    """
+
+    __slots__ = ()
+
+    def _watch(self, order):
+        """registers an order to be told about changes to this item."""
+        self._watchers += (order,)
+
+    def _unwatch(self, order):
+        """stops telling an order about changes to this item."""
+        watchers = list(self._watchers)
+        watchers.remove(order)
+        self._watchers = tuple(watchers)
+
+    def _changed(self):
+        """tells every watching order that this item changed."""
+        for order in self._watchers:
+            order._item_changed(self)
+
+    def _check_options(self, mask):
+        """raises ValueError unless every order holding the item sells it with the options of mask.
+
+        an order prices its lines with its own menu, such as a store's,
+        which may have withdrawn an option the item's menu still sells.
+        """
+        key = self._row | mask
+        for order in self._watchers:
+            menu = order._menu
+            if self._table(menu)[key] is None:
+                raise ValueError(f"That {self._kind} is not on menu version {menu._version}.")
+
+    def _check_spec(self, spec):
+        """raises ValueError unless every order holding the item sells it configured as spec."""
+        self._check_options(spec._price_key ^ self._row)
+
+class Drink(_Watched):
     """Represents a drink with a base, size, and flavors."""
+
+    __slots__ = ("_base", "_size", "_flavors", "_row", "_menu", "_watchers")
+
+    _kind = "drink"
     
     # list of valid bases and flavors for the drinks.
     _valid_bases = {base for base in Base}  
     _valid_flavors = {flavor for flavor in Flavor}
+    # prices in cents on the built-in menu; the Menu being served has the live ones.
     _size_costs = {
-        Size.SMALL: 1.50,
-        Size.MEDIUM: 1.75,
-        Size.LARGE: 2.05,
-        Size.MEGA: 2.15
+        Size.SMALL: 150,
+        Size.MEDIUM: 175,
+        Size.LARGE: 205,
+        Size.MEGA: 215
     }
+    _flavor_cost = 15
 
-    def __init__(self, base: Base, size: Size):
-        """Initializes a drink with a base and size, and an empty set of flavors."""
+    _table = attrgetter("_drinks")  # the Menu's price table for drinks
+
+    def __init__(self, base: Base, size: Size, menu=None):
+        """Initializes a drink with a base and size, and an empty set of flavors.
+
+        the drink is priced with menu, by default the Menu being served.
+        """
+        menu = _current_menu if menu is None else menu
+        row = _drink_row(base, size)
+        if menu._drinks[row] is None:
+            raise ValueError(f"{size.value} {base.value} is not on the menu.")
         self._base = base  # sets a base for the drink.
         self._size = size  # sets a size for the drink.
-        self._flavors = set()  # initializes an empty set for flavors.
-        self._cost = self._size_costs[size]  # sets the initial cost based on size.
+        self._flavors = FlavorSet()  # initializes an empty set for flavors.
+        self._row = row  # price key without the flavor bits.
+        self._menu = menu  # the menu the drink is priced with.
+        self._watchers = ()  # orders holding this drink.
 
     def get_base(self):
         """returns the base of the drink."""
         return self._base
 
+    def get_size(self):
+        """returns the size of the drink."""
+        return self._size
+
     def get_flavors(self):
         """returns a list of flavors added to the drink."""
         return list(self._flavors)
@@ -58,16 +365,63 @@ class Drink:
         """returns the number of different flavors added to the drink."""
         return len(self._flavors)
 
+    def get_customizations(self):
+        """returns the names of the flavors added to the drink."""
+        return [flavor.value for flavor in self._flavors]
+
     def get_total(self):
-        """returns the total cost of the drink."""
-        return self._cost
+        """returns the total cost of the drink in dollars."""
+        return to_dollars(self.get_total_cents())
+
+    def get_total_cents(self):
+        """returns the total cost of the drink in cents."""
+        return self._menu._drinks[self._row | self._flavors.mask]
+
+    def _price_in(self, menu):
+        return menu._drinks[self._row | self._flavors.mask]
+
+    def get_menu_version(self):
+        """returns the version of the menu the drink is priced with."""
+        return self._menu._version
+
+    def get_price_key(self):
+        """returns the packed (base, size, flavors) key of the drink's price."""
+        return self._row | self._flavors.mask
+
+    def get_sku(self):
+        """returns the drink's configuration as a 32-bit SKU."""
+        return _pack_sku(SKU_DRINK, _BASE_ORDINALS[self._base], _SIZE_ORDINALS[self._size],
+                         self._flavors.mask)
+
+    @classmethod
+    def total_cents_for(cls, price_keys):
+        """returns the summed price in cents of many drinks given by price key, on the current menu."""
+        return sum(map(_current_menu._drinks.__getitem__, price_keys))
+
+    @classmethod
+    def set_prices(cls, size_costs=None, flavor_cost=None):
+        """publishes a new menu version with changed drink prices in cents.
+
+        specs and drinks made from now on get the new prices; drinks already
+        made and orders already open keep the menu they were priced with.
+        """
+        menu = _current_menu
+        changes = {}
+        if size_costs is not None:
+            changes["size_costs"] = {**menu._size_costs, **size_costs}
+        if flavor_cost is not None:
+            changes["flavor_cost"] = flavor_cost
+        publish_menu(menu.revise(**changes))
 
     def add_flavor(self, flavor: Flavor):
         """adds a flavor to the drink if it's valid and not already added."""
         if flavor in self._valid_flavors:  # checks if the flavor is valid.
+            if flavor not in self._menu._flavors:
+                raise ValueError(f"{flavor.value} is not on the menu.")
             if flavor not in self._flavors:  # checks if the flavor is already added.
-                self._cost += 0.15  # increases the cost for each new flavor.
-            self._flavors.add(flavor)  # adds the flavor to the set
+                self._check_options(self._flavors.mask | FlavorSet.bit(flavor))
+                self._flavors.add(flavor)  # adds the flavor to the set
+                self._changed()
         else:
             raise ValueError(f"Pick a proper flavor from {self._valid_flavors}.")
 
@@ -76,43 +430,86 @@ class Drink:
         for flavor in flavors:  # iterates through the provided flavors.
             if flavor not in self._valid_flavors:  
                 raise ValueError(f"Pick a proper flavor from {self._valid_flavors}.")
-        self._flavors = set(flavors)  # updates the flavors set with the new valid flavors.
+            if flavor not in self._menu._flavors:
+                raise ValueError(f"{flavor.value} is not on the menu.")
+        flavors = FlavorSet(flavors)
+        self._check_options(flavors.mask)
+        self._flavors = flavors  # updates the flavors set with the new valid flavors.
+        self._changed()
+
+    def begin_edit(self):
+        """starts a DrinkEdit that stages flavor changes and applies them together."""
+        return DrinkEdit(self)
+
+    @classmethod
+    def from_specs(cls, specs, menu=None):
+        """builds many drinks at once, priced with menu, by default the Menu being served.
+
+        each spec is a DrinkSpec or a (base, size) or (base, size, flavors)
+        tuple. all of them are validated before any drink is built, so a bad
+        spec raises ValueError and builds nothing.
+        """
+        return [spec.make(menu) for spec in DrinkSpec._coerce_all(specs)]
 
-class Food:
-    # defines food.
+    def get_spec(self):
+        """returns the shared, immutable DrinkSpec for the drink as it is now."""
+        return DrinkSpec._intern(self._base, self._size, self._flavors.mask)
+
+    def _restore(self, spec):
+        """puts the drink's flavors back to those of a DrinkSpec, for Order.undo."""
+        self._flavors = FlavorSet.from_mask(spec._flavor_mask)
+        self._changed()
+
+class Food(_Watched):
+    __slots__ = ("_type", "_toppings", "_row", "_menu", "_watchers")
+
+    _kind = "food"
+
+    # defines food, prices in cents on the built-in menu.
     _food_price = {
-        "hotdog": 2.30,
-        "corndog": 2.00,
-        "ice_cream": 3.00,
-        "onion_rings": 1.75,
-        "french_fries": 1.50,
-        "tater_tots": 1.70,
-        "nacho_chips": 1.90
+        "hotdog": 230,
+        "corndog": 200,
+        "ice_cream": 300,
+        "onion_rings": 175,
+        "french_fries": 150,
+        "tater_tots": 170,
+        "nacho_chips": 190
     }
     
-    # defines toppings.
+    # defines toppings, prices in cents.
     _topping_price = {
-        "cherry": 0.00,
-        "whipped_cream": 0.00,
-        "caramel_sauce": 0.50,
-        "chocolate_sauce": 0.50,
-        "nacho_cheese": 0.30,
-        "chili": 0.60,
-        "bacon_bits": 0.30,
-        "ketchup": 0.00,
-        "mustard": 0.00
+        "cherry": 0,
+        "whipped_cream": 0,
+        "caramel_sauce": 50,
+        "chocolate_sauce": 50,
+        "nacho_cheese": 30,
+        "chili": 60,
+        "bacon_bits": 30,
+        "ketchup": 0,
+        "mustard": 0
     }
+    _ToppingSet = BitSet.over("FoodToppingSet", _topping_price)
+    _food_types = tuple(_food_price)  # SKU ordinal -> food type
+    _food_ordinals = {food_type: ordinal for ordinal, food_type in enumerate(_food_price)}
     
-    def __init__(self, food_type):
+    _table = attrgetter("_foods")  # the Menu's price table for food
+
+    # the food is priced with menu, by default the Menu being served.
+    def __init__(self, food_type, menu=None):
         if food_type.lower() not in self._food_price:
             raise ValueError(f"Invalid food type.")
+        menu = _current_menu if menu is None else menu
+        if food_type.lower() not in menu._food_prices:
+            raise ValueError(f"{food_type.lower()} is not on the menu.")
         self._type = food_type.lower()  # Corrected line
-        self._toppings = set()
-        self._base_price = self._food_price[self._type]
+        self._toppings = self._ToppingSet()
+        self._row = _food_row(self._type)  # price key without the topping bits
+        self._menu = menu  # the menu the food is priced with
+        self._watchers = ()  # orders holding this food.
     
     # Accessor for the base price
     def get_base_price(self):
-        return self._base_price
+        return to_dollars(self._menu._food_prices[self._type])
     
     # Accessor for food type.
     def get_type(self):
@@ -120,43 +517,129 @@ class Food:
     
     # adds toppings.
     def add_topping(self, topping):
-        if topping.lower() not in self._topping_price:
+        topping = topping.lower()
+        if topping not in self._topping_price:
             raise ValueError(f"Invalid topping")
-        self._toppings.add(topping.lower())
+        if not self._topping_on_menu(topping):
+            raise ValueError(f"{topping} is not on the menu.")
+        if topping not in self._toppings:
+            self._check_options(self._toppings.mask | self._ToppingSet.bit(topping))
+            self._toppings.add(topping)
+            self._changed()
     
     # counts the number of toppings.   
     def get_num_toppings(self):
         return len(self._toppings)  # Return the count of toppings
+
+    # the toppings added, in menu order.
+    def get_toppings(self):
+        return list(self._toppings)
+
+    def get_customizations(self):
+        return list(self._toppings)
     
     def get_total_price(self):
-        toppings_cost = sum(self._topping_price[topping] for topping in self._toppings)
-        return round(self._base_price + toppings_cost, 2)  # Round to 2 decimal places
+        return to_dollars(self.get_total_cents())
+
+    # total price in cents.
+    def get_total_cents(self):
+        return self._menu._foods[self._row | self._toppings.mask]
+
+    def _price_in(self, menu):
+        return menu._foods[self._row | self._toppings.mask]
+
+    # the version of the menu the food is priced with.
+    def get_menu_version(self):
+        return self._menu._version
+
+    def _topping_on_menu(self, topping):
+        return topping in self._menu._food_toppings
+
+    # starts a ToppingsEdit that stages topping changes and applies them together.
+    def begin_edit(self):
+        return ToppingsEdit(self)
+
+    # builds many foods at once from FoodSpecs, food type names or
+    # (food type, toppings) tuples, validating all of them first.
+    @classmethod
+    def from_specs(cls, specs, menu=None):
+        return [spec.make(menu) for spec in FoodSpec._coerce_all(specs)]
+
+    # every food type that can be declared on a menu, in SKU order.
+    @classmethod
+    def get_food_types(cls):
+        return cls._food_types
+
+    # topping -> its bit in a topping mask and in the SKU.
+    @classmethod
+    def get_topping_bits(cls):
+        return {topping: cls._ToppingSet.bit(topping) for topping in cls._topping_price}
+
+    # the shared, immutable FoodSpec for the food as it is now.
+    def get_spec(self):
+        return FoodSpec._intern(self._type, self._toppings.mask)
+
+    def _restore(self, spec):
+        self._toppings = self._ToppingSet.from_mask(spec._topping_mask)
+        self._changed()
+
+    # the food's configuration as a 32-bit SKU.
+    def get_sku(self):
+        return _pack_sku(SKU_FOOD, self._food_ordinals[self._type], 0, self._toppings.mask)
     
+# the values are names rather than prices: flavors sharing a price would
+# otherwise collapse into enum aliases. prices live in the Menu.
 class IceStormFlavor(Enum):
-    MINT_CHOCOLATE_CHIP = 4.00
-    CHOCOLATE = 3.00
-    VANILLA_BEAN = 3.00
-    BANANA = 3.50
-    BUTTER_PECAN = 3.50
-    SMORE = 4.00
-
-class IceStorm:
+    MINT_CHOCOLATE_CHIP = "mint chocolate chip"
+    CHOCOLATE = "chocolate"
+    VANILLA_BEAN = "vanilla bean"
+    BANANA = "banana"
+    BUTTER_PECAN = "butter pecan"
+    SMORE = "smore"
+
+_ICE_STORM_FLAVORS = tuple(IceStormFlavor)
+_ICE_STORM_ORDINALS = {flavor: ordinal for ordinal, flavor in enumerate(_ICE_STORM_FLAVORS)}
+
+class IceStorm(_Watched):
+    __slots__ = ("_flavor", "_toppings", "_row", "_menu", "_watchers")
+
+    _kind = "ice storm"
+
+    # prices in cents on the built-in menu.
+    _flavor_price = {
+        IceStormFlavor.MINT_CHOCOLATE_CHIP: 400,
+        IceStormFlavor.CHOCOLATE: 300,
+        IceStormFlavor.VANILLA_BEAN: 300,
+        IceStormFlavor.BANANA: 350,
+        IceStormFlavor.BUTTER_PECAN: 350,
+        IceStormFlavor.SMORE: 400
+    }
+
     _topping_price = {
-        "cherry": 0.00,
-        "whipped_cream": 0.00,
-        "caramel_sauce": 0.50,
-        "chocolate_sauce": 0.50,
-        "storios": 1.00,
-        "dig_dogs": 1.00,
-        "t_and_t": 1.00,
-        "cookie_dough": 1.00,
-        "pecans": 0.50
+        "cherry": 0,
+        "whipped_cream": 0,
+        "caramel_sauce": 50,
+        "chocolate_sauce": 50,
+        "storios": 100,
+        "dig_dogs": 100,
+        "t_and_t": 100,
+        "cookie_dough": 100,
+        "pecans": 50
     }
+    _ToppingSet = BitSet.over("IceStormToppingSet", _topping_price)
+
+    _table = attrgetter("_ice_storms")  # the Menu's price table for ice storms
 
-    def __init__(self, flavor: IceStormFlavor):
+    def __init__(self, flavor: IceStormFlavor, menu=None):
+        """makes an ice storm with no toppings, priced with menu, by default the Menu being served."""
+        menu = _current_menu if menu is None else menu
+        if flavor not in menu._ice_storm_prices:
+            raise ValueError(f"{flavor.value} is not on the menu.")
         self._flavor = flavor
-        self._toppings = set()
-        self._base_price = flavor.value
+        self._toppings = self._ToppingSet()
+        self._row = _ice_storm_row(flavor)  # price key without the topping bits
+        self._menu = menu  # the menu the ice storm is priced with
+        self._watchers = ()  # orders holding this ice storm.
 
     def add_flavor(self, flavor: IceStormFlavor):
         raise NotImplementedError("Ice Storms can only have one flavor.")
@@ -164,6 +647,15 @@ class IceStorm:
     def get_flavors(self):
         return list(IceStormFlavor)
 
+    def get_flavor(self):
+        return self._flavor
+
+    def get_toppings(self):
+        return list(self._toppings)
+
+    def get_customizations(self):
+        return list(self._toppings)
+
     def get_base(self):
         return None
 
@@ -171,80 +663,1540 @@ class IceStorm:
         return None
 
     def get_total(self):
-        toppings_cost = sum(self._topping_price[topping] for topping in self._toppings)
-        return round(self._base_price + toppings_cost, 2)
+        return to_dollars(self.get_total_cents())
+
+    def get_total_cents(self):
+        return self._menu._ice_storms[self._row | self._toppings.mask]
+
+    def _price_in(self, menu):
+        return menu._ice_storms[self._row | self._toppings.mask]
+
+    def get_menu_version(self):
+        return self._menu._version
+
+    def _topping_on_menu(self, topping):
+        return topping in self._menu._ice_storm_toppings
 
     def get_num_flavors(self):
         return len(self._toppings)
 
     def add_topping(self, topping):
-        if topping.lower() not in self._topping_price:
+        topping = topping.lower()
+        if topping not in self._topping_price:
             raise ValueError(f"Invalid topping")
-        self._toppings.add(topping.lower())
+        if not self._topping_on_menu(topping):
+            raise ValueError(f"{topping} is not on the menu.")
+        if topping not in self._toppings:
+            self._check_options(self._toppings.mask | self._ToppingSet.bit(topping))
+            self._toppings.add(topping)
+            self._changed()
+
+    def begin_edit(self):
+        """starts a ToppingsEdit that stages topping changes and applies them together."""
+        return ToppingsEdit(self)
+
+    @classmethod
+    def from_specs(cls, specs, menu=None):
+        """builds many ice storms from IceStormSpecs, flavors or (flavor, toppings) tuples."""
+        return [spec.make(menu) for spec in IceStormSpec._coerce_all(specs)]
+
+    @classmethod
+    def get_topping_bits(cls):
+        """returns topping -> its bit in a topping mask and in the SKU."""
+        return {topping: cls._ToppingSet.bit(topping) for topping in cls._topping_price}
+
+    def get_spec(self):
+        return IceStormSpec._intern(self._flavor, self._toppings.mask)
+
+    def _restore(self, spec):
+        self._toppings = self._ToppingSet.from_mask(spec._topping_mask)
+        self._changed()
+
+    def get_sku(self):
+        return _pack_sku(SKU_ICE_STORM, _ICE_STORM_ORDINALS[self._flavor], 0, self._toppings.mask)
 
     def __str__(self):
         return f"Ice Storm Flavor: {self._flavor.name}, Total Price: ${self.get_total()}"
-    
+
+# food and ice storm price keys, like a drink's: the food type or ice storm
+# flavor ordinal above the topping mask.
+FOOD_TOPPING_BITS = len(Food._topping_price)
+ICE_STORM_TOPPING_BITS = len(IceStorm._topping_price)
+
+
+def _food_row(food_type):
+    """returns the price key of a food with no toppings."""
+    return Food._food_ordinals[food_type] << FOOD_TOPPING_BITS
+
+
+def _ice_storm_row(flavor):
+    """returns the price key of an ice storm with no toppings."""
+    return _ICE_STORM_ORDINALS[flavor] << ICE_STORM_TOPPING_BITS
+
+
+def _rows(size, bits, bases, option_costs):
+    """returns a price table of size entries: base cents plus option costs at every row, None elsewhere."""
+    table = [None] * size
+    for row, cents in bases:
+        table[row:row + (1 << bits)] = [None if costs is None else cents + costs for costs in option_costs]
+    return tuple(table)
+
+
+# the tables are built from hashable inputs and cached, so menus that price
+# a kind alike share one table: a franchise's store menus mostly differ in
+# a price or two of one kind.
+@lru_cache(maxsize=1 << 10)
+def _drink_table(bases, size_costs, flavors, flavor_cost):
+    """returns the drink price table for bases and flavors on sale and (size, cents) pairs."""
+    return _rows(len(Base) << (SIZE_BITS + FLAVOR_BITS), FLAVOR_BITS,
+                 [(_drink_row(base, size), cents) for base in _BASES if base in bases
+                  for size, cents in size_costs],
+                 FlavorSet.price_table(dict.fromkeys(flavors, flavor_cost)))
+
+
+@lru_cache(maxsize=1 << 10)
+def _food_table(food_prices, toppings):
+    """returns the food price table for (food type, cents) and (topping, cents) pairs."""
+    return _rows(len(Food._food_types) << FOOD_TOPPING_BITS, FOOD_TOPPING_BITS,
+                 [(_food_row(food_type), cents) for food_type, cents in food_prices],
+                 Food._ToppingSet.price_table(dict(toppings)))
+
+
+@lru_cache(maxsize=1 << 10)
+def _ice_storm_table(flavor_prices, toppings):
+    """returns the ice storm price table for (flavor, cents) and (topping, cents) pairs."""
+    return _rows(len(_ICE_STORM_FLAVORS) << ICE_STORM_TOPPING_BITS, ICE_STORM_TOPPING_BITS,
+                 [(_ice_storm_row(flavor), cents) for flavor, cents in flavor_prices],
+                 IceStorm._ToppingSet.price_table(dict(toppings)))
+
+
+def _checked_prices(prices, valid, what):
+    """returns a copy of an option -> cents mapping, checking every option and price."""
+    checked = {}
+    for option, cents in dict(prices).items():
+        if option not in valid:
+            raise ValueError(f"Unknown {what} {option!r}.")
+        if type(cents) is not int or cents < 0:
+            raise ValueError(f"The price of {what} {option!r} must be a non-negative number of cents.")
+        checked[option] = cents
+    return checked
+
+
+class Menu:
+    """A version of the menu: what is on sale and at what price.
+
+    a Menu is immutable and compiled when it is built: for drinks, food and
+    ice storms it holds a tuple indexed by price key (ordinals and option
+    mask, as in the SKU), giving the cents of every configuration or None
+    for one not on sale, so pricing an item is one lookup.
+
+    the menu being served is swapped read-copy-update style: publish_menu()
+    points one module reference at a complete new Menu, so readers never
+    take a lock and never see half of an update. a Drink, Food or IceStorm
+    is priced with the menu it was made under, and an Order with the menu
+    it was opened under, for all of its lines.
+
+    a menu can price and withdraw the bases, sizes, flavors, food types and
+    toppings declared in the code, but not add new ones: SKUs number them.
+    """
+
+    __slots__ = ("_version", "_size_costs", "_flavor_cost", "_bases", "_flavors", "_food_prices",
+                 "_food_toppings", "_ice_storm_prices", "_ice_storm_toppings",
+                 "_drinks", "_foods", "_ice_storms")
+
+    def __init__(self, version, size_costs, flavor_cost, food_prices, food_toppings,
+                 ice_storm_prices, ice_storm_toppings, bases=_BASES, flavors=tuple(Flavor)):
+        """builds a menu from prices in cents; only the sizes, foods, flavors and toppings given are on sale."""
+        if type(version) is not int or version < 1:
+            raise ValueError("Menu versions are whole numbers from 1.")
+        if type(flavor_cost) is not int or flavor_cost < 0:
+            raise ValueError("The flavor cost must be a non-negative number of cents.")
+        size_costs = _checked_prices(size_costs, _SIZE_ORDINALS, "size")
+        bases = frozenset(bases)
+        flavors = frozenset(flavors)
+        for base in bases:
+            if base not in _BASE_ORDINALS:
+                raise ValueError(f"Unknown base {base!r}.")
+        for flavor in flavors:
+            if flavor not in Drink._valid_flavors:
+                raise ValueError(f"Unknown flavor {flavor!r}.")
+        food_prices = _checked_prices(food_prices, Food._food_ordinals, "food")
+        food_toppings = _checked_prices(food_toppings, Food._ToppingSet._ordinals, "topping")
+        ice_storm_prices = _checked_prices(ice_storm_prices, _ICE_STORM_ORDINALS, "ice storm flavor")
+        ice_storm_toppings = _checked_prices(ice_storm_toppings, IceStorm._ToppingSet._ordinals, "topping")
+
+        drinks = _drink_table(bases, frozenset(size_costs.items()), flavors, flavor_cost)
+        foods = _food_table(frozenset(food_prices.items()), frozenset(food_toppings.items()))
+        ice_storms = _ice_storm_table(frozenset(ice_storm_prices.items()), frozenset(ice_storm_toppings.items()))
+        fields = {
+            "_version": version, "_size_costs": MappingProxyType(size_costs), "_flavor_cost": flavor_cost,
+            "_bases": bases, "_flavors": flavors, "_food_prices": MappingProxyType(food_prices),
+            "_food_toppings": MappingProxyType(food_toppings),
+            "_ice_storm_prices": MappingProxyType(ice_storm_prices),
+            "_ice_storm_toppings": MappingProxyType(ice_storm_toppings),
+            "_drinks": drinks, "_foods": foods, "_ice_storms": ice_storms,
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Menu is immutable.")
+
+    def get_version(self):
+        return self._version
+
+    def get_price_tables(self):
+        """returns the (drinks, foods, ice_storms) price tables, indexed by price key, None where not on sale."""
+        return self._drinks, self._foods, self._ice_storms
+
+    def get_price_cents(self, item):
+        """returns an item's price in cents on this menu; raises ValueError if the menu does not sell it."""
+        cents = item._price_in(self)
+        if cents is None:
+            raise ValueError(f"That {item.get_kind()} is not on menu version {self._version}.")
+        return cents
+
+    def get_fields(self):
+        """returns the menu's constructor arguments as a dict, the prices as read-only mappings."""
+        return {
+            "version": self._version, "size_costs": self._size_costs, "flavor_cost": self._flavor_cost,
+            "food_prices": self._food_prices, "food_toppings": self._food_toppings,
+            "ice_storm_prices": self._ice_storm_prices, "ice_storm_toppings": self._ice_storm_toppings,
+            "bases": self._bases, "flavors": self._flavors,
+        }
+
+    def revise(self, **changes):
+        """returns a new Menu with some constructor arguments changed, by default one version up."""
+        fields = self.get_fields()
+        fields["version"] += 1
+        unknown = changes.keys() - fields.keys()
+        if unknown:
+            raise TypeError(f"Unknown menu fields {sorted(unknown)}.")
+        fields.update(changes)
+        return Menu(**fields)
+
+    def to_config(self):
+        """returns the menu as a JSON-compatible dict, in the form from_config() reads."""
+        return {
+            "version": self._version,
+            "drinks": {
+                "bases": [base.value for base in _BASES if base in self._bases],
+                "sizes": {size.value: cents for size, cents in self._size_costs.items()},
+                "flavors": [flavor.value for flavor in Flavor if flavor in self._flavors],
+                "flavor_cost": self._flavor_cost,
+            },
+            "food": {"items": dict(self._food_prices), "toppings": dict(self._food_toppings)},
+            "ice_storms": {
+                "flavors": {flavor.value: cents for flavor, cents in self._ice_storm_prices.items()},
+                "toppings": dict(self._ice_storm_toppings),
+            },
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        """builds a menu from a dict such as to_config() returns.
+
+        a section left out sells nothing of that kind; in "drinks", bases and
+        flavors default to all of them.
+        """
+        drinks = config.get("drinks", {})
+        food = config.get("food", {})
+        ice_storms = config.get("ice_storms", {})
+        return cls(
+            version=config["version"],
+            size_costs={Size(size): cents for size, cents in drinks.get("sizes", {}).items()},
+            flavor_cost=drinks.get("flavor_cost", 0),
+            bases=[Base(base) for base in drinks.get("bases", [base.value for base in Base])],
+            flavors=[Flavor(flavor) for flavor in drinks.get("flavors", [flavor.value for flavor in Flavor])],
+            food_prices={name.lower(): cents for name, cents in food.get("items", {}).items()},
+            food_toppings={name.lower(): cents for name, cents in food.get("toppings", {}).items()},
+            ice_storm_prices={IceStormFlavor(flavor): cents
+                              for flavor, cents in ice_storms.get("flavors", {}).items()},
+            ice_storm_toppings={name.lower(): cents for name, cents in ice_storms.get("toppings", {}).items()})
+
+    @classmethod
+    def load(cls, path):
+        """builds a menu from a JSON config file, see from_config()."""
+        with open(path, encoding="utf-8") as file:
+            return cls.from_config(json.load(file))
+
+    def __reduce__(self):
+        return (Menu.from_config, (self.to_config(),))
+
+    def __repr__(self):
+        return f"<Menu version {self._version}>"
+
+
+# the menu being served. readers take the reference once and use that Menu;
+# publish_menu() swaps it under _menu_lock, which only publishers take.
+_current_menu = Menu(1, Drink._size_costs, Drink._flavor_cost, Food._food_price, Food._topping_price,
+                     IceStorm._flavor_price, IceStorm._topping_price)
+_menu_lock = threading.Lock()
+
+
+def get_menu():
+    """returns the Menu being served."""
+    return _current_menu
+
+
+def publish_menu(menu):
+    """makes a Menu the one being served; its version must be newer than the current one.
+
+    items and orders made from now on are priced with it, those already made
+    keep theirs.
+    """
+    global _current_menu
+    with _menu_lock:
+        if menu._version <= _current_menu._version:
+            raise ValueError(f"Menu version {menu._version} is not newer than version "
+                             f"{_current_menu._version}.")
+        _current_menu = menu
+
+
+def load_menu(path):
+    """loads a Menu from a JSON config file and publishes it, returning it."""
+    menu = Menu.load(path)
+    publish_menu(menu)
+    return menu
+
+class _Edit:
+    """Base for staged edits: stage many changes, then apply them with commit().
+
+    changes are checked as they are staged, so commit() cannot fail half
+    way. the item is repriced and its orders notified once, at commit. used
+    as a context manager, the edit commits on success and is discarded if
+    the block raises.
+    """
+
+    __slots__ = ("_target", "_finished")
+
+    def __init__(self, target):
+        self._target = target
+        self._finished = False
+
+    def commit(self):
+        """applies every staged change at once."""
+        if not self._finished:
+            self._check()
+        self._finish()
+        self._apply()
+
+    def _check(self):
+        """raises ValueError if the staged changes no longer fit the target."""
+
+    def discard(self):
+        """drops every staged change."""
+        self._finish()
+
+    def _finish(self):
+        if self._finished:
+            raise RuntimeError("This edit was already committed or discarded.")
+        self._finished = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        elif not self._finished:
+            self.discard()
+        return False
+
+class _OptionsEdit(_Edit):
+    """staged flavor or topping changes for an item holding a BitSet.
+
+    the edit stages the bits it adds and removes, like OrderEdit nets its
+    counts, and applies them to the options the item has at commit, so a
+    change made to the item meanwhile is kept.
+    """
+
+    __slots__ = ("_added", "_removed")
+
+    _attribute = None  # name of the item's BitSet slot
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._added = 0
+        self._removed = 0
+
+    def _add(self, bit):
+        self._added |= bit
+        self._removed &= ~bit
+
+    def _remove(self, bit):
+        self._removed |= bit
+        self._added &= ~bit
+
+    def _mask(self):
+        """returns the options the item will have once the edit is applied."""
+        return getattr(self._target, self._attribute).mask & ~self._removed | self._added
+
+    def _check(self):
+        self._target._check_options(self._mask())
+
+    def _apply(self):
+        target = self._target
+        options = getattr(target, self._attribute)
+        mask = self._mask()
+        if options.mask != mask:
+            setattr(target, self._attribute, type(options).from_mask(mask))
+            target._changed()
+
+class DrinkEdit(_OptionsEdit):
+    """A staged edit of a drink's flavors, see Drink.begin_edit."""
+
+    __slots__ = ()
+
+    _attribute = "_flavors"
+
+    def _bit(self, flavor):
+        if flavor not in Drink._valid_flavors:
+            raise ValueError(f"Pick a proper flavor from {Drink._valid_flavors}.")
+        return FlavorSet.bit(flavor)
+
+    def _menu_bit(self, flavor):
+        bit = self._bit(flavor)
+        if flavor not in self._target._menu._flavors:
+            raise ValueError(f"{flavor.value} is not on the menu.")
+        return bit
+
+    def add_flavor(self, flavor: Flavor):
+        self._add(self._menu_bit(flavor))
+        return self
+
+    def remove_flavor(self, flavor: Flavor):
+        self._remove(self._bit(flavor))
+        return self
+
+    def set_flavors(self, flavors):
+        mask = 0
+        for flavor in flavors:
+            mask |= self._menu_bit(flavor)
+        self._removed = ~mask
+        self._added = mask
+        return self
+
+class ToppingsEdit(_OptionsEdit):
+    """A staged edit of a Food's or IceStorm's toppings, see begin_edit."""
+
+    __slots__ = ()
+
+    _attribute = "_toppings"
+
+    def _bit(self, topping):
+        topping = topping.lower()
+        if topping not in self._target._topping_price:
+            raise ValueError("Invalid topping")
+        return self._target._ToppingSet.bit(topping)
+
+    def add_topping(self, topping):
+        bit = self._bit(topping)
+        if not self._target._topping_on_menu(topping.lower()):
+            raise ValueError(f"{topping.lower()} is not on the menu.")
+        self._add(bit)
+        return self
+
+    def remove_topping(self, topping):
+        self._remove(self._bit(topping))
+        return self
+
+class _Spec(MenuItem):
+    """Base for immutable item configurations shared between sales (flyweights).
+
+    Each subclass interns its instances by configuration, so equal specs are
+    the same object: equality is identity, and the price key and SKU are
+    worked out once when the configuration is first seen. The SKU doubles as
+    the hash. A spec is priced on whatever menu asks: get_total_cents() uses
+    the current one, an Order the one it was opened with.
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __hash__(self):
+        return self._sku
+
+    def get_total_cents(self):
+        menu = _current_menu
+        cents = self._price_in(menu)
+        if cents is None:
+            raise ValueError(f"{self!r} is not on menu version {menu._version}.")
+        return cents
+
+    def _menu_for(self, menu):
+        """returns menu, by default the current one, raising ValueError if it does not sell the spec."""
+        menu = _current_menu if menu is None else menu
+        if self._price_in(menu) is None:
+            raise ValueError(f"{self!r} is not on menu version {menu._version}.")
+        return menu
+
+    def get_sku(self):
+        return self._sku
+
+    @classmethod
+    def _coerce_all(cls, values):
+        """returns the spec of every value, checking them all before anything is built.
+
+        raises ValueError naming the position of the first invalid value.
+        """
+        specs = []
+        coerce = cls._coerce
+        seen = {}  # batches repeat configurations, so each distinct value is checked once
+        for position, value in enumerate(values):
+            try:
+                spec = seen.get(value)
+            except TypeError:  # unhashable, such as a list of flavors
+                spec = None
+            if spec is None:
+                try:
+                    spec = coerce(value)
+                except (ValueError, TypeError, AttributeError) as error:
+                    raise ValueError(f"Spec {position}: {error}") from error
+                try:
+                    seen[value] = spec
+                except TypeError:
+                    pass
+            specs.append(spec)
+        return specs
+
+    @classmethod
+    def _store(cls, key, **fields):
+        """creates the spec for key, or returns the one another caller stored first."""
+        spec = object.__new__(cls)
+        for name, value in fields.items():
+            object.__setattr__(spec, name, value)
+        return cls._interned.setdefault(key, spec)
+
+class DrinkSpec(_Spec):
+    """An immutable drink configuration: base, size and flavors."""
+
+    __slots__ = ("_base", "_size", "_flavor_mask", "_price_key", "_sku")
+    _interned = {}  # (base, size, flavor mask) -> DrinkSpec
+    _kind = "drink"
+
+    def __new__(cls, base: Base, size: Size, flavors=()):
+        mask = 0
+        for flavor in flavors:
+            if flavor not in Drink._valid_flavors:
+                raise ValueError(f"Pick a proper flavor from {Drink._valid_flavors}.")
+            mask |= FlavorSet.bit(flavor)
+        return cls._intern(base, size, mask)
+
+    @classmethod
+    def _intern(cls, base, size, mask):
+        spec = cls._interned.get((base, size, mask))
+        if spec is None:
+            if base not in Drink._valid_bases or size not in Drink._size_costs:
+                raise ValueError("Invalid drink base or size.")
+            price_key = _drink_row(base, size) | mask
+            sku = _pack_sku(SKU_DRINK, _BASE_ORDINALS[base], _SIZE_ORDINALS[size], mask)
+            spec = cls._store((base, size, mask), _base=base, _size=size, _flavor_mask=mask,
+                              _price_key=price_key, _sku=sku)
+        return spec
+
+    @classmethod
+    def from_mask(cls, base, size, mask):
+        """returns the spec of a base and size with the flavors of a FlavorSet mask."""
+        if not 0 <= mask < 1 << FLAVOR_BITS:
+            raise ValueError("Invalid flavor mask.")
+        return cls._intern(base, size, mask)
+
+    def _price_in(self, menu):
+        return menu._drinks[self._price_key]
+
+    def get_price_key(self):
+        return self._price_key
+
+    def __reduce__(self):
+        return (DrinkSpec, (self._base, self._size, self.get_flavors()))
+
+    def get_base(self):
+        return self._base
+
+    def get_size(self):
+        return self._size
+
+    def get_flavors(self):
+        return list(FlavorSet.from_mask(self._flavor_mask))
+
+    def get_num_flavors(self):
+        return self._flavor_mask.bit_count()
+
+    def get_customizations(self):
+        return [flavor.value for flavor in FlavorSet.from_mask(self._flavor_mask)]
+
+    @classmethod
+    def _coerce(cls, value):
+        if isinstance(value, DrinkSpec):
+            return value
+        return cls(*value)
+
+    def make(self, menu=None):
+        """returns a new Drink built to this spec, priced with menu, by default the current one."""
+        # the spec was validated when it was interned, so skip Drink's checks.
+        menu = self._menu_for(menu)
+        drink = object.__new__(Drink)
+        drink._base = self._base
+        drink._size = self._size
+        drink._flavors = FlavorSet.from_mask(self._flavor_mask)
+        drink._row = self._price_key ^ self._flavor_mask
+        drink._menu = menu
+        drink._watchers = ()
+        return drink
+
+    def __repr__(self):
+        return f"DrinkSpec({self._base}, {self._size}, {self.get_flavors()})"
+
+class FoodSpec(_Spec):
+    """An immutable food configuration: food type and toppings."""
+
+    __slots__ = ("_type", "_topping_mask", "_price_key", "_sku")
+    _interned = {}  # (food type, topping mask) -> FoodSpec
+    _kind = "food"
+
+    def __new__(cls, food_type, toppings=()):
+        mask = 0
+        for topping in toppings:
+            topping = topping.lower()
+            if topping not in Food._topping_price:
+                raise ValueError(f"Invalid topping")
+            mask |= Food._ToppingSet.bit(topping)
+        return cls._intern(food_type.lower(), mask)
+
+    @classmethod
+    def _intern(cls, food_type, mask):
+        spec = cls._interned.get((food_type, mask))
+        if spec is None:
+            if food_type not in Food._food_price:
+                raise ValueError(f"Invalid food type.")
+            sku = _pack_sku(SKU_FOOD, Food._food_ordinals[food_type], 0, mask)
+            spec = cls._store((food_type, mask), _type=food_type, _topping_mask=mask,
+                              _price_key=_food_row(food_type) | mask, _sku=sku)
+        return spec
+
+    @classmethod
+    def from_mask(cls, food_type, mask):
+        """returns the spec of a food type with the toppings of a mask, see Food.get_topping_bits."""
+        if not 0 <= mask < 1 << FOOD_TOPPING_BITS:
+            raise ValueError("Invalid topping mask.")
+        return cls._intern(food_type, mask)
+
+    def _price_in(self, menu):
+        return menu._foods[self._price_key]
+
+    def __reduce__(self):
+        return (FoodSpec, (self._type, self.get_toppings()))
+
+    def get_type(self):
+        return self._type
+
+    def get_toppings(self):
+        return list(Food._ToppingSet.from_mask(self._topping_mask))
+
+    get_customizations = get_toppings
+
+    def get_num_toppings(self):
+        return self._topping_mask.bit_count()
+
+    def get_total_price(self):
+        return to_dollars(self.get_total_cents())
+
+    @classmethod
+    def _coerce(cls, value):
+        if isinstance(value, FoodSpec):
+            return value
+        if isinstance(value, str):
+            return cls(value)
+        return cls(*value)
+
+    def make(self, menu=None):
+        """returns a new Food built to this spec, priced with menu, by default the current one."""
+        menu = self._menu_for(menu)
+        food = object.__new__(Food)
+        food._type = self._type
+        food._toppings = Food._ToppingSet.from_mask(self._topping_mask)
+        food._row = self._price_key ^ self._topping_mask
+        food._menu = menu
+        food._watchers = ()
+        return food
+
+    def __repr__(self):
+        return f"FoodSpec({self._type!r}, {self.get_toppings()})"
+
+class IceStormSpec(_Spec):
+    """An immutable ice storm configuration: flavor and toppings."""
+
+    __slots__ = ("_flavor", "_topping_mask", "_price_key", "_sku")
+    _interned = {}  # (flavor, topping mask) -> IceStormSpec
+    _kind = "ice storm"
+
+    def __new__(cls, flavor: IceStormFlavor, toppings=()):
+        mask = 0
+        for topping in toppings:
+            topping = topping.lower()
+            if topping not in IceStorm._topping_price:
+                raise ValueError(f"Invalid topping")
+            mask |= IceStorm._ToppingSet.bit(topping)
+        return cls._intern(flavor, mask)
+
+    @classmethod
+    def _intern(cls, flavor, mask):
+        spec = cls._interned.get((flavor, mask))
+        if spec is None:
+            if flavor not in IceStorm._flavor_price:
+                raise ValueError("Invalid ice storm flavor.")
+            sku = _pack_sku(SKU_ICE_STORM, _ICE_STORM_ORDINALS[flavor], 0, mask)
+            spec = cls._store((flavor, mask), _flavor=flavor, _topping_mask=mask,
+                              _price_key=_ice_storm_row(flavor) | mask, _sku=sku)
+        return spec
+
+    @classmethod
+    def from_mask(cls, flavor, mask):
+        """returns the spec of a flavor with the toppings of a mask, see IceStorm.get_topping_bits."""
+        if not 0 <= mask < 1 << ICE_STORM_TOPPING_BITS:
+            raise ValueError("Invalid topping mask.")
+        return cls._intern(flavor, mask)
+
+    def _price_in(self, menu):
+        return menu._ice_storms[self._price_key]
+
+    def __reduce__(self):
+        return (IceStormSpec, (self._flavor, self.get_toppings()))
+
+    def get_flavor(self):
+        return self._flavor
+
+    def get_toppings(self):
+        return list(IceStorm._ToppingSet.from_mask(self._topping_mask))
+
+    get_customizations = get_toppings
+
+    def get_num_toppings(self):
+        return self._topping_mask.bit_count()
+
+    @classmethod
+    def _coerce(cls, value):
+        if isinstance(value, IceStormSpec):
+            return value
+        if isinstance(value, IceStormFlavor):
+            return cls(value)
+        return cls(*value)
+
+    def make(self, menu=None):
+        """returns a new IceStorm built to this spec, priced with menu, by default the current one."""
+        menu = self._menu_for(menu)
+        ice_storm = object.__new__(IceStorm)
+        ice_storm._flavor = self._flavor
+        ice_storm._toppings = IceStorm._ToppingSet.from_mask(self._topping_mask)
+        ice_storm._row = self._price_key ^ self._topping_mask
+        ice_storm._menu = menu
+        ice_storm._watchers = ()
+        return ice_storm
+
+    def __repr__(self):
+        return f"IceStormSpec({self._flavor}, {self.get_toppings()})"
+
+
+def encode_sku(item):
+    """returns the 32-bit SKU of a Drink, Food, IceStorm or spec."""
+    return item.get_sku()
+
+
+# SKU -> spec for every valid SKU decode_sku has seen; specs are interned and
+# never go away, and there are only so many valid SKUs.
+_decoded_skus = {}
+
+
+def decode_sku(sku):
+    """returns the interned spec a SKU describes.
+
+    raises ValueError for integers that are not the SKU of a valid configuration.
+    """
+    spec = _decoded_skus.get(sku)
+    if spec is None:
+        spec = _decoded_skus[sku] = _decode_sku(sku)
+    return spec
+
+
+def _decode_sku(sku):
+    kind = sku >> _SKU_KIND_SHIFT
+    variant = (sku >> _SKU_VARIANT_SHIFT) & 0xFF
+    size = (sku >> _SKU_SIZE_SHIFT) & 0xF
+    mask = sku & _SKU_OPTIONS
+    if kind == SKU_DRINK and variant < len(Base) and size < len(Size) and not mask >> FLAVOR_BITS:
+        return DrinkSpec._intern(_BASES[variant], _SIZES[size], mask)
+    if size == 0:
+        if (kind == SKU_FOOD and variant < len(Food._food_types)
+                and not mask >> len(Food._topping_price)):
+            return FoodSpec._intern(Food._food_types[variant], mask)
+        if (kind == SKU_ICE_STORM and variant < len(_ICE_STORM_FLAVORS)
+                and not mask >> len(IceStorm._topping_price)):
+            return IceStormSpec._intern(_ICE_STORM_FLAVORS[variant], mask)
+    raise ValueError(f"Invalid SKU {sku:#010x}.")
+
+
+# item type -> function(item, quantity, unit_cents) returning the receipt
+# entry of a line; see register_line_serializer.
+_line_serializers = {}
+
+
+def register_line_serializer(*item_types):
+    """decorator registering the receipt line serializer of one or more item types.
+
+    the serializer is called as serializer(item, quantity, unit_cents) and
+    returns the line's receipt entry: a dict with at least "kind",
+    "description", "quantity", "total_cost" and "line_total". subclasses of a
+    registered type use its serializer unless they register their own.
+    """
+    def register(serializer):
+        for item_type in item_types:
+            _line_serializers[item_type] = serializer
+        return serializer
+    return register
+
+
+def _serializer_for(item_type):
+    """returns the line serializer of an item type, caching inherited ones."""
+    serializer = _line_serializers.get(item_type)
+    if serializer is None:
+        for base in item_type.__mro__[1:]:
+            serializer = _line_serializers.get(base)
+            if serializer is not None:
+                _line_serializers[item_type] = serializer
+                break
+        else:
+            raise ValueError(f"No receipt line serializer is registered for {item_type.__name__}.")
+    return serializer
+
+
+def serialize_line(item, quantity, unit_cents):
+    """returns the receipt entry of a line, from the serializer registered for the item's type."""
+    return _serializer_for(type(item))(item, quantity, unit_cents)
+
+
+@register_line_serializer(Drink, DrinkSpec)
+def _drink_line(drink, quantity, unit_cents):
+    flavors = drink.get_customizations()
+    base, size = drink.get_base().value, drink.get_size().value
+    return {
+        "kind": "drink",
+        "description": f"{size} {base} ({', '.join(flavors) or 'no flavors'})",
+        "base": base,
+        "size": size,
+        "flavors": flavors,
+        "quantity": quantity,
+        "total_cost": to_dollars(unit_cents),
+        "line_total": to_dollars(unit_cents * quantity)
+    }
+
+
+@register_line_serializer(Food, FoodSpec)
+def _food_line(food, quantity, unit_cents):
+    toppings = food.get_customizations()
+    return {
+        "kind": "food",
+        "description": f"{food.get_type()} ({', '.join(toppings) or 'no toppings'})",
+        "type": food.get_type(),
+        "toppings": toppings,
+        "quantity": quantity,
+        "total_cost": to_dollars(unit_cents),
+        "line_total": to_dollars(unit_cents * quantity)
+    }
+
+
+@register_line_serializer(IceStorm, IceStormSpec)
+def _ice_storm_line(ice_storm, quantity, unit_cents):
+    toppings = ice_storm.get_customizations()
+    flavor = ice_storm.get_flavor().value
+    return {
+        "kind": "ice storm",
+        "description": f"{flavor} ice storm ({', '.join(toppings) or 'no toppings'})",
+        "flavor": flavor,
+        "toppings": toppings,
+        "quantity": quantity,
+        "total_cost": to_dollars(unit_cents),
+        "line_total": to_dollars(unit_cents * quantity)
+    }
+
+
+_TREE_BITS = 5
+_TREE_MASK = (1 << _TREE_BITS) - 1
+
+
+class _LineTree:
+    """A persistent map of line id -> line record: a 32-way trie of tuples.
+
+    set() returns a new tree that copies only the nodes on the path to the
+    key and shares every other node with the old tree, so old versions stay
+    valid and cheap to keep. nodes are trimmed after their last child, so a
+    small order's tree is a single short tuple.
+    """
+
+    __slots__ = ("_root", "_shift")
+
+    def __init__(self, root=(), shift=0):
+        self._root = root
+        self._shift = shift  # bits of the key below the root's own index
+
+    def get(self, key):
+        """returns the record stored at key, or None."""
+        shift = self._shift
+        if key >> (shift + _TREE_BITS):
+            return None
+        node = self._root
+        while node is not None:
+            index = (key >> shift) & _TREE_MASK
+            if index >= len(node):
+                return None
+            node = node[index]
+            if not shift:
+                return node
+            shift -= _TREE_BITS
+        return None
+
+    def set(self, key, record):
+        """returns a tree with key mapped to record, or removed if record is None."""
+        root, shift = self._root, self._shift
+        while key >> (shift + _TREE_BITS):
+            root = (root,) if root else ()
+            shift += _TREE_BITS
+        return _LineTree(_tree_set(root or (), shift, key, record), shift)
+
+    def items(self):
+        """yields (key, record) for every key, in key order."""
+        return _tree_items(self._root, self._shift, 0)
+
+    def changed_keys(self, other):
+        """yields the keys whose records differ between this tree and other.
+
+        subtrees the two versions share are skipped without being visited,
+        so the cost follows the number of changes, not the size of the trees.
+        """
+        mine, theirs = self._root, other._root
+        shift = max(self._shift, other._shift)
+        for _ in range(self._shift, shift, _TREE_BITS):
+            mine = (mine,) if mine else ()
+        for _ in range(other._shift, shift, _TREE_BITS):
+            theirs = (theirs,) if theirs else ()
+        return _tree_diff(mine or (), theirs or (), shift, 0)
+
+
+_EMPTY_TREE = _LineTree()  # trees never change, so every new order shares this one
+
+
+def _tree_set(node, shift, key, record):
+    """returns a copy of node with key set, or None if the copy is empty."""
+    index = (key >> shift) & _TREE_MASK
+    size = len(node)
+    if shift:
+        record = _tree_set(node[index] or () if index < size else (), shift - _TREE_BITS, key, record)
+    if index < size - 1:
+        return node[:index] + (record,) + node[index + 1:]
+    if record is not None:
+        return node[:index] + (None,) * (index - size) + (record,)
+    if index >= size:
+        return node or None
+    # the last child was removed: trim the trailing empty slots.
+    while index and node[index - 1] is None:
+        index -= 1
+    return node[:index] or None
+
+
+def _tree_items(node, shift, prefix):
+    if node is None:
+        return
+    for index, child in enumerate(node):
+        if child is None:
+            continue
+        key = prefix | (index << shift)
+        if shift:
+            yield from _tree_items(child, shift - _TREE_BITS, key)
+        else:
+            yield key, child
+
+
+def _tree_diff(mine, theirs, shift, prefix):
+    for index in range(max(len(mine), len(theirs))):
+        a = mine[index] if index < len(mine) else None
+        b = theirs[index] if index < len(theirs) else None
+        if a is b:
+            continue
+        key = prefix | (index << shift)
+        if shift:
+            yield from _tree_diff(a or (), b or (), shift - _TREE_BITS, key)
+        else:
+            yield key
+
+
 class Order:
-    """represents an order containing multiple drinks."""
-    
-    _tax_rate = 0.0725 
+    """represents an order containing drinks, food, ice storms or any other MenuItem.
+
+    the order keeps one line per distinct item with a quantity. specs are
+    interned, so the same configuration added as a spec always lands on the
+    same line; a mutable Drink or Food is its own line, since it may still
+    change after it is added. every line gets an id when it opens that stays
+    the same until it closes, so registers sharing a tab can address lines
+    by id while positions shift.
+
+    next to these dicts the order keeps its lines in a persistent _LineTree
+    of (item, spec, quantity, unit cents) records keyed by line id. the
+    first snapshot builds the tree; after that, changed line ids are noted
+    as they change and written to the tree, one path copy each, the next
+    time a snapshot is taken, and snapshot() itself only wraps the tree.
+    once enable_undo() is called, every change takes a snapshot and undo()
+    and redo() step between them.
+
+    an order prices every line with the Menu being served when it was
+    opened, or the one it was given, such as a store's, so a menu published
+    meanwhile does not mix prices on it, and its receipt names that menu's
+    version.
+    """
+
+    __slots__ = ("_lines", "_priced", "_num_items", "_subtotal", "_receipt", "_entries",
+                 "_line_ids", "_line_items", "_next_line_id", "_tree", "_pending", "_history",
+                 "_menu")
 
-    def __init__(self):
-        """initializes an empty order with no drinks."""
-        self._items = [] 
+    def __init__(self, menu=None):
+        """initializes an empty order priced with menu, by default the Menu being served."""
+        self._lines = {}  # item -> quantity, in the order lines were opened
+        # running totals, kept up to date by add_item, remove_item and the
+        # change notifications of the items themselves.
+        self._priced = {}  # item -> unit price in cents when last seen
+        self._num_items = 0
+        self._subtotal = 0
+        # get_receipt's last result, None once anything changed, and the
+        # receipt entry of every line whose item and quantity are unchanged.
+        self._receipt = None
+        self._entries = {}
+        self._line_ids = {}  # item -> line id
+        self._line_items = {}  # line id -> item, in the order lines were opened
+        self._next_line_id = 1
+        self._tree = _EMPTY_TREE
+        # line id -> item, or None once closed, for changes not yet in _tree;
+        # None until the first snapshot.
+        self._pending = None
+        self._history = None  # an _OrderHistory once enable_undo() is called
+        self._menu = _current_menu if menu is None else menu
+
+    def get_menu_version(self):
+        """returns the version of the menu the order is priced with."""
+        return self._menu._version
 
     def get_items(self):
-        """returns the list of drinks in the order."""
-        return self._items
+        """returns an iterator over the items in the order, one per unit."""
+        return chain.from_iterable(repeat(item, quantity) for item, quantity in self._lines.items())
+
+    def get_lines(self):
+        """returns a list of (item, quantity) pairs, one per line."""
+        return list(self._lines.items())
+
+    def get_quantity(self, item):
+        """returns how many of an item are in the order."""
+        return self._lines.get(item, 0)
+
+    def get_unit_cents(self, item):
+        """returns the unit price in cents the order charges for an item on it."""
+        return self._priced[item]
+
+    def iter_lines(self):
+        """yields (line id, item, quantity) for every line, oldest line first."""
+        lines = self._lines
+        for line_id, item in self._line_items.items():
+            yield line_id, item, lines[item]
+
+    def get_line_id(self, item):
+        """returns the id of an item's line, or None if the item is not in the order."""
+        return self._line_ids.get(item)
+
+    def get_line(self, line_id):
+        """returns the (item, quantity) of a line; raises KeyError for unknown ids."""
+        item = self._line_items.get(line_id)
+        if item is None:
+            raise KeyError(f"The order has no line {line_id}.")
+        return item, self._lines[item]
+
+    def remove_line(self, line_id, quantity=None):
+        """removes quantity units from a line, or the whole line by default."""
+        item, held = self.get_line(line_id)
+        self.decrement_item(item, held if quantity is None else quantity)
+
+    def to_skus(self):
+        """returns the order as an array('I') of SKUs, one per unit."""
+        skus = array("I")
+        for item, quantity in self._lines.items():
+            skus.extend(repeat(item.get_sku(), quantity))
+        return skus
+
+    @classmethod
+    def from_skus(cls, skus):
+        """returns a new order holding the specs of an iterable of SKUs."""
+        order = cls()
+        for sku, quantity in Counter(skus).items():
+            order.add_item(decode_sku(sku), quantity)
+        return order
 
     def get_total(self):
-        return sum(drink.get_total() for drink in self._items)
+        """returns the order subtotal in dollars."""
+        return to_dollars(self._subtotal)
+
+    def get_subtotal_cents(self):
+        """returns the order subtotal in cents."""
+        return self._subtotal
 
     def get_num_items(self):
-        return len(self._items)
+        return self._num_items
 
     def get_tax(self):
-        return self.get_total() * self._tax_rate
+        """returns the tax in dollars."""
+        return to_dollars(self.get_tax_cents())
+
+    def get_tax_cents(self):
+        """returns the tax in cents, see tax_cents() for the rounding rule."""
+        return tax_cents(self._subtotal)
+
+    def get_grand_total_cents(self):
+        """returns the subtotal plus tax in cents."""
+        return self._subtotal + tax_cents(self._subtotal)
 
     def get_receipt(self):
-        """generates a receipt for the order."""
+        """generates a receipt for the order, amounts in dollars.
+
+        "drinks" keeps its old name but lists every line, whatever its kind,
+        and "number_drinks" counts every unit. the receipt is cached until the
+        order or one of its items changes, and then only the changed lines
+        are rebuilt. callers share the returned dict and must not modify it.
+        """
+        if self._receipt is not None:
+            return self._receipt
+        subtotal = self._subtotal
+        tax = tax_cents(subtotal)
         receipt_data = {
             "number_drinks": self.get_num_items(),
             "drinks": [],
-            "subtotal": self.get_total(),
-            "tax": self.get_tax(),
-            "grand_total": self.get_total() + self.get_tax()
+            "subtotal": to_dollars(subtotal),
+            "tax": to_dollars(tax),
+            "grand_total": to_dollars(subtotal + tax),
+            "menu_version": self._menu._version
         }
 
-        for drink in self._items:
-            drink_data = {
-                "base": drink.get_base().value, 
-                "size": drink._size.value, 
-                "flavors": [flavor.value for flavor in drink.get_flavors()],
-                "total_cost": drink.get_total() 
-            }
-            receipt_data["drinks"].append(drink_data)
+        entries = self._entries
+        for item, quantity in self._lines.items():
+            line_data = entries.get(item)
+            if line_data is None:
+                line_data = entries[item] = self._receipt_entry(item, quantity)
+            receipt_data["drinks"].append(line_data)
+        self._receipt = receipt_data
         return receipt_data
 
-    def add_item(self, item):
-        if isinstance(item, (Drink, Food)):
-            self._items.append(item)
+    def iter_receipt(self):
+        """yields the receipt piece by piece: a header, one entry per line, then the totals.
+
+        each piece is a (kind, dict) pair with kind "header", "line" or
+        "footer". lines are built as they are reached and not kept, so
+        memory use does not grow with the size of the order. the amounts
+        match get_receipt(); the order must not change while streaming.
+        """
+        subtotal = self._subtotal
+        tax = tax_cents(subtotal)
+        yield "header", {"number_drinks": self._num_items, "number_lines": len(self._lines),
+                         "menu_version": self._menu._version}
+        entries = self._entries
+        for item, quantity in self._lines.items():
+            line_data = entries.get(item)
+            if line_data is None:
+                line_data = self._receipt_entry(item, quantity)
+            yield "line", line_data
+        yield "footer", {
+            "subtotal": to_dollars(subtotal),
+            "tax": to_dollars(tax),
+            "grand_total": to_dollars(subtotal + tax)
+        }
+
+    def write_receipt(self, stream):
+        """writes the receipt as text to a file-like object, one line at a time.
+
+        stream needs a write(str) method: an open text file, io.StringIO, or
+        socket.makefile("w") for a socket. returns the number of lines written.
+        """
+        subtotal = self._subtotal
+        tax = tax_cents(subtotal)
+        stream.write(f"Order: {self._num_items} items, menu version {self._menu._version}\n")
+        entries = self._entries
+        for item, quantity in self._lines.items():
+            line_data = entries.get(item)
+            if line_data is None:
+                line_data = self._receipt_entry(item, quantity)
+            stream.write(f"x{quantity} {line_data['description']}"
+                         f"  {format_cents(self._priced[item] * quantity)}\n")
+        stream.write(f"Subtotal  {format_cents(subtotal)}\n"
+                     f"Tax  {format_cents(tax)}\n"
+                     f"Grand total  {format_cents(subtotal + tax)}\n")
+        return len(self._lines) + 4
+
+    def _receipt_entry(self, item, quantity):
+        """builds the receipt entry of one line with its type's serializer."""
+        return _line_serializers[type(item)](item, quantity, self._priced[item])
+
+    def _line_changed(self, item):
+        """drops the cached receipt and the changed line's entry."""
+        self._receipt = None
+        self._entries.pop(item, None)
+        if self._pending is not None:
+            self._pending[self._line_ids[item]] = item
+
+    def add_item(self, item, quantity=1):
+        """adds quantity units of an item, on its existing line if it has one."""
+        if not isinstance(item, MenuItem):
+            raise ValueError("You can only add menu items to this order.")
+        if type(item) not in _line_serializers:
+            _serializer_for(type(item))
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1.")
+        cents = self._priced.get(item)
+        if cents is None:
+            cents = self._open_line(item, quantity, self._price(item))
         else:
-            raise ValueError("You can only add drinks or food to this order.")
+            self._lines[item] += quantity
+        self._num_items += quantity
+        self._subtotal += cents * quantity
+        self._line_changed(item)
+        self._record()
+
+    def add_items(self, items):
+        """adds many items in one pass, one unit each.
+
+        every item is checked before the order changes, so an invalid item
+        raises ValueError and adds nothing. totals are updated once.
+        """
+        counts = {}
+        for position, item in enumerate(items):
+            if not isinstance(item, MenuItem):
+                raise ValueError(f"Item {position}: you can only add menu items to this order.")
+            if type(item) not in _line_serializers:
+                try:
+                    _serializer_for(type(item))
+                except ValueError as error:
+                    raise ValueError(f"Item {position}: {error}") from error
+            counts[item] = counts.get(item, 0) + 1
+        self._apply_counts(counts)
+
+    def begin_edit(self):
+        """starts an OrderEdit that stages adds and removals and applies them together."""
+        return OrderEdit(self)
+
+    def _apply_counts(self, counts):
+        """applies checked quantity changes, item -> units added (or removed if negative)."""
+        lines, priced = self._lines, self._priced
+        # price new lines first, so an item off the menu changes nothing.
+        opening = {item: self._price(item) for item, change in counts.items()
+                   if change and item not in priced}
+        change_cents = 0
+        change_items = 0
+        changed = False
+        for item, change in counts.items():
+            if not change:
+                continue
+            changed = True
+            cents = priced.get(item)
+            if cents is None:
+                cents = self._open_line(item, change, opening[item])
+                self._line_changed(item)
+            elif lines[item] + change:
+                lines[item] += change
+                self._line_changed(item)
+            else:
+                self._close_line(item)
+            change_cents += cents * change
+            change_items += change
+        if changed:
+            self._num_items += change_items
+            self._subtotal += change_cents
+            self._record()
+
+    def decrement_item(self, item, quantity=1):
+        """takes quantity units of an item off its line, closing the line at zero."""
+        held = self._lines.get(item, 0)
+        if not 1 <= quantity <= held:
+            raise ValueError(f"The order holds {held} of that item, cannot remove {quantity}.")
+        self._num_items -= quantity
+        self._subtotal -= self._priced[item] * quantity
+        if quantity == held:
+            self._close_line(item)
+        else:
+            self._lines[item] = held - quantity
+            self._line_changed(item)
+        self._record()
+
+    def _price(self, item):
+        """returns an item's unit price on the order's menu; raises ValueError if it is not on it."""
+        cents = item._price_in(self._menu)
+        if cents is None:
+            raise ValueError(f"That {item.get_kind()} is not on menu version {self._menu._version}.")
+        return cents
+
+    def _open_line(self, item, quantity, cents):
+        """opens a line for an item not yet in the order at a unit price, returning the price."""
+        self._priced[item] = cents
+        self._lines[item] = quantity
+        line_id = self._next_line_id
+        self._next_line_id = line_id + 1
+        self._line_ids[item] = line_id
+        self._line_items[line_id] = item
+        item._watch(self)
+        return cents
+
+    def _close_line(self, item):
+        """forgets a line whose quantity dropped to zero."""
+        line_id = self._line_ids.pop(item)
+        del self._lines[item]
+        del self._priced[item]
+        del self._line_items[line_id]
+        self._entries.pop(item, None)
+        self._receipt = None
+        if self._pending is not None:
+            self._pending[line_id] = None
+        item._unwatch(self)
 
     def remove_item(self, index):
-        if 0 <= index < len(self._items):
-            self._items.pop(index)
+        """removes the unit at a position of get_items()."""
+        if 0 <= index < self._num_items:
+            for item, quantity in self._lines.items():
+                if index < quantity:
+                    break
+                index -= quantity
+            self.decrement_item(item)
         else:
             raise IndexError("Invalid index, cannot remove item.")
-        
-        
-        
-    
-        
-    
-    
-    
-    
-    
\ No newline at end of file
+
+    def _item_changed(self, item):
+        """reprices a line after its item was changed in place."""
+        history = self._history
+        if history is not None and history.replaying:
+            return  # undo() restores the line itself
+        cents = item._price_in(self._menu)
+        if cents is None:
+            # items check every holding order's menu before they change.
+            raise ValueError(f"That {item.get_kind()} is not on menu version {self._menu._version}.")
+        self._subtotal += (cents - self._priced[item]) * self._lines[item]
+        self._priced[item] = cents
+        self._line_changed(item)
+        self._record()
+
+    def snapshot(self):
+        """returns an OrderSnapshot of the order as it is now, in O(1).
+
+        later changes to the order, or to the items on it, do not show in
+        the snapshot.
+        """
+        pending = self._pending
+        if pending is None:
+            pending = self._pending = self._line_items.copy()
+        if pending:
+            tree, lines, priced = self._tree, self._lines, self._priced
+            for line_id, item in pending.items():
+                tree = tree.set(line_id, None if item is None else
+                                (item, item.get_spec(), lines[item], priced[item]))
+            self._tree = tree
+            pending.clear()
+        return OrderSnapshot(self._tree, self._num_items, self._subtotal, self._menu._version)
+
+    def enable_undo(self, limit=100):
+        """starts keeping the order's last limit versions for undo() and redo()."""
+        if limit < 1:
+            raise ValueError("Undo limit must be at least 1.")
+        self._history = _OrderHistory(self.snapshot(), limit)
+
+    def _record(self):
+        """keeps the order's new version for undo, if undo is enabled."""
+        history = self._history
+        if history is not None and not history.replaying:
+            history.push(self.snapshot())
+
+    def can_undo(self):
+        return self._history is not None and self._history.position > 0
+
+    def can_redo(self):
+        history = self._history
+        return history is not None and history.position < len(history.versions) - 1
+
+    def undo(self):
+        """puts the order back as it was before its last change; returns False if there is none."""
+        if not self.can_undo():
+            return False
+        position = self._history.position - 1
+        self._restore(self._history.versions[position])
+        self._history.position = position
+        return True
+
+    def redo(self):
+        """reapplies the last change undo() took back; returns False if there is none."""
+        if not self.can_redo():
+            return False
+        position = self._history.position + 1
+        self._restore(self._history.versions[position])
+        self._history.position = position
+        return True
+
+    def _restore(self, snapshot):
+        """brings the lines to a snapshot's, touching only the lines that differ.
+
+        mutable items whose configuration changed since are put back to the
+        snapshot's spec, which other orders holding them will see.
+        """
+        current, target = self.snapshot()._tree, snapshot._tree
+        lines, priced, line_ids, line_items = self._lines, self._priced, self._line_ids, self._line_items
+        changed = list(current.changed_keys(target))
+        # an item shared with an order on another menu must still sell there;
+        # check them all before anything changes.
+        for line_id in changed:
+            record = target.get(line_id)
+            if record is not None and record[0].get_spec() is not record[1]:
+                record[0]._check_spec(record[1])
+        reopened = False
+        self._history.replaying = True
+        try:
+            # close lines first: an item may sit on a different line in the target.
+            for line_id in changed:
+                if target.get(line_id) is None:
+                    self._close_line(current.get(line_id)[0])
+            for line_id in changed:
+                record = target.get(line_id)
+                if record is None:
+                    continue
+                item, spec, quantity, cents = record
+                if item.get_spec() is not spec:
+                    item._restore(spec)
+                if item not in lines:
+                    line_ids[item] = line_id
+                    line_items[line_id] = item
+                    item._watch(self)
+                    reopened = True
+                lines[item] = quantity
+                priced[item] = cents
+                self._entries.pop(item, None)
+        finally:
+            self._history.replaying = False
+        if reopened:
+            # lines reopened by undo go back to their place in line id order.
+            self._line_items = line_items = dict(sorted(line_items.items()))
+            self._lines = {item: lines[item] for item in line_items.values()}
+        self._tree = target
+        self._pending.clear()
+        self._num_items = snapshot._num_items
+        self._subtotal = snapshot._subtotal
+        self._receipt = None
+
+
+class OrderSnapshot:
+    """A frozen version of an order's lines and totals, see Order.snapshot.
+
+    lines hold the spec of each item as it was when the snapshot was taken,
+    with the unit price the order charged for it then.
+    """
+
+    __slots__ = ("_tree", "_num_items", "_subtotal", "_menu_version")
+
+    def __init__(self, tree, num_items, subtotal, menu_version):
+        self._tree = tree
+        self._num_items = num_items
+        self._subtotal = subtotal
+        self._menu_version = menu_version
+
+    def iter_lines(self):
+        """yields (line id, spec, quantity) for every line, oldest line first."""
+        for line_id, (item, spec, quantity, cents) in self._tree.items():
+            yield line_id, spec, quantity
+
+    def get_lines(self):
+        """returns a list of (spec, quantity) pairs, one per line."""
+        return [(spec, quantity) for _, spec, quantity in self.iter_lines()]
+
+    def get_num_items(self):
+        return self._num_items
+
+    def get_subtotal_cents(self):
+        return self._subtotal
+
+    def get_tax_cents(self):
+        return tax_cents(self._subtotal)
+
+    def get_grand_total_cents(self):
+        return self._subtotal + tax_cents(self._subtotal)
+
+    def get_receipt(self):
+        """builds the receipt the order had when the snapshot was taken, amounts in dollars."""
+        subtotal = self._subtotal
+        tax = tax_cents(subtotal)
+        return {
+            "number_drinks": self._num_items,
+            "drinks": [_serializer_for(type(spec))(spec, quantity, cents)
+                       for _, (item, spec, quantity, cents) in self._tree.items()],
+            "subtotal": to_dollars(subtotal),
+            "tax": to_dollars(tax),
+            "grand_total": to_dollars(subtotal + tax),
+            "menu_version": self._menu_version
+        }
+
+
+class _OrderHistory:
+    """the versions of an order kept for undo and redo, oldest first."""
+
+    __slots__ = ("versions", "position", "limit", "replaying")
+
+    def __init__(self, snapshot, limit):
+        self.versions = [snapshot]
+        self.position = 0  # index of the version the order is at
+        self.limit = limit
+        self.replaying = False  # set while undo or redo changes the order
+
+    def push(self, snapshot):
+        """keeps a new version, dropping any redo versions and the oldest past the limit."""
+        versions = self.versions
+        del versions[self.position + 1:]
+        versions.append(snapshot)
+        if len(versions) > self.limit + 1:
+            del versions[0]
+        self.position = len(versions) - 1
+
+
+class OrderEdit(_Edit):
+    """A staged edit of an order's lines, see Order.begin_edit.
+
+    adds and removals are netted per item, and the order's totals and
+    receipt cache are updated once at commit.
+    """
+
+    __slots__ = ("_counts",)
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._counts = {}  # item -> net units added
+
+    def add_item(self, item, quantity=1):
+        if not isinstance(item, MenuItem):
+            raise ValueError("You can only add menu items to this order.")
+        if type(item) not in _line_serializers:
+            _serializer_for(type(item))
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1.")
+        self._counts[item] = self._counts.get(item, 0) + quantity
+        return self
+
+    def decrement_item(self, item, quantity=1):
+        held = self._target._lines.get(item, 0) + self._counts.get(item, 0)
+        if not 1 <= quantity <= held:
+            raise ValueError(f"The order holds {held} of that item, cannot remove {quantity}.")
+        self._counts[item] = self._counts.get(item, 0) - quantity
+        return self
+
+    def _check(self):
+        lines = self._target._lines
+        for item, change in self._counts.items():
+            if lines.get(item, 0) + change < 0:
+                raise ValueError("The order changed since the edit began, cannot remove that item.")
+
+    def _apply(self):
+        self._target._apply_counts(self._counts)
@@ -0,0 +1,67 @@
+"""Benchmark: building a 300-drink event order item by item vs in bulk.
+
+The loop path calls Drink(), add_flavor() and Order.add_item() per drink;
+the bulk path calls Drink.from_specs() and Order.add_items() once.
+
+    python benchmarks/bench_bulk.py [drinks_per_order] [orders]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import Drink, Food, Order, Base, Size, Flavor  # noqa: E402
+
+
+def make_specs(count):
+    """returns count (base, size, flavors) tuples cycling through the menu."""
+    bases, sizes, flavors = list(Base), list(Size), list(Flavor)
+    return [(bases[i % len(bases)], sizes[i % len(sizes)], (flavors[i % len(flavors)],))
+            for i in range(count)]
+
+
+def loop_order(specs, foods):
+    order = Order()
+    for base, size, flavors in specs:
+        drink = Drink(base, size)
+        for flavor in flavors:
+            drink.add_flavor(flavor)
+        order.add_item(drink)
+    for food_type in foods:
+        order.add_item(Food(food_type))
+    return order
+
+
+def bulk_order(specs, foods):
+    order = Order()
+    order.add_items(Drink.from_specs(specs))
+    order.add_items(Food.from_specs(foods))
+    return order
+
+
+def timed(func, specs, foods, orders):
+    start = time.perf_counter()
+    for _ in range(orders):
+        order = func(specs, foods)
+    return time.perf_counter() - start, order
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    orders = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    specs = make_specs(count)
+    foods = [list(Food._food_price)[i % len(Food._food_price)] for i in range(count // 3)]
+
+    loop_time, loop_result = timed(loop_order, specs, foods, orders)
+    bulk_time, bulk_result = timed(bulk_order, specs, foods, orders)
+    assert loop_result.get_subtotal_cents() == bulk_result.get_subtotal_cents()
+
+    print(f"{orders:,} orders of {count} drinks and {len(foods)} food items")
+    print(f"per-item loop: {loop_time / orders * 1e6:8.1f} us per order")
+    print(f"bulk:          {bulk_time / orders * 1e6:8.1f} us per order")
+    print(f"speedup:       {loop_time / bulk_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark: rebuilding every store's menu after a corporate change.
+
+A franchise of stores in 20 regions, each region and store overriding a
+price or withdrawing an item or two; the benchmark times building every
+store's menu, rebuilding them all after a corporate price change, and
+pricing items against a store menu.
+
+    python benchmarks/bench_franchise.py [stores]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import DrinkSpec, FoodSpec, Base, Size, Flavor, get_menu  # noqa: E402
+from franchise_menus import Franchise, MenuOverlay  # noqa: E402
+
+
+def make_franchise(stores, regions=20):
+    bases, foods = list(Base), list(get_menu()._food_prices)
+    toppings = list(get_menu()._food_toppings)
+    franchise = Franchise()
+    for region in range(regions):
+        franchise.set_region(region, MenuOverlay(size_costs={Size.MEGA: 215 + region % 5 * 10}))
+    for store in range(stores):
+        if store % 3 == 0:
+            overlay = MenuOverlay(bases={bases[store % len(bases)]: False})
+        elif store % 3 == 1:
+            overlay = MenuOverlay(food_toppings={toppings[store % len(toppings)]: 50 + store % 7 * 5})
+        else:
+            overlay = MenuOverlay(food_prices={foods[store % len(foods)]: None})
+        franchise.set_store(store, store % regions, overlay)
+    return franchise
+
+
+def main():
+    stores = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    start = time.perf_counter()
+    franchise = make_franchise(stores)
+    build_time = time.perf_counter() - start
+
+    corporate = franchise.get_corporate_menu()
+    start = time.perf_counter()
+    franchise.set_corporate_menu(corporate.revise(flavor_cost=corporate._flavor_cost + 5))
+    rebuild_time = time.perf_counter() - start
+    menus = franchise.get_store_menus()
+    tables = {kind: len({id(getattr(menu, kind)) for menu in menus.values()})
+              for kind in ("_drinks", "_foods", "_ice_storms")}
+
+    menu = menus[1]
+    specs = [DrinkSpec(base, Size.LARGE, [Flavor.LIME]) for base in Base if base in menu._bases]
+    specs += [FoodSpec(food, ["chili"]) for food in menu._food_prices]
+    count = 1_000_000
+    rounds = count // len(specs)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for spec in specs:
+            spec._price_in(menu)
+    price_time = time.perf_counter() - start
+
+    print(f"{stores:,} stores, distinct tables: " + ", ".join(f"{kind[1:]} {n}" for kind, n in tables.items()))
+    print(f"build one by one:   {build_time * 1000:8.1f} ms")
+    print(f"corporate rebuild:  {rebuild_time * 1000:8.1f} ms  ({stores / rebuild_time:,.0f} stores/s)")
+    print(f"store pricing:      {price_time / (rounds * len(specs)) * 1e9:8.1f} ns per item")
+
+
+if __name__ == "__main__":
+    main()
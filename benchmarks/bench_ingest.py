@@ -0,0 +1,84 @@
+"""Benchmark: importing a JSON Lines POS export field by field vs with pos_ingest.
+
+The per-field path turns every row into Drink or Food objects with Base(),
+Size() and Flavor() enum lookups and food_type.lower(), as imports did
+before pos_ingest; the other path is pos_ingest.read_orders.
+
+    python benchmarks/bench_ingest.py [rows]
+"""
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import Drink, Food, Order, Base, Size, Flavor  # noqa: E402
+from pos_ingest import read_orders  # noqa: E402
+
+
+def make_export(count):
+    """returns count JSON Lines rows of drinks and food, ten rows per order."""
+    bases, sizes, flavors = list(Base), list(Size), list(Flavor)
+    foods = list(Food._food_price)
+    rows = []
+    for i in range(count):
+        if i % 3 == 2:
+            row = {"order": i // 10, "kind": "food", "item": foods[i % len(foods)], "options": ["ketchup"]}
+        else:
+            row = {"order": i // 10, "kind": "drink", "item": bases[i % len(bases)].value,
+                   "size": sizes[i % len(sizes)].value, "options": [flavors[i % len(flavors)].value]}
+        row["quantity"] = i % 4 + 1
+        rows.append(json.dumps(row) + "\n")
+    return "".join(rows)
+
+
+def per_field(text):
+    orders = []
+    order, current = None, None
+    for line in io.StringIO(text):
+        row = json.loads(line)
+        if order is None or row["order"] != current:
+            order, current = Order(), row["order"]
+            orders.append(order)
+        if row["kind"] == "drink":
+            item = Drink(Base(row["item"]), Size(row["size"]))
+            for flavor in row["options"]:
+                item.add_flavor(Flavor(flavor))
+        else:
+            item = Food(row["item"].lower())
+            for topping in row["options"]:
+                item.add_topping(topping)
+        order.add_item(item, row["quantity"])
+    return orders
+
+
+def streamed(text):
+    return [order for _, order in read_orders(io.StringIO(text))]
+
+
+def best_of(func, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    text = make_export(count)
+    field_time, field_orders = best_of(per_field, text)
+    stream_time, stream_orders = best_of(streamed, text)
+    assert [o.get_grand_total_cents() for o in field_orders] == [o.get_grand_total_cents() for o in stream_orders]
+
+    print(f"{count:,} rows, {len(stream_orders):,} orders")
+    print(f"per-field enums: {field_time * 1000:8.1f} ms")
+    print(f"pos_ingest:      {stream_time * 1000:8.1f} ms")
+    print(f"speedup:         {field_time / stream_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
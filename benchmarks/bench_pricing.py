@@ -0,0 +1,85 @@
+"""Benchmark: totalling an order of 1M items in float dollars vs integer cents.
+
+The float path reproduces the pre-cents item and order arithmetic (float
+price tables, a round() per food item, float tax); the cents path is what
+Order does now.
+
+    python benchmarks/bench_pricing.py [num_items]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import Drink, Food, Base, Size, Flavor, tax_cents, to_dollars  # noqa: E402
+
+
+def build_items(count):
+    """builds a repeating mix of drinks and food."""
+    bases, sizes, flavors = list(Base), list(Size), list(Flavor)
+    foods = list(Food._food_price)
+    items = []
+    for i in range(count):
+        if i % 3 == 2:
+            food = Food(foods[i % len(foods)])
+            food.add_topping("chili")
+            items.append(food)
+        else:
+            drink = Drink(bases[i % len(bases)], sizes[i % len(sizes)])
+            drink.add_flavor(flavors[i % len(flavors)])
+            items.append(drink)
+    return items
+
+
+# the float price tables as they were before the move to cents.
+FLOAT_SIZE_COSTS = {size: cents / 100 for size, cents in Drink._size_costs.items()}
+FLOAT_FOOD_PRICE = {name: cents / 100 for name, cents in Food._food_price.items()}
+FLOAT_TOPPING_PRICE = {name: cents / 100 for name, cents in Food._topping_price.items()}
+
+
+def float_item_total(item):
+    """the old per-item float accessors."""
+    if isinstance(item, Drink):
+        return FLOAT_SIZE_COSTS[item._size] + 0.15 * len(item._flavors)
+    toppings_cost = sum(FLOAT_TOPPING_PRICE[topping] for topping in item._toppings)
+    return round(FLOAT_FOOD_PRICE[item._type] + toppings_cost, 2)
+
+
+def float_total(items):
+    """the old float path: sum dollars, then multiply by the tax rate."""
+    subtotal = sum(float_item_total(item) for item in items)
+    tax = subtotal * 0.0725
+    return round(subtotal + tax, 2)
+
+
+def cents_total(items):
+    """the integer-cent path used by Order."""
+    subtotal = sum(item.get_total_cents() for item in items)
+    return subtotal + tax_cents(subtotal)
+
+
+def best_of(func, arg, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    items = build_items(count)
+
+    float_time, float_result = best_of(float_total, items)
+    cents_time, cents_result = best_of(cents_total, items)
+
+    print(f"items:        {count:,}")
+    print(f"float path:   {float_time * 1000:8.2f} ms  -> ${float_result}")
+    print(f"cents path:   {cents_time * 1000:8.2f} ms  -> ${to_dollars(cents_result)}")
+    print(f"speedup:      {float_time / cents_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark: replaying order events and restoring a day's open tabs from a snapshot.
+
+Events are logged by LoggedOrders filling tabs of drinks and food; the
+benchmark times TabState.apply over the whole log, TabState.from_bytes on
+the day's snapshot, and rebuilding the open tabs as Orders.
+
+    python benchmarks/bench_replay.py [tabs]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import Drink, Food, Base, Size, Flavor  # noqa: E402
+from order_events import EventLog, TabState  # noqa: E402
+
+
+def make_log(tabs):
+    """returns an in-memory log of tabs of ten lines each; every other tab is paid."""
+    bases, sizes, flavors = list(Base), list(Size), list(Flavor)
+    foods = list(Food._food_price)
+    log = EventLog(snapshot_every=1 << 60)
+    for tab in range(tabs):
+        order = log.open_tab(tab)
+        for i in range(10):
+            if i % 3 == 2:
+                item = Food(foods[(tab + i) % len(foods)])
+                order.add_item(item, i % 4 + 1)
+                item.add_topping("ketchup")
+            else:
+                item = Drink(bases[(tab + i) % len(bases)], sizes[i % len(sizes)])
+                order.add_item(item, i % 4 + 1)
+                item.add_flavor(flavors[(tab + i) % len(flavors)])
+        order.decrement_item(item)
+        if tab % 2:
+            order.pay()
+    return log
+
+
+def main():
+    tabs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    log = make_log(tabs)
+    events = log._events
+
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        state = TabState()
+        state.apply(events)
+        best = min(best, time.perf_counter() - start)
+    count = len(log)
+
+    snapshot = state.to_bytes()
+    start = time.perf_counter()
+    restored = TabState.from_bytes(snapshot)
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    open_tabs = restored.get_open_tabs()
+    rebuild_time = time.perf_counter() - start
+
+    print(f"{count:,} events, {len(events) * events.itemsize / 1e6:.1f} MB")
+    print(f"replay:          {best * 1000:8.1f} ms  ({count / best / 1e6:.2f} M events/s)")
+    print(f"snapshot:        {len(snapshot) / 1e6:8.2f} MB")
+    print(f"load snapshot:   {load_time * 1000:8.1f} ms")
+    print(f"rebuild {len(open_tabs):,} open tabs: {rebuild_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
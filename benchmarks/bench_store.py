@@ -0,0 +1,78 @@
+"""Benchmark: sustained order inserts into the SQLite store while reports run.
+
+A writer saves batches of orders for a fixed time while reader threads,
+each with its own connection, run the daily, kind and flavor reports in a
+loop. Runs once saving an order per transaction and once in batches.
+
+    python benchmarks/bench_store.py [seconds] [readers] [batch]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import Order, Base, Size, Flavor, DrinkSpec, FoodSpec  # noqa: E402
+from order_store import OrderStore  # noqa: E402
+
+
+def make_orders(count):
+    bases, sizes, flavors = list(Base), list(Size), list(Flavor)
+    orders = []
+    for i in range(count):
+        order = Order()
+        order.add_item(DrinkSpec(bases[i % len(bases)], sizes[i % len(sizes)],
+                                 [flavors[i % len(flavors)], flavors[(i + 1) % len(flavors)]]), i % 3 + 1)
+        order.add_item(FoodSpec("hotdog", ["ketchup"] if i % 2 else []))
+        orders.append(order)
+    return orders
+
+
+def run(path, seconds, readers, batch):
+    """returns (orders saved per second, reports run per second)."""
+    stop = threading.Event()
+    reports = [0] * readers
+
+    def read(slot):
+        with OrderStore(path) as store:
+            while not stop.is_set():
+                store.daily_totals("2026-01-01", "2026-12-31")
+                store.sales_by_kind("2026-10-01", "2026-10-07")
+                store.option_counts("drink", "2026-10-01", "2026-10-07")
+                reports[slot] += 3
+
+    threads = [threading.Thread(target=read, args=(slot,)) for slot in range(readers)]
+    for thread in threads:
+        thread.start()
+    orders = make_orders(batch)
+    start_day = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    saved = 0
+    with OrderStore(path) as store:
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            when = start_day + timedelta(seconds=saved)
+            store.save_orders([(saved + i, order, when) for i, order in enumerate(orders)])
+            saved += batch
+        elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return saved / elapsed, sum(reports) / elapsed
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    print(f"{seconds:g} s per run, {readers} reader threads, 2 lines and 2-3 options per order")
+    for size in (1, batch):
+        with tempfile.TemporaryDirectory() as directory:
+            saves, reads = run(os.path.join(directory, "orders.db"), seconds, readers, size)
+        print(f"batch of {size:>4}: {saves:10,.0f} orders/s saved, {reads:8,.0f} reports/s alongside")
+
+
+if __name__ == "__main__":
+    main()
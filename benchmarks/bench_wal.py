@@ -0,0 +1,72 @@
+"""Benchmark: order mutations per second under each write-ahead log sync policy.
+
+Registers are threads, each filling its own tabs through one EventLog with
+a write-ahead log; the benchmark counts the events logged per second, and
+checks that recovery finds every event on disk once the log is closed.
+
+    python benchmarks/bench_wal.py [registers] [mutations per register]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import Drink, Food, Base, Size, Flavor  # noqa: E402
+from order_events import EventLog  # noqa: E402
+from order_wal import SyncEachMutation, SyncEveryMilliseconds, SyncEveryRecords  # noqa: E402
+
+POLICIES = [
+    ("fsync per mutation", SyncEachMutation),
+    ("fsync every 5 ms", lambda: SyncEveryMilliseconds(5)),
+    ("fsync every 256 records", lambda: SyncEveryRecords(256)),
+]
+
+
+def register(log, number, mutations):
+    """fills tabs of ten lines, three events per drink, until mutations events are logged."""
+    bases, flavors = list(Base), list(Flavor)
+    tab = number << 20
+    done = 0
+    while done < mutations:
+        order = log.open_tab(tab)
+        for i in range(10):
+            drink = Drink(bases[i % len(bases)], Size.MEDIUM)
+            order.add_item(drink)
+            drink.add_flavor(flavors[i % len(flavors)])
+            order.add_item(Food("french_fries"))
+        order.pay()
+        done += 31
+        tab += 1
+
+
+def run(policy, registers, mutations):
+    with tempfile.TemporaryDirectory() as directory:
+        log = EventLog(directory, sync=policy())
+        threads = [threading.Thread(target=register, args=(log, number, mutations))
+                   for number in range(registers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.close()
+        elapsed = time.perf_counter() - start
+        count = len(log)
+        assert len(EventLog.recover(directory)) == count
+    return count, elapsed
+
+
+def main():
+    registers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    mutations = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    print(f"{registers} registers, about {mutations:,} mutations each")
+    for name, policy in POLICIES:
+        count, elapsed = run(policy, registers, mutations)
+        print(f"{name:24} {count / elapsed:12,.0f} mutations/s")
+
+
+if __name__ == "__main__":
+    main()
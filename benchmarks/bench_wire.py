@@ -0,0 +1,70 @@
+"""Benchmark: shipping receipts as JSON vs the binary wire format.
+
+Encodes and decodes the receipts of many mixed orders both ways and
+reports the throughput and the bytes per receipt.
+
+    python benchmarks/bench_wire.py [orders] [lines_per_order]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import Order, Base, Size, Flavor, DrinkSpec, FoodSpec  # noqa: E402
+from wire_format import encode_receipt, decode_receipt, read_receipt, encode_order, decode_order  # noqa: E402
+
+
+def make_orders(count, lines):
+    bases, sizes, flavors = list(Base), list(Size), list(Flavor)
+    foods = ["hotdog", "corndog", "nacho_chips", "tater_tots"]
+    orders = []
+    for i in range(count):
+        order = Order()
+        for line in range(lines):
+            n = i + line
+            if line % 3 == 2:
+                order.add_item(FoodSpec(foods[n % len(foods)], ["ketchup"]), n % 3 + 1)
+            else:
+                order.add_item(DrinkSpec(bases[n % len(bases)], sizes[n % len(sizes)],
+                                         [flavors[n % len(flavors)]]), n % 5 + 1)
+        orders.append(order)
+    return orders
+
+
+def timed(func, values):
+    start = time.perf_counter()
+    result = [func(value) for value in values]
+    return time.perf_counter() - start, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    orders = make_orders(count, lines)
+    for order in orders:
+        order.get_receipt()  # both paths start from a priced order with its receipt cached
+
+    json_encode, texts = timed(lambda order: json.dumps(order.get_receipt()).encode(), orders)
+    json_decode, _ = timed(json.loads, texts)
+    wire_encode, messages = timed(encode_receipt, orders)
+    wire_decode, receipts = timed(decode_receipt, messages)
+    assert receipts == [json.loads(text) for text in texts]
+    read_time, _ = timed(read_receipt, messages)
+    order_encode, order_messages = timed(encode_order, orders)
+    order_decode, _ = timed(decode_order, order_messages)
+
+    print(f"{count:,} receipts of {lines} lines")
+    print(f"json:          {sum(map(len, texts)) / count:7.1f} bytes, "
+          f"encode {count / json_encode:10,.0f}/s, decode {count / json_decode:10,.0f}/s")
+    print(f"wire receipt:  {sum(map(len, messages)) / count:7.1f} bytes, "
+          f"encode {count / wire_encode:10,.0f}/s, decode {count / wire_decode:10,.0f}/s")
+    print(f"wire, cents only:              encode {count / wire_encode:10,.0f}/s, "
+          f"decode {count / read_time:10,.0f}/s")
+    print(f"wire order:    {sum(map(len, order_messages)) / count:7.1f} bytes, "
+          f"encode {count / order_encode:10,.0f}/s, decode {count / order_decode:10,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Memory report: bytes per object with and without __slots__.
+
+Builds a mix of drinks, food, ice storms and orders (one order per ten
+items) and measures the allocations with tracemalloc. The "before" run uses
+dict-backed twins of the same classes: identical methods, no __slots__.
+
+    python benchmarks/mem_layout.py [num_items]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Drink_Project import (Drink, Food, IceStorm, Order, Base, Size, Flavor, IceStormFlavor,  # noqa: E402
+                           register_line_serializer, _line_serializers)
+
+
+def dict_backed(classes):
+    """returns copies of classes whose instances keep their attributes in a __dict__.
+
+    the copies' methods see each other under the original names, so type
+    checks such as Order.add_item's accept the copies, and they share the
+    originals' receipt line serializers.
+    """
+    twins = {}
+    module_globals = dict(vars(sys.modules[classes[0].__module__]))
+    for cls in classes:
+        namespace = {}
+        for name, value in vars(cls).items():
+            if name in ("__slots__", "__dict__", "__weakref__") or name in cls.__slots__:
+                continue
+            if isinstance(value, types.FunctionType):
+                value = types.FunctionType(value.__code__, module_globals, value.__name__,
+                                           value.__defaults__, value.__closure__)
+            namespace[name] = value
+        twins[cls.__name__] = twin = type(cls.__name__, cls.__bases__, namespace)
+        if cls in _line_serializers:
+            register_line_serializer(twin)(_line_serializers[cls])
+    module_globals.update(twins)
+    return tuple(twins[cls.__name__] for cls in classes)
+
+
+def build(count, drink_cls, food_cls, ice_storm_cls, order_cls):
+    """builds count items, ordered ten to an order."""
+    bases, sizes, flavors = list(Base), list(Size), list(Flavor)
+    foods = list(Food._food_price)
+    ice_storms = list(IceStormFlavor)
+    orders = []
+    order = None
+    for i in range(count):
+        if i % 10 == 0:
+            order = order_cls()
+            orders.append(order)
+        kind = i % 4
+        if kind == 3:
+            item = food_cls(foods[i % len(foods)])
+            item.add_topping("ketchup")
+        elif kind == 2:
+            item = ice_storm_cls(ice_storms[i % len(ice_storms)])
+            item.add_topping("pecans")
+        else:
+            item = drink_cls(bases[i % len(bases)], sizes[i % len(sizes)])
+            item.add_flavor(flavors[i % len(flavors)])
+        order.add_item(item)
+    return orders
+
+
+def measure(count, classes):
+    """returns the bytes allocated per item while building count items."""
+    gc.collect()
+    tracemalloc.start()
+    orders = build(count, *classes)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del orders
+    gc.collect()
+    return used / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    slotted = (Drink, Food, IceStorm, Order)
+    unslotted = dict_backed(slotted)
+
+    print(f"python {sys.version.split()[0]}, {count:,} mixed items, one order per 10 items")
+    for cls in slotted:
+        print(f"  {cls.__name__:<9} shallow size: __slots__ {sys.getsizeof(cls.__new__(cls)):>4} bytes")
+    before = measure(count, unslotted)
+    after = measure(count, slotted)
+    print(f"before (__dict__): {before:8.1f} bytes per item, orders included")
+    print(f"after (__slots__): {after:8.1f} bytes per item, orders included")
+    print(f"saved:             {before - after:8.1f} bytes per item ({1 - after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
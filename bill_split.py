@@ -0,0 +1,166 @@
+"""Splitting an order's bill between payers, to the exact cent.
+
+A split policy says which share of every order line each payer takes:
+EvenSplit shares everything N ways, BySeat gives each line to the seat (or
+seats) it was served to, and ByItem hands out units of a line to payers.
+split_order() works out every payer's exact share, then hands out whole
+cents of the subtotal and of the tax by largest remainder, so the
+sub-bills always add up to the order's grand total.
+"""
+import heapq
+from fractions import Fraction
+
+
+def allocate_cents(total, weights):
+    """splits total cents in proportion to weights, returning one int per weight.
+
+    every part gets the floor of its exact share, and the cents left over go
+    one each to the largest remainders, earlier weights winning ties, so the
+    parts add up to total exactly and the same input always splits the
+    same way. weights are non-negative ints or Fractions.
+    """
+    weight_sum = sum(weights)
+    if not weight_sum:
+        if total:
+            raise ValueError("Cannot split a non-zero amount with no weights.")
+        return [0] * len(weights)
+    parts = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        share = Fraction(total * weight) / weight_sum
+        part = share.numerator // share.denominator
+        parts.append(part)
+        remainders.append((share - part, -index))
+    for _, index in heapq.nlargest(total - sum(parts), remainders):
+        parts[-index] += 1
+    return parts
+
+
+class EvenSplit:
+    """Every payer pays the same share of every line. payers are numbered from 1."""
+
+    __slots__ = ("_ways",)
+
+    def __init__(self, ways):
+        if ways < 1:
+            raise ValueError("Split at least 1 way.")
+        self._ways = ways
+
+    def assign(self, lines):
+        """returns payer -> tuple of (line id, item, quantity, share of the line)."""
+        share = Fraction(1, self._ways)
+        shared = tuple((line_id, item, quantity, share) for line_id, item, quantity in lines)
+        # every payer holds the same tuple, so the work does not grow with payers times lines.
+        return {payer: shared for payer in range(1, self._ways + 1)}
+
+
+class BySeat:
+    """Each line is paid by the seat it was served to.
+
+    seats maps a line id to a seat, or to a tuple of seats that split that
+    line evenly. every line of the order must be mapped.
+    """
+
+    __slots__ = ("_seats",)
+
+    def __init__(self, seats):
+        self._seats = dict(seats)
+
+    def assign(self, lines):
+        bills = {}
+        seats = self._seats
+        for line_id, item, quantity in lines:
+            seat = seats.get(line_id)
+            if seat is None:
+                raise ValueError(f"Line {line_id} is not assigned to a seat.")
+            group = seat if isinstance(seat, tuple) else (seat,)
+            if not group:
+                raise ValueError(f"Line {line_id} is not assigned to a seat.")
+            share = Fraction(1, len(group))
+            for payer in group:
+                bills.setdefault(payer, []).append((line_id, item, quantity, share))
+        return bills
+
+
+class ByItem:
+    """Payers take units of each line.
+
+    units maps a line id to {payer: number of units}; the units of a line
+    must add up to its quantity.
+    """
+
+    __slots__ = ("_units",)
+
+    def __init__(self, units):
+        self._units = dict(units)
+
+    def assign(self, lines):
+        bills = {}
+        units = self._units
+        for line_id, item, quantity in lines:
+            taken = units.get(line_id)
+            if taken is None:
+                raise ValueError(f"Line {line_id} is not assigned to a payer.")
+            if sum(taken.values()) != quantity or min(taken.values(), default=0) < 0:
+                raise ValueError(f"Line {line_id} holds {quantity} units, assign each exactly once.")
+            for payer, count in taken.items():
+                if count:
+                    bills.setdefault(payer, []).append((line_id, item, quantity, Fraction(count, quantity)))
+        return bills
+
+
+class SubBill:
+    """One payer's part of a split order, with its own tax."""
+
+    __slots__ = ("_payer", "_lines", "_subtotal", "_tax")
+
+    def __init__(self, payer, lines, subtotal_cents, tax_cents):
+        self._payer = payer
+        self._lines = lines
+        self._subtotal = subtotal_cents
+        self._tax = tax_cents
+
+    def get_payer(self):
+        return self._payer
+
+    def get_lines(self):
+        """returns (line id, item, quantity, share) for every line the payer pays part of."""
+        return list(self._lines)
+
+    def get_subtotal_cents(self):
+        return self._subtotal
+
+    def get_tax_cents(self):
+        return self._tax
+
+    def get_grand_total_cents(self):
+        return self._subtotal + self._tax
+
+    def __repr__(self):
+        return f"SubBill({self._payer!r}, subtotal={self._subtotal}, tax={self._tax})"
+
+
+def split_order(order, policy):
+    """splits an order's bill with a policy, returning one SubBill per payer.
+
+    the subtotal is split in proportion to each payer's exact share of the
+    line totals, and the order's tax in proportion to the split subtotals,
+    each by allocate_cents(). the sub-bills' subtotals, taxes and grand
+    totals add up to the order's.
+    """
+    lines = list(order.iter_lines())
+    bills = policy.assign(lines)
+    unit_cents = {line_id: order.get_unit_cents(item) for line_id, item, _ in lines}
+    exact = []
+    amounts = {}  # id of a payer's lines -> their exact total, for lines shared by every payer
+    for payer_lines in bills.values():
+        amount = amounts.get(id(payer_lines))
+        if amount is None:
+            amount = amounts[id(payer_lines)] = sum(
+                (unit_cents[line_id] * quantity * share for line_id, _, quantity, share in payer_lines),
+                Fraction(0))
+        exact.append(amount)
+    subtotals = allocate_cents(order.get_subtotal_cents(), exact)
+    taxes = allocate_cents(order.get_tax_cents(), subtotals)
+    return [SubBill(payer, payer_lines, subtotal, tax)
+            for (payer, payer_lines), subtotal, tax in zip(bills.items(), subtotals, taxes)]
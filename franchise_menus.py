@@ -0,0 +1,234 @@
+"""Franchise menus: the corporate menu, then a region's changes, then a store's.
+
+Every store sells the corporate Menu with a few changes layered on top,
+first its region's and then its own: a price raised, an item withdrawn.
+Each layer is a MenuOverlay, and a Franchise flattens the layers of every
+store into one Menu of its own, compiled to flat price tables like any
+other, so pricing at a store is one lookup however many layers made it:
+
+    franchise = Franchise()
+    franchise.set_region("north", MenuOverlay(food_toppings={"chili": 75}))
+    franchise.set_store(17, "north", MenuOverlay(bases={Base.LEAF_WINE: False}))
+    order = franchise.open_order(17)
+    drink = Drink(Base.SPRITE, Size.LARGE, menu=franchise.get_store_menu(17))
+
+an item made with a store's menu is checked and priced against it, and
+an order opened for a store refuses items and options the store has
+withdrawn, even on items made under another menu.
+
+Menus that price a kind of item alike share one table, so a store that
+only changes a topping costs a food table, and rebuilding every store after
+a corporate change rebuilds each distinct table once. Franchise.load()
+reads the corporate menu and every overlay from a JSON config.
+"""
+import json
+import threading
+from types import MappingProxyType
+
+from Drink_Project import Order, Menu, Base, Size, Flavor, IceStormFlavor, Food, IceStorm, get_menu
+
+# overlay field -> the options it may name; see Menu.
+_PRICED = {
+    "size_costs": frozenset(Size),
+    "food_prices": frozenset(Food.get_food_types()),
+    "food_toppings": frozenset(Food.get_topping_bits()),
+    "ice_storm_prices": frozenset(IceStormFlavor),
+    "ice_storm_toppings": frozenset(IceStorm.get_topping_bits()),
+}
+_SWITCHED = {
+    "bases": frozenset(Base),
+    "flavors": frozenset(Flavor),
+}
+
+
+class MenuOverlay:
+    """One layer's changes to the menu below it.
+
+    a price in cents puts an option on sale at that price, None withdraws
+    it. bases and drink flavors have no price of their own: True puts one on
+    sale and False withdraws it. options left out are as the menu below has
+    them.
+    """
+
+    __slots__ = ("_prices", "_switches", "_flavor_cost")
+
+    def __init__(self, size_costs=None, flavor_cost=None, bases=None, flavors=None, food_prices=None,
+                 food_toppings=None, ice_storm_prices=None, ice_storm_toppings=None):
+        given = {"size_costs": size_costs, "food_prices": food_prices, "food_toppings": food_toppings,
+                 "ice_storm_prices": ice_storm_prices, "ice_storm_toppings": ice_storm_toppings}
+        self._prices = {field: self._checked(field, changes, _PRICED[field])
+                        for field, changes in given.items() if changes}
+        self._switches = {field: self._checked(field, changes, _SWITCHED[field])
+                          for field, changes in (("bases", bases), ("flavors", flavors)) if changes}
+        for field, switches in self._switches.items():
+            if not all(type(on) is bool for on in switches.values()):
+                raise ValueError(f"Overlay {field} are switched on and off with True and False.")
+        self._flavor_cost = flavor_cost
+
+    @staticmethod
+    def _checked(field, changes, valid):
+        changes = dict(changes)
+        for option in changes:
+            if option not in valid:
+                raise ValueError(f"Unknown option {option!r} in overlay {field}.")
+        return changes
+
+    def apply(self, menu, version):
+        """returns the Menu this layer makes of menu, as the version given."""
+        fields = menu.get_fields()
+        changes = {}
+        for field, prices in self._prices.items():
+            merged = dict(fields[field])
+            for option, cents in prices.items():
+                if cents is None:
+                    merged.pop(option, None)
+                else:
+                    merged[option] = cents
+            changes[field] = merged
+        for field, switches in self._switches.items():
+            on_sale = set(fields[field])
+            for option, on in switches.items():
+                if on:
+                    on_sale.add(option)
+                else:
+                    on_sale.discard(option)
+            changes[field] = on_sale
+        if self._flavor_cost is not None:
+            changes["flavor_cost"] = self._flavor_cost
+        return menu.revise(version=version, **changes)
+
+    @classmethod
+    def from_config(cls, config):
+        """builds an overlay from a dict in the sections of Menu.from_config().
+
+        in "drinks", sizes map to cents or None, bases and flavors to true or
+        false, and flavor_cost is cents; in "food" and "ice_storms", items,
+        flavors and toppings map to cents or None.
+        """
+        drinks = config.get("drinks", {})
+        food = config.get("food", {})
+        ice_storms = config.get("ice_storms", {})
+        return cls(
+            size_costs={Size(size): cents for size, cents in drinks.get("sizes", {}).items()},
+            flavor_cost=drinks.get("flavor_cost"),
+            bases={Base(base): on for base, on in drinks.get("bases", {}).items()},
+            flavors={Flavor(flavor): on for flavor, on in drinks.get("flavors", {}).items()},
+            food_prices={name.lower(): cents for name, cents in food.get("items", {}).items()},
+            food_toppings={name.lower(): cents for name, cents in food.get("toppings", {}).items()},
+            ice_storm_prices={IceStormFlavor(flavor): cents
+                              for flavor, cents in ice_storms.get("flavors", {}).items()},
+            ice_storm_toppings={name.lower(): cents for name, cents in ice_storms.get("toppings", {}).items()})
+
+
+_NO_CHANGES = MenuOverlay()
+
+
+class Franchise:
+    """The menu of every store, flattened from the corporate menu, its region's overlay and its own.
+
+    every change rebuilds the menus of the stores it reaches: all of them
+    for the corporate menu, a region's stores for its overlay. the stores'
+    menus are then swapped in as a whole, read-copy-update style like the
+    menu being served, so get_store_menu() never takes a lock. every store
+    menu built gets a version of its own, newer than the corporate menu's and
+    any built before it, so a menu version names one price list and a
+    store's register can publish_menu() its menu as it changes.
+    """
+
+    __slots__ = ("_corporate", "_regions", "_stores", "_menus", "_version", "_lock")
+
+    def __init__(self, corporate=None):
+        """starts a franchise with no stores on a corporate Menu, by default the one being served."""
+        self._corporate = get_menu() if corporate is None else corporate
+        self._regions = {}  # region -> MenuOverlay
+        self._stores = {}  # store -> (region or None, MenuOverlay)
+        self._menus = MappingProxyType({})  # store -> Menu, replaced by every rebuild
+        self._version = self._corporate.get_version()
+        self._lock = threading.Lock()
+
+    def get_corporate_menu(self):
+        return self._corporate
+
+    def get_version(self):
+        """returns the version of the newest store menu built."""
+        return self._version
+
+    def set_corporate_menu(self, menu):
+        """replaces the corporate Menu and rebuilds every store's menu."""
+        with self._lock:
+            self._corporate = menu
+            self._rebuild(self._stores)
+
+    def set_region(self, region, overlay=None):
+        """sets a region's overlay, by default one changing nothing, and rebuilds its stores' menus."""
+        with self._lock:
+            self._regions[region] = _NO_CHANGES if overlay is None else overlay
+            self._rebuild([store for store, (in_region, _) in self._stores.items() if in_region == region])
+
+    def set_store(self, store, region=None, overlay=None):
+        """adds or changes a store in a region, or under the corporate menu alone, and builds its menu."""
+        with self._lock:
+            if region is not None and region not in self._regions:
+                raise ValueError(f"Unknown region {region!r}.")
+            self._stores[store] = (region, _NO_CHANGES if overlay is None else overlay)
+            self._rebuild([store])
+
+    def get_store_menu(self, store):
+        """returns the Menu a store sells."""
+        try:
+            return self._menus[store]
+        except KeyError:
+            raise ValueError(f"Unknown store {store!r}.") from None
+
+    def get_store_menus(self):
+        """returns store -> Menu for every store, as of the last rebuild."""
+        return self._menus
+
+    def open_order(self, store):
+        """returns a new Order priced with a store's menu."""
+        return Order(self.get_store_menu(store))
+
+    def _rebuild(self, stores):
+        """builds the menus of stores, each as a new version, and swaps them in."""
+        if not stores:
+            return
+        corporate, regions = self._corporate, self._regions
+        version = max(self._version, corporate.get_version())
+        region_menus = {None: corporate}
+        menus = dict(self._menus)
+        for store in stores:
+            region, overlay = self._stores[store]
+            below = region_menus.get(region)
+            if below is None:
+                below = region_menus[region] = regions[region].apply(corporate, corporate.get_version())
+            version += 1
+            menus[store] = overlay.apply(below, version)
+        self._version = version
+        self._menus = MappingProxyType(menus)
+
+    @classmethod
+    def from_config(cls, config):
+        """builds a franchise from a dict of "corporate", "regions" and "stores".
+
+        corporate is a menu config, by default the menu being served; regions
+        map to overlay configs, and stores to overlay configs that may name a
+        "region".
+        """
+        corporate = config.get("corporate")
+        franchise = cls(None if corporate is None else Menu.from_config(corporate))
+        with franchise._lock:
+            for region, overlay in config.get("regions", {}).items():
+                franchise._regions[region] = MenuOverlay.from_config(overlay)
+            for store, overlay in config.get("stores", {}).items():
+                region = overlay.get("region")
+                if region is not None and region not in franchise._regions:
+                    raise ValueError(f"Unknown region {region!r}.")
+                franchise._stores[store] = (region, MenuOverlay.from_config(overlay))
+            franchise._rebuild(franchise._stores)
+        return franchise
+
+    @classmethod
+    def load(cls, path):
+        """builds a franchise from a JSON config file, see from_config()."""
+        with open(path, encoding="utf-8") as file:
+            return cls.from_config(json.load(file))
@@ -0,0 +1,180 @@
+"""Columnar batches of orders, priced with vectorized NumPy operations.
+
+End-of-day settlement prices millions of lines at once. An OrderBatch keeps
+every line of many orders in parallel NumPy columns, plus an offsets column
+marking where each order's lines start, so totals come from a handful of
+array operations instead of a method call per item. A batch built from
+orders keeps the unit price each order charged, so it settles to the
+orders' receipts whatever menu is served meanwhile; a batch of raw SKUs is
+priced from a Menu's tables.
+"""
+import numpy as np
+
+from Drink_Project import (Order, Base, Size, Food, IceStormFlavor, SKU_DRINK, SKU_FOOD, SKU_ICE_STORM,
+                           TAX_BASIS_POINTS, decode_sku, get_menu, SIZE_BITS, FLAVOR_BITS, FOOD_TOPPING_BITS,
+                           ICE_STORM_TOPPING_BITS)
+
+# number of set bits of every 16-bit option mask.
+_POPCOUNT = np.array([mask.bit_count() for mask in range(1 << 16)], dtype=np.uint8)
+
+_menu_arrays = {}  # Menu -> its drink, food and ice storm price tables as arrays, -1 where not on sale
+
+
+def _price_arrays(menu):
+    arrays = _menu_arrays.get(menu)
+    if arrays is None:
+        arrays = tuple(np.array([-1 if cents is None else cents for cents in table], dtype=np.int64)
+                       for table in menu.get_price_tables())
+        _menu_arrays.clear()  # menus are replaced, not revisited; keep the latest
+        _menu_arrays[menu] = arrays
+    return arrays
+
+
+class OrderBatch:
+    """Many orders stored as columns, one row per order line.
+
+    kind, variant (base, food type or ice storm flavor ordinal), size,
+    options (flavor or topping mask), flavor_count and quantity each hold
+    one value per line. offsets has one entry per order plus one: the lines
+    of order i are rows offsets[i] to offsets[i + 1]. charged_cents, when
+    given, holds the unit price every line was charged, and is None
+    otherwise.
+    """
+
+    def __init__(self, kind, variant, size, options, quantity, offsets, charged_cents=None):
+        self.kind = np.asarray(kind, dtype=np.uint8)
+        self.variant = np.asarray(variant, dtype=np.uint8)
+        self.size = np.asarray(size, dtype=np.uint8)
+        self.options = np.asarray(options, dtype=np.uint16)
+        self.flavor_count = np.where(self.kind == SKU_DRINK, _POPCOUNT[self.options], 0).astype(np.uint8)
+        self.quantity = np.asarray(quantity, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.charged_cents = None if charged_cents is None else np.asarray(charged_cents, dtype=np.int64)
+        rows = len(self.kind)
+        if not (len(self.variant) == len(self.size) == len(self.options) == len(self.quantity) == rows):
+            raise ValueError("All line columns must have the same length.")
+        if self.charged_cents is not None and len(self.charged_cents) != rows:
+            raise ValueError("All line columns must have the same length.")
+        if len(self.offsets) == 0 or self.offsets[0] != 0 or self.offsets[-1] != rows \
+                or np.any(np.diff(self.offsets) < 0):
+            raise ValueError("Offsets must rise from 0 to the number of lines.")
+
+    @classmethod
+    def from_skus(cls, skus, quantity, offsets, charged_cents=None):
+        """builds a batch from per-line SKUs, quantities, order offsets and optionally unit prices charged."""
+        skus = np.asarray(skus, dtype=np.uint32)
+        return cls(skus >> 28, (skus >> 20) & 0xFF, (skus >> 16) & 0xF, skus & 0xFFFF,
+                   quantity, offsets, charged_cents)
+
+    @classmethod
+    def from_orders(cls, orders):
+        """builds a batch from Order objects, one row per order line, keeping the unit price each charged."""
+        skus = []
+        quantity = []
+        charged = []
+        offsets = [0]
+        for order in orders:
+            for item, count in order.get_lines():
+                skus.append(item.get_sku())
+                quantity.append(count)
+                charged.append(order.get_unit_cents(item))
+            offsets.append(len(skus))
+        return cls.from_skus(skus, quantity, offsets, charged)
+
+    def __len__(self):
+        """returns the number of orders in the batch."""
+        return len(self.offsets) - 1
+
+    def get_num_lines(self):
+        return len(self.kind)
+
+    def get_skus(self):
+        """returns the SKU of every line."""
+        return ((self.kind.astype(np.uint32) << 28) | (self.variant.astype(np.uint32) << 20)
+                | (self.size.astype(np.uint32) << 16) | self.options)
+
+    def to_orders(self, menu=None):
+        """rebuilds an Order for every order in the batch, holding specs.
+
+        the orders are priced with a Menu, by default the current one, not at
+        the charged_cents the batch may hold; settle the batch itself to get
+        the prices charged.
+        """
+        skus = self.get_skus().tolist()
+        quantity = self.quantity.tolist()
+        offsets = self.offsets.tolist()
+        orders = []
+        for start, end in zip(offsets, offsets[1:]):
+            order = Order(menu)
+            for row in range(start, end):
+                order.add_item(decode_sku(skus[row]), quantity[row])
+            orders.append(order)
+        return orders
+
+    def unit_cents(self, menu=None):
+        """returns the unit price of every line in cents.
+
+        without a menu, these are the prices charged if the batch has them;
+        otherwise lines are priced from a Menu's tables, by default the
+        current one's, and a line it does not sell raises ValueError.
+        """
+        if menu is None:
+            if self.charged_cents is not None:
+                return self.charged_cents
+            menu = get_menu()
+        drinks, foods, ice_storms = _price_arrays(menu)
+        kind = self.kind
+        variant = self.variant.astype(np.int64)
+        options = self.options.astype(np.int64)
+
+        is_drink = kind == SKU_DRINK
+        is_food = kind == SKU_FOOD
+        is_ice_storm = kind == SKU_ICE_STORM
+        if not np.all(is_drink | is_food | is_ice_storm):
+            raise ValueError("Batch holds lines of an unknown item kind.")
+        # a variant, size or option past its field would run into another row of the table.
+        spill = np.where(is_drink, (variant >= len(Base)) | (self.size >= len(Size)) | (options >> FLAVOR_BITS),
+                         np.where(is_food, (variant >= len(Food.get_food_types())) | self.size
+                                  | (options >> FOOD_TOPPING_BITS),
+                                  (variant >= len(IceStormFlavor)) | self.size
+                                  | (options >> ICE_STORM_TOPPING_BITS)))
+        if np.any(spill):
+            raise ValueError("Batch holds lines with variants, sizes or options their kind does not have.")
+        # price keys as in Drink_Project; rows of other kinds look up key 0 and are discarded.
+        drink = drinks[np.where(is_drink, ((variant << SIZE_BITS | self.size) << FLAVOR_BITS) | options, 0)]
+        food = foods[np.where(is_food, variant << FOOD_TOPPING_BITS | options, 0)]
+        ice_storm = ice_storms[np.where(is_ice_storm, variant << ICE_STORM_TOPPING_BITS | options, 0)]
+        cents = np.where(is_drink, drink, np.where(is_food, food, ice_storm))
+        if np.any(cents < 0):
+            raise ValueError(f"Batch holds lines not on menu version {menu.get_version()}.")
+        return cents
+
+    def line_cents(self, menu=None):
+        """returns every line's total (unit price times quantity) in cents."""
+        return self.unit_cents(menu) * self.quantity
+
+    def subtotals_cents(self, menu=None):
+        """returns every order's subtotal in cents, priced as unit_cents() prices."""
+        running = np.concatenate(([0], np.cumsum(self.line_cents(menu))))
+        return running[self.offsets[1:]] - running[self.offsets[:-1]]
+
+    def taxes_cents(self, subtotals=None, menu=None):
+        """returns every order's tax in cents, rounded half up as tax_cents() does."""
+        if subtotals is None:
+            subtotals = self.subtotals_cents(menu)
+        return (subtotals * TAX_BASIS_POINTS + 5000) // 10000
+
+    def grand_totals_cents(self, menu=None):
+        """returns every order's subtotal plus tax in cents."""
+        subtotals = self.subtotals_cents(menu)
+        return subtotals + self.taxes_cents(subtotals)
+
+    def settle(self, menu=None):
+        """returns the batch-wide subtotal, tax and grand total in cents."""
+        subtotals = self.subtotals_cents(menu)
+        taxes = self.taxes_cents(subtotals)
+        subtotal = int(subtotals.sum())
+        tax = int(taxes.sum())
+        return {"orders": len(self), "items": int(self.quantity.sum()),
+                "subtotal": subtotal, "tax": tax, "grand_total": subtotal + tax}
+
@@ -0,0 +1,346 @@
+"""An event log of order changes, replayed to rebuild open tabs.
+
+Every change to a LoggedOrder is appended to an EventLog as five ints:
+(event, tab, line id, x, y).
+
+    ITEM_ADDED      x = SKU (plus MUTABLE for a Drink, Food or IceStorm), y = units added
+    FLAVOR_ADDED    x = the flavor's bit in the SKU
+    TOPPING_ADDED   x = the topping's bit in the SKU
+    OPTIONS_SET     x = the line's new SKU, when options were removed or reset
+    ITEM_REMOVED    x = units removed
+    PAID            x = cents paid
+    VOIDED
+
+TabState.apply() replays events into two dicts keyed by tab and line id,
+one loop iteration and a dict update or two per event, without building
+any Order. Given a directory, the log appends events to events.log and
+every snapshot_every events writes the replayed state to snapshot.bin as
+a flat array of ints, so EventLog.recover() loads the snapshot and replays
+only the events after it.
+"""
+import os
+import struct
+import threading
+from array import array
+from itertools import chain
+
+from Drink_Project import Order, decode_sku
+from order_wal import WriteAheadLog
+
+ITEM_ADDED = 1
+FLAVOR_ADDED = 2
+TOPPING_ADDED = 3
+OPTIONS_SET = 4
+ITEM_REMOVED = 5
+PAID = 6
+VOIDED = 7
+
+MUTABLE = 1 << 32  # set on the SKU of a line holding its own Drink, Food or IceStorm
+_LINE_BITS = 24  # state keys are tab << _LINE_BITS | line id
+_LINE_MASK = (1 << _LINE_BITS) - 1
+_MAX_TAB = (1 << (63 - _LINE_BITS)) - 1
+_FIELDS = 5
+_EVENT = struct.Struct("=5q")  # one event as laid out in an array("q")
+_SNAPSHOT_VERSION = 1
+
+
+class TabState:
+    """The lines and payment status of every tab, as rebuilt from events."""
+
+    __slots__ = ("_skus", "_quantities", "_status")
+
+    def __init__(self):
+        self._skus = {}  # tab << 24 | line id -> SKU
+        self._quantities = {}  # tab << 24 | line id -> units
+        self._status = {}  # tab -> (PAID or VOIDED, cents paid)
+
+    def apply(self, events, start=0):
+        """replays a flat array of events, from the start-th event on."""
+        skus, quantities, status = self._skus, self._quantities, self._status
+        fields = iter(memoryview(events)[start * _FIELDS:])
+        for event, tab, line, x, y in zip(fields, fields, fields, fields, fields):
+            key = tab << _LINE_BITS | line
+            if event == ITEM_ADDED:
+                quantities[key] = quantities.get(key, 0) + y
+                skus[key] = x
+            elif event == ITEM_REMOVED:
+                left = quantities[key] - x
+                if left:
+                    quantities[key] = left
+                else:
+                    del quantities[key], skus[key]
+            elif event == FLAVOR_ADDED or event == TOPPING_ADDED:
+                skus[key] |= x
+            elif event == OPTIONS_SET:
+                skus[key] = x
+            elif event == PAID:
+                status[tab] = (PAID, x)
+            elif event == VOIDED:
+                status[tab] = (VOIDED, 0)
+            else:
+                raise ValueError(f"Unknown order event {event}.")
+
+    def get_status(self, tab):
+        """returns (PAID, cents) or (VOIDED, 0) for a closed tab, None for an open one."""
+        return self._status.get(tab)
+
+    def get_tabs(self):
+        """returns tab -> [(line id, SKU, units), ...] for every tab with lines, oldest line first."""
+        tabs = {}
+        quantities = self._quantities
+        for key, sku in sorted(self._skus.items()):
+            tabs.setdefault(key >> _LINE_BITS, []).append((key & _LINE_MASK, sku, quantities[key]))
+        return tabs
+
+    def get_open_tabs(self, log=None):
+        """returns tab -> Order for every tab not yet paid or voided.
+
+        lines keep their ids; a line that held its own item gets a new one
+        made from its spec. with log, the orders are LoggedOrders that go on
+        logging to it.
+        """
+        status = self._status
+        return {tab: LoggedOrder._rebuild(log, tab, lines)
+                for tab, lines in self.get_tabs().items() if tab not in status}
+
+    def to_bytes(self):
+        """returns the state as a flat array of ints, for a snapshot."""
+        skus, quantities = self._skus, self._quantities
+        data = array("q", (_SNAPSHOT_VERSION, len(skus), len(self._status)))
+        data.extend(chain.from_iterable((key, sku, quantities[key]) for key, sku in skus.items()))
+        data.extend(chain.from_iterable((tab, kind, cents) for tab, (kind, cents) in self._status.items()))
+        return data.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """returns the state saved by to_bytes()."""
+        values = array("q")
+        values.frombytes(data)
+        version, lines, closed = values[:3]
+        if version != _SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}.")
+        state = cls()
+        end = 3 + 3 * lines
+        keys, skus, quantities = values[3:end:3], values[4:end:3], values[5:end:3]
+        state._skus = dict(zip(keys, skus))
+        state._quantities = dict(zip(keys, quantities))
+        state._status = {tab: (kind, cents) for tab, kind, cents in
+                         zip(values[end::3], values[end + 1::3], values[end + 2::3])}
+        if len(state._status) != closed:
+            raise ValueError("Truncated snapshot.")
+        return state
+
+
+class EventLog:
+    """Order events in memory and, given a directory, on disk with periodic snapshots.
+
+    without a sync policy, events are buffered and written to events.log by
+    flush() or by the next snapshot, and the log expects one writer. with a
+    policy from order_wal, every event goes through a WriteAheadLog on
+    events.log as it is appended, and tabs may be changed from any thread.
+    """
+
+    __slots__ = ("_directory", "_snapshot_every", "_events", "_written", "_state", "_base",
+                 "_wal", "_lock")
+
+    def __init__(self, directory=None, snapshot_every=100_000, sync=None):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        elif sync is not None:
+            raise ValueError("A sync policy needs a directory.")
+        self._directory = directory
+        self._snapshot_every = snapshot_every
+        self._events = array("q")  # events after the state's position
+        self._written = 0  # how many of them are in events.log
+        self._state = TabState()  # the state after the first _base events
+        self._base = 0
+        self._wal = None if sync is None else WriteAheadLog(self._path("events.log"), sync)
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self._directory, name)
+
+    def __len__(self):
+        """returns the number of events logged so far."""
+        return self._base + len(self._events) // _FIELDS
+
+    def append(self, event, tab, line=0, x=0, y=0):
+        wal = self._wal
+        if wal is None:
+            events = self._events
+            events.extend((event, tab, line, x, y))
+            if len(events) >= self._snapshot_every * _FIELDS:
+                self.snapshot()
+            return
+        with self._lock:
+            # events reach the array and the log in the same order.
+            self._events.extend((event, tab, line, x, y))
+            sequence = wal.queue(_EVENT.pack(event, tab, line, x, y))
+            self._written += 1
+            if len(self._events) >= self._snapshot_every * _FIELDS:
+                self._snapshot()
+        wal.commit(sequence)
+
+    def open_tab(self, tab):
+        """returns a new LoggedOrder for a tab id, logging to this log."""
+        return LoggedOrder(self, tab)
+
+    def flush(self):
+        """writes the events not yet on disk to events.log."""
+        if self._wal is not None:
+            self._wal.sync()
+            return
+        if self._directory is None or self._written * _FIELDS == len(self._events):
+            return
+        with open(self._path("events.log"), "ab") as file:
+            file.write(memoryview(self._events)[self._written * _FIELDS:])
+        self._written = len(self._events) // _FIELDS
+
+    def _fold(self):
+        """replays the buffered events into the state and drops them."""
+        self.flush()
+        self._state.apply(self._events)
+        self._base += len(self._events) // _FIELDS
+        self._events = array("q")
+        self._written = 0
+
+    def get_state(self):
+        """returns the TabState after every event logged so far; it changes as the log grows."""
+        with self._lock:
+            self._fold()
+        return self._state
+
+    def snapshot(self):
+        """folds the buffered events into the state and, on disk, saves it as snapshot.bin."""
+        with self._lock:
+            self._snapshot()
+
+    def close(self):
+        """syncs and closes the write-ahead log, if the log has one."""
+        if self._wal is not None:
+            self._wal.close()
+
+    def _snapshot(self):
+        self._fold()
+        if self._directory is None:
+            return
+        data = array("q", (self._base,)).tobytes() + self._state.to_bytes()
+        with open(self._path("snapshot.tmp"), "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self._path("snapshot.tmp"), self._path("snapshot.bin"))
+
+    @classmethod
+    def recover(cls, directory, snapshot_every=100_000, sync=None):
+        """reopens the log in directory: loads the last snapshot and replays the events after it.
+
+        an event cut short by a crash is dropped.
+        """
+        log = cls(directory, snapshot_every)
+        try:
+            with open(log._path("snapshot.bin"), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            data = None
+        if data:
+            log._base = array("q", data[:8])[0]
+            log._state = TabState.from_bytes(data[8:])
+        size = _FIELDS * log._events.itemsize
+        try:
+            with open(log._path("events.log"), "rb") as file:
+                file.seek(log._base * size)
+                tail = file.read()
+        except FileNotFoundError:
+            tail = b""
+        whole = len(tail) - len(tail) % size
+        if whole != len(tail):
+            os.truncate(log._path("events.log"), log._base * size + whole)
+        log._events.frombytes(tail[:whole])
+        log._written = whole // size
+        log._fold()
+        if sync is not None:
+            log._wal = WriteAheadLog(log._path("events.log"), sync)
+        return log
+
+
+class LoggedOrder(Order):
+    """An Order that logs every change of its lines to an EventLog.
+
+    it holds items with SKUs: the specs, drinks, food and ice storms of the
+    menu.
+    """
+
+    __slots__ = ("_log", "_tab", "_logged")
+
+    def __init__(self, log, tab):
+        if not 0 <= tab <= _MAX_TAB:
+            raise ValueError(f"Tab ids run from 0 to {_MAX_TAB}.")
+        super().__init__()
+        self._log = log
+        self._tab = tab
+        self._logged = {}  # line id -> (SKU, units) as last logged
+
+    def get_tab(self):
+        return self._tab
+
+    def _log_line(self, item):
+        """logs the difference between an item's line and what was last logged for it."""
+        line = self._line_ids[item]
+        sku = item.get_sku()
+        if item.get_spec() is not item:
+            sku |= MUTABLE
+        quantity = self._lines[item]
+        old = self._logged.get(line)
+        self._logged[line] = (sku, quantity)
+        log, tab = self._log, self._tab
+        if old is None:
+            log.append(ITEM_ADDED, tab, line, sku, quantity)
+            return
+        old_sku, old_quantity = old
+        if sku != old_sku:
+            added = sku & ~old_sku
+            if not old_sku & ~sku and not added & (added - 1):
+                log.append(FLAVOR_ADDED if item.get_kind() == "drink" else TOPPING_ADDED, tab, line, added)
+            else:
+                log.append(OPTIONS_SET, tab, line, sku)
+        if quantity > old_quantity:
+            log.append(ITEM_ADDED, tab, line, sku, quantity - old_quantity)
+        elif quantity < old_quantity:
+            log.append(ITEM_REMOVED, tab, line, old_quantity - quantity)
+
+    def _line_changed(self, item):
+        super()._line_changed(item)
+        if self._log is not None:
+            self._log_line(item)
+
+    def _close_line(self, item):
+        line = self._line_ids[item]
+        super()._close_line(item)
+        if self._log is not None:
+            self._log.append(ITEM_REMOVED, self._tab, line, self._logged.pop(line)[1])
+
+    def _restore(self, snapshot):
+        super()._restore(snapshot)
+        if self._log is not None:
+            for item in self._line_items.values():
+                self._log_line(item)
+
+    def pay(self, cents=None):
+        """logs payment of the tab, by default of its grand total."""
+        self._log.append(PAID, self._tab, 0, self.get_grand_total_cents() if cents is None else cents)
+
+    def void(self):
+        self._log.append(VOIDED, self._tab)
+
+    @classmethod
+    def _rebuild(cls, log, tab, lines):
+        """returns the tab's order holding (line id, SKU, units) lines, without logging them."""
+        order = cls(None, tab)
+        for line, sku, quantity in lines:
+            spec = decode_sku(sku & (MUTABLE - 1))
+            order._next_line_id = line
+            order.add_item(spec.make() if sku & MUTABLE else spec, quantity)
+            order._logged[line] = (sku, quantity)
+        order._log = log
+        return order
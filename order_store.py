@@ -0,0 +1,182 @@
+"""A SQLite store of finalized orders, for querying order history.
+
+Every order becomes a row of orders, every line a row of order_lines (kind,
+base or food type or ice storm flavor, size, SKU, quantity, unit price in
+cents), and every flavor or topping of a line a row of line_options. The
+day is copied onto lines and options so each report reads a single covering
+index:
+
+    orders_by_day      daily_totals()
+    lines_by_day_kind  sales_by_kind()
+    options_by_option  option_counts()
+
+The database runs in WAL mode, so reports read while orders are written.
+save_orders() inserts a batch in one transaction with executemany, and the
+SQL lives in module constants so the connection's statement cache compiles
+each statement once.
+"""
+import sqlite3
+from datetime import datetime, timezone
+
+from Drink_Project import Order, decode_sku, serialize_line
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    placed_at TEXT NOT NULL,
+    num_items INTEGER NOT NULL,
+    subtotal_cents INTEGER NOT NULL,
+    tax_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    item TEXT NOT NULL,
+    size TEXT,
+    sku INTEGER,
+    quantity INTEGER NOT NULL,
+    unit_cents INTEGER NOT NULL,
+    PRIMARY KEY (order_id, line)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS line_options (
+    order_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    option TEXT NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (order_id, line, option)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS orders_by_day ON orders (day, num_items, subtotal_cents, tax_cents);
+CREATE INDEX IF NOT EXISTS lines_by_day_kind ON order_lines (day, kind, item, quantity, unit_cents);
+CREATE INDEX IF NOT EXISTS options_by_option ON line_options (kind, option, day, quantity);
+"""
+
+_INSERT_ORDER = "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)"
+_INSERT_LINE = "INSERT INTO order_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_INSERT_OPTION = "INSERT INTO line_options VALUES (?, ?, ?, ?, ?, ?)"
+_SELECT_LINES = "SELECT sku, quantity FROM order_lines WHERE order_id = ? ORDER BY line"
+_DAILY_TOTALS = """
+SELECT day, COUNT(*), SUM(num_items), SUM(subtotal_cents), SUM(tax_cents)
+FROM orders WHERE day BETWEEN ? AND ? GROUP BY day ORDER BY day
+"""
+_SALES_BY_KIND = """
+SELECT kind, item, SUM(quantity), SUM(quantity * unit_cents)
+FROM order_lines WHERE day BETWEEN ? AND ? GROUP BY kind, item ORDER BY kind, item
+"""
+_OPTION_COUNTS = """
+SELECT option, SUM(quantity) FROM line_options
+WHERE kind = ? AND day BETWEEN ? AND ? GROUP BY option ORDER BY SUM(quantity) DESC, option
+"""
+
+
+_descriptions = {}  # interned spec -> (kind, item, size, SKU, options), filled by _describe
+
+
+def _describe(item):
+    """returns the columns that depend only on an item's configuration, cached by spec."""
+    spec = item.get_spec()
+    description = _descriptions.get(spec)
+    if description is None:
+        # only the descriptive fields are kept, so the price passed in does not matter.
+        entry = serialize_line(spec, 1, 0)
+        try:
+            sku = spec.get_sku()
+        except NotImplementedError:  # a menu category without SKUs
+            sku = None
+        description = (
+            entry["kind"],
+            entry.get("base") or entry.get("type") or entry.get("flavor") or entry["description"],
+            entry.get("size"), sku, tuple(entry.get("flavors") or entry.get("toppings") or ()))
+        if sku is not None:  # specs with SKUs are interned; other menu items may be their own, short-lived spec
+            _descriptions[spec] = description
+    return description
+
+
+def _line_rows(order_id, day, order):
+    """returns the order_lines and line_options rows of an order."""
+    lines = []
+    options = []
+    for line, (item, quantity) in enumerate(order.get_lines(), 1):
+        kind, name, size, sku, item_options = _describe(item)
+        lines.append((order_id, line, day, kind, name, size, sku, quantity, order.get_unit_cents(item)))
+        for option in item_options:
+            options.append((order_id, line, option, day, kind, quantity))
+    return lines, options
+
+
+class OrderStore:
+    """Finalized orders in a SQLite database; use one OrderStore per thread."""
+
+    __slots__ = ("_connection",)
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, cached_statements=64)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # in WAL mode NORMAL only syncs at checkpoints and cannot corrupt the database.
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def save(self, order_id, order, when=None):
+        """saves one finalized order; see save_orders."""
+        self.save_orders([(order_id, order, when)])
+
+    def save_orders(self, orders):
+        """saves (order id, Order, when) triples in one transaction.
+
+        when is a datetime, the current time if None. a duplicate order id
+        raises sqlite3.IntegrityError and saves none of the batch.
+        """
+        order_rows = []
+        line_rows = []
+        option_rows = []
+        for order_id, order, when in orders:
+            when = when or datetime.now(timezone.utc)
+            day = when.date().isoformat()
+            order_rows.append((order_id, day, when.isoformat(), order.get_num_items(),
+                               order.get_subtotal_cents(), order.get_tax_cents()))
+            lines, options = _line_rows(order_id, day, order)
+            line_rows.extend(lines)
+            option_rows.extend(options)
+        with self._connection:
+            self._connection.executemany(_INSERT_ORDER, order_rows)
+            self._connection.executemany(_INSERT_LINE, line_rows)
+            self._connection.executemany(_INSERT_OPTION, option_rows)
+
+    def load_order(self, order_id):
+        """returns a saved order as an Order of specs priced from the current menu, or None."""
+        rows = self._connection.execute(_SELECT_LINES, (order_id,)).fetchall()
+        if not rows:
+            return None
+        order = Order()
+        for sku, quantity in rows:
+            order.add_item(decode_sku(sku), quantity)
+        return order
+
+    def daily_totals(self, first_day, last_day):
+        """returns (day, orders, items, subtotal cents, tax cents) for every day in a range."""
+        return self._connection.execute(_DAILY_TOTALS, (first_day, last_day)).fetchall()
+
+    def sales_by_kind(self, first_day, last_day):
+        """returns (kind, item, units, cents) for every item sold in a range of days."""
+        return self._connection.execute(_SALES_BY_KIND, (first_day, last_day)).fetchall()
+
+    def option_counts(self, kind, first_day, last_day):
+        """returns (flavor or topping, units) for a kind of item in a range of days, most sold first."""
+        return self._connection.execute(_OPTION_COUNTS, (kind, first_day, last_day)).fetchall()
+
+    def explain(self, sql, parameters=()):
+        """returns SQLite's query plan for a statement, one detail string per step."""
+        return [row[-1] for row in self._connection.execute("EXPLAIN QUERY PLAN " + sql, parameters)]
@@ -0,0 +1,185 @@
+"""A write-ahead log with group commit, for keeping open tabs across a crash.
+
+Records are appended from any thread and written to the file in batches:
+whichever thread syncs first writes every record queued so far with one
+write and one fsync, and the threads that queued them meanwhile wait for
+that sync instead of starting their own. A sync policy trades durability
+for latency:
+
+    SyncEachMutation()           append() returns once its record is on disk
+    SyncEveryMilliseconds(ms)    a background thread syncs every ms milliseconds
+    SyncEveryRecords(n)          every n-th append syncs the batch before it
+
+with the last two, a crash loses the records queued since the last sync.
+if a write or fsync fails, the log is failed: nothing more is counted
+durable, and every later append, commit and sync raises OSError.
+EventLog(directory, sync=policy) writes its events.log through a
+WriteAheadLog, and EventLog.recover() reads it back.
+"""
+import os
+import threading
+
+
+class SyncEachMutation:
+    """Every append waits until its record is on disk."""
+
+    __slots__ = ()
+
+    def _start(self, wal):
+        pass
+
+    def _appended(self, wal, sequence):
+        wal.sync(sequence)
+
+
+class SyncEveryRecords:
+    """Every n-th append syncs the records queued before it; the others return at once."""
+
+    __slots__ = ("_records",)
+
+    def __init__(self, records):
+        if records < 1:
+            raise ValueError("Records between syncs must be at least 1.")
+        self._records = records
+
+    def _start(self, wal):
+        pass
+
+    def _appended(self, wal, sequence):
+        if not sequence % self._records:
+            wal.sync(sequence)
+
+
+class SyncEveryMilliseconds:
+    """A background thread syncs the queued records every interval; appends return at once."""
+
+    __slots__ = ("_milliseconds",)
+
+    def __init__(self, milliseconds):
+        if milliseconds <= 0:
+            raise ValueError("The sync interval must be positive.")
+        self._milliseconds = milliseconds
+
+    def _start(self, wal):
+        thread = threading.Thread(target=wal._sync_every, args=(self._milliseconds / 1000,),
+                                  name="order-wal-sync", daemon=True)
+        wal._thread = thread
+        thread.start()
+
+    def _appended(self, wal, sequence):
+        pass
+
+
+class WriteAheadLog:
+    """An append-only file of byte records, synced in groups by a sync policy."""
+
+    __slots__ = ("_file", "_policy", "_condition", "_queued", "_appended", "_durable",
+                 "_syncing", "_thread", "_stop", "_closed", "_failed")
+
+    def __init__(self, path, policy=None):
+        """opens path for appending; the policy defaults to SyncEachMutation."""
+        self._file = open(path, "ab", buffering=0)
+        self._policy = policy or SyncEachMutation()
+        self._condition = threading.Condition()
+        self._queued = []  # records not yet written
+        self._appended = 0  # sequence number of the last record appended
+        self._durable = 0  # sequence number of the last record on disk
+        self._syncing = False
+        self._thread = None
+        self._stop = threading.Event()
+        self._closed = False
+        self._failed = None  # the OSError that failed the log
+        self._policy._start(self)
+
+    def queue(self, record):
+        """queues a record without waiting, returning its sequence number for commit()."""
+        with self._condition:
+            if self._closed:
+                raise ValueError("The write-ahead log is closed.")
+            self._check()
+            self._queued.append(record)
+            self._appended += 1
+            return self._appended
+
+    def commit(self, sequence):
+        """waits for a queued record as long as the policy asks."""
+        self._policy._appended(self, sequence)
+
+    def append(self, record):
+        """queues a record and waits for it as long as the policy asks; returns its sequence number."""
+        sequence = self.queue(record)
+        self._policy._appended(self, sequence)
+        return sequence
+
+    def _check(self):
+        if self._failed is not None:
+            raise OSError("The write-ahead log failed to write; records after "
+                          f"{self._durable} may be lost.") from self._failed
+
+    def get_durable(self):
+        """returns the sequence number of the last record known to be on disk."""
+        return self._durable
+
+    def sync(self, sequence=None):
+        """returns once every record up to sequence, by default every queued one, is on disk.
+
+        one caller at a time writes and fsyncs the whole queue; the others
+        wait for it and return if it covered their records. once a write or
+        fsync has failed, part of a batch may or may not be on disk, so the
+        log stays failed and raises instead of counting later records durable.
+        """
+        condition = self._condition
+        with condition:
+            if sequence is None:
+                sequence = self._appended
+            while self._durable < sequence:
+                self._check()
+                if self._syncing:
+                    condition.wait()
+                    continue
+                self._syncing = True
+                batch, self._queued = self._queued, []
+                end = self._appended
+                condition.release()
+                try:
+                    data = memoryview(b"".join(batch))
+                    while data:
+                        data = data[self._file.write(data):]
+                    os.fsync(self._file.fileno())
+                except BaseException as error:
+                    condition.acquire()
+                    self._failed = error
+                    self._syncing = False
+                    condition.notify_all()
+                    raise
+                condition.acquire()
+                self._syncing = False
+                condition.notify_all()
+                self._durable = end
+
+    def _sync_every(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sync()
+            except Exception:
+                return  # the log is failed; appends and commits now raise
+
+    def close(self):
+        """syncs the queued records and closes the file."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.sync()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
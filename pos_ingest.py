@@ -0,0 +1,313 @@
+"""Streaming ingestion of POS order exports, in JSON Lines or CSV.
+
+Every row is one order line, and consecutive rows with the same order id
+make up one order. A JSON Lines row is an object such as
+
+    {"order": "A17", "kind": "drink", "item": "pokecola", "size": "medium",
+     "options": ["cherry"], "quantity": 2}
+
+and a CSV export has a header row naming the same columns, with options
+separated by ";". kind is "drink", "food" or "ice storm"; item is the
+drink base, food type or ice storm flavor; options are the flavors or
+toppings. names are the ones receipts print, in any case.
+
+Names are resolved through tables built once at import, and every distinct
+(kind, item, size, options) seen is remembered with its spec, so a row that
+repeats a configuration costs one dict lookup. The input is read a chunk of
+lines at a time, bad rows are reported and skipped, and read_file_parallel
+splits a big file between processes.
+"""
+import csv
+import io
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from Drink_Project import (Base, Size, Flavor, IceStormFlavor, FlavorSet, Food, IceStorm, Order,
+                           DrinkSpec, FoodSpec, IceStormSpec, get_menu)
+
+_CHUNK_SIZE = 1 << 16  # characters of input read at a time
+_SPEC_CACHE_LIMIT = 1 << 16  # distinct raw configurations remembered
+
+
+def _names(pairs):
+    """returns a name -> value table that also holds every name in lower case."""
+    table = dict(pairs)
+    table.update({name.lower(): value for name, value in table.items()})
+    return table
+
+
+_KINDS = _names({"drink": "drink", "food": "food", "ice storm": "ice storm", "ice_storm": "ice storm"})
+_DRINK_BASES = _names((base.value, base) for base in Base)
+_DRINK_SIZES = _names((size.value, size) for size in Size)
+_DRINK_FLAVOR_BITS = _names((flavor.value, FlavorSet.bit(flavor)) for flavor in Flavor)
+_FOOD_TYPES = _names((food_type, food_type) for food_type in Food.get_food_types())
+_FOOD_TOPPING_BITS = _names(Food.get_topping_bits().items())
+_ICE_STORM_FLAVORS = _names((flavor.value, flavor) for flavor in IceStormFlavor)
+_ICE_STORM_TOPPING_BITS = _names(IceStorm.get_topping_bits().items())
+
+_spec_cache = {}  # (kind, item, size, options) as read -> spec
+
+
+class RowError:
+    """A row that could not be read: its line number in the input and why."""
+
+    __slots__ = ("row", "message")
+
+    def __init__(self, row, message):
+        self.row = row
+        self.message = message
+
+    def __eq__(self, other):
+        return isinstance(other, RowError) and (self.row, self.message) == (other.row, other.message)
+
+    def __repr__(self):
+        return f"RowError({self.row}, {self.message!r})"
+
+    def __str__(self):
+        return f"row {self.row}: {self.message}"
+
+
+def _lookup(table, name, what):
+    """returns table[name], trying the name stripped and in lower case before giving up."""
+    value = table.get(name)
+    if value is None:
+        if isinstance(name, str):
+            value = table.get(name.strip().lower())
+        if value is None:
+            raise ValueError(f"unknown {what} {name!r}")
+    return value
+
+
+def _mask(table, options, what):
+    if isinstance(options, str):
+        options = options.split(";") if options else ()
+    elif not isinstance(options, (tuple, list)):
+        raise ValueError(f"options must be a list of {what} names")
+    mask = 0
+    for option in options:
+        mask |= _lookup(table, option, what)
+    return mask
+
+
+def _build_spec(kind, item, size, options):
+    kind = _lookup(_KINDS, kind, "kind")
+    if kind == "drink":
+        return DrinkSpec.from_mask(_lookup(_DRINK_BASES, item, "drink base"),
+                                   _lookup(_DRINK_SIZES, size, "drink size"),
+                                   _mask(_DRINK_FLAVOR_BITS, options, "flavor"))
+    if kind == "food":
+        return FoodSpec.from_mask(_lookup(_FOOD_TYPES, item, "food type"),
+                                  _mask(_FOOD_TOPPING_BITS, options, "topping"))
+    return IceStormSpec.from_mask(_lookup(_ICE_STORM_FLAVORS, item, "ice storm flavor"),
+                                  _mask(_ICE_STORM_TOPPING_BITS, options, "topping"))
+
+
+def _spec(kind, item, size, options):
+    """returns the spec of a row's configuration, from the cache when it was seen before."""
+    key = (kind, item, size, options)
+    spec = _spec_cache.get(key)
+    if spec is None:
+        spec = _build_spec(kind, item, size, options)
+        if len(_spec_cache) >= _SPEC_CACHE_LIMIT:
+            _spec_cache.clear()
+        _spec_cache[key] = spec
+    return spec
+
+
+def _quantity(value):
+    if type(value) is not int:
+        if not isinstance(value, str):
+            raise ValueError(f"quantity must be a whole number, not {value!r}")
+        value = int(value) if value.strip() else 1
+    if value < 1:
+        raise ValueError(f"quantity must be at least 1, not {value}")
+    return value
+
+
+def _read_jsonl(lines, row, errors, menu):
+    """yields (order id, spec, quantity) for every good row on menu; row is the first line's number."""
+    loads = json.loads
+    for row, text in enumerate(lines, row):
+        if not text or text.isspace():
+            continue
+        try:
+            record = loads(text)
+            if type(record) is not dict:
+                raise ValueError("a row must be a JSON object")
+            options = record.get("options", ())
+            if type(options) is list:
+                options = tuple(options)
+            spec = _spec(record["kind"], record["item"], record.get("size"), options)
+            menu.get_price_cents(spec)  # raises for an item the menu does not sell
+            yield record["order"], spec, _quantity(record.get("quantity", 1))
+        except KeyError as error:
+            if errors is not None:
+                errors.append(RowError(row, f"missing field {error}"))
+        except (ValueError, TypeError) as error:
+            if errors is not None:
+                errors.append(RowError(row, str(error)))
+
+
+_CSV_COLUMNS = ("order", "kind", "item", "size", "options", "quantity")
+_CSV_REQUIRED = ("order", "kind", "item")
+
+
+def _csv_columns(header):
+    """returns the position of every known column in a CSV header line, None if absent."""
+    names = [name.strip().lower() for name in next(csv.reader([header]), [])]
+    for name in _CSV_REQUIRED:
+        if name not in names:
+            raise ValueError(f"CSV header has no {name!r} column.")
+    return tuple(names.index(name) if name in names else None for name in _CSV_COLUMNS)
+
+
+def _read_csv(lines, row, columns, errors, menu):
+    """yields (order id, spec, quantity) for every good CSV row on menu; row is the first line's number."""
+    order_at, kind_at, item_at, size_at, options_at, quantity_at = columns
+    width = max(column for column in columns if column is not None) + 1
+    for row, fields in enumerate(csv.reader(lines), row):
+        if not fields:
+            continue
+        try:
+            if len(fields) < width:
+                raise ValueError(f"expected {width} fields, found {len(fields)}")
+            spec = _spec(fields[kind_at], fields[item_at],
+                         fields[size_at] if size_at is not None else None,
+                         fields[options_at] if options_at is not None else "")
+            menu.get_price_cents(spec)
+            quantity = _quantity(fields[quantity_at]) if quantity_at is not None else 1
+            yield fields[order_at], spec, quantity
+        except ValueError as error:
+            if errors is not None:
+                errors.append(RowError(row, str(error)))
+
+
+def _read_lines(stream, format, errors, chunk_size, menu):
+    """yields (order id, spec, quantity) for every good row of a text stream, a chunk at a time."""
+    if format not in ("jsonl", "csv"):
+        raise ValueError(f"Unknown format {format!r}, use 'jsonl' or 'csv'.")
+    row = 1
+    columns = None
+    while True:
+        lines = stream.readlines(chunk_size)
+        if not lines:
+            return
+        if format == "jsonl":
+            yield from _read_jsonl(lines, row, errors, menu)
+        else:
+            if columns is None:
+                columns = _csv_columns(lines[0])
+                yield from _read_csv(lines[1:], row + 1, columns, errors, menu)
+            else:
+                yield from _read_csv(lines, row, columns, errors, menu)
+        row += len(lines)
+
+
+def _group(rows):
+    """yields (order id, [(spec, quantity), ...]) for every run of rows with the same order id."""
+    lines = None
+    current = None
+    for order_id, spec, quantity in rows:
+        if lines is None or order_id != current:
+            if lines:
+                yield current, lines
+            current, lines = order_id, []
+        lines.append((spec, quantity))
+    if lines:
+        yield current, lines
+
+
+def _build(lines, as_skus, menu):
+    """returns an Order priced with menu holding the lines, or its SKUs as Order.to_skus() would."""
+    if as_skus:
+        skus = array("I")
+        for spec, quantity in lines:
+            skus.extend(repeat(spec.get_sku(), quantity))
+        return skus
+    order = Order(menu)
+    for spec, quantity in lines:
+        order.add_item(spec, quantity)
+    return order
+
+
+def read_orders(stream, format="jsonl", errors=None, as_skus=False, chunk_size=_CHUNK_SIZE, menu=None):
+    """yields (order id, Order) for every order in a text stream of POS rows.
+
+    format is "jsonl" or "csv". rows that cannot be read, or name an item
+    the menu does not sell, are skipped, and a RowError for each is appended
+    to errors if given; the rest of the order is still read. orders are
+    priced with menu, by default the Menu being served when reading starts.
+    with as_skus, orders come as array("I") SKUs, one per unit, instead of
+    Order objects.
+    """
+    menu = menu or get_menu()
+    for order_id, lines in _group(_read_lines(stream, format, errors, chunk_size, menu)):
+        yield order_id, _build(lines, as_skus, menu)
+
+
+def _read_range(path, format, columns, menu, start, end):
+    """reads the rows between two byte offsets of a file in a worker process, numbering them from 1."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        lines = io.StringIO(file.read(end - start).decode("utf-8")).readlines()
+    errors = []
+    if format == "jsonl":
+        rows = _read_jsonl(lines, 1, errors, menu)
+    else:
+        rows = _read_csv(lines, 1, columns, errors, menu)
+    return len(lines), list(_group(rows)), errors
+
+
+def read_file_parallel(path, format="jsonl", errors=None, as_skus=False, processes=None, menu=None):
+    """yields (order id, Order) for every order in a POS export file, read by several processes.
+
+    the file is cut into one byte range per process at line boundaries. an
+    order cut in two is joined again, and row numbers in errors count from
+    the start of the file, so the result matches read_orders().
+    """
+    if format not in ("jsonl", "csv"):
+        raise ValueError(f"Unknown format {format!r}, use 'jsonl' or 'csv'.")
+    menu = menu or get_menu()  # sent to the workers, which may not see the menu published here
+    processes = processes or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    columns = None
+    with open(path, "rb") as file:
+        if format == "csv":
+            columns = _csv_columns(file.readline().decode("utf-8"))
+        bounds = [file.tell()]
+        for part in range(1, processes):
+            file.seek(max(bounds[-1], bounds[0] + (size - bounds[0]) * part // processes - 1))
+            file.readline()
+            bounds.append(max(bounds[-1], file.tell()))
+        bounds.append(size)
+    first_row = 1 if columns is None else 2
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+    with ProcessPoolExecutor(max_workers=max(1, len(ranges))) as pool:
+        results = pool.map(_read_range, repeat(path), repeat(format), repeat(columns), repeat(menu),
+                           [start for start, _ in ranges], [end for _, end in ranges])
+        row = first_row
+        pending = None  # the last order of a range, which the next range may continue
+        for count, groups, range_errors in results:
+            if errors is not None:
+                for error in range_errors:
+                    errors.append(RowError(error.row + row - 1, error.message))
+            row += count
+            if not groups:
+                continue
+            if pending is not None:
+                if groups[0][0] == pending[0]:
+                    pending[1].extend(groups[0][1])
+                    groups = groups[1:]
+                if groups:
+                    yield pending[0], _build(pending[1], as_skus, menu)
+                    pending = None
+            if groups:
+                for order_id, lines in groups[:-1]:
+                    yield order_id, _build(lines, as_skus, menu)
+                pending = groups[-1]
+        if pending is not None:
+            yield pending[0], _build(pending[1], as_skus, menu)
@@ -0,0 +1,397 @@
+"""An append-only ledger of finalized orders, one partition per day.
+
+A day's partition, DAY.ledger, is a run of fixed-layout records: a 48-byte
+header (magic, version, kind, line count, order id, referenced order id,
+time in microseconds, subtotal and tax in cents) followed by 12 bytes per
+line (SKU, quantity, unit cents). Next to it, DAY.index holds an
+(order id, offset) pair per record, so a refund or void finds the sale it
+reverses with one dict lookup. A void copies the sale's own lines, subtotal
+and tax, so it reverses exactly what was charged, and a sale can be
+reversed at most up to its grand total.
+
+Partitions are read through mmap, and LedgerRecord is a view over the
+mapped bytes, so scanning a day copies nothing. compact() folds days past
+a cutoff into one zip archive per month and deletes archives past
+retention. the ledger expects a single writer process.
+"""
+import mmap
+import os
+import struct
+import zipfile
+from datetime import date, datetime, timedelta, timezone
+
+from Drink_Project import Order, decode_sku
+
+SALE = 1
+REFUND = 2
+VOID = 3
+_KINDS = (SALE, REFUND, VOID)
+
+_MAGIC = b"LR"
+_VERSION = 1
+# magic, version, kind, line count, order id, reference, microseconds, subtotal, tax
+_RECORD = struct.Struct("<2sBBIQQqqq")
+_LINE = struct.Struct("<III")  # SKU, quantity, unit cents
+_INDEX = struct.Struct("<QQ")  # order id, offset
+_EMPTY = memoryview(b"")
+
+
+def _record_size(view, offset):
+    """returns the size of the record at offset, or 0 if no whole record starts there."""
+    if offset + _RECORD.size > len(view):
+        return 0
+    magic, version, _, count = struct.unpack_from("<2sBBI", view, offset)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"Corrupt ledger record at offset {offset}.")
+    size = _RECORD.size + count * _LINE.size
+    return size if offset + size <= len(view) else 0
+
+
+class LedgerRecord:
+    """A view of one ledger record over its partition's bytes; fields are read on access."""
+
+    __slots__ = ("_view", "_day")
+
+    def __init__(self, view, day):
+        self._view = view
+        self._day = day
+
+    def _field(self, position):
+        return _RECORD.unpack_from(self._view)[position]
+
+    def get_day(self):
+        return self._day
+
+    def get_kind(self):
+        return self._field(2)
+
+    def get_order_id(self):
+        return self._field(4)
+
+    def get_reference(self):
+        """returns the id of the order a refund or void reverses, 0 for a sale."""
+        return self._field(5)
+
+    def get_time(self):
+        return datetime.fromtimestamp(self._field(6) / 1_000_000, timezone.utc)
+
+    def get_subtotal_cents(self):
+        return self._field(7)
+
+    def get_tax_cents(self):
+        return self._field(8)
+
+    def get_grand_total_cents(self):
+        subtotal, tax = _RECORD.unpack_from(self._view)[7:]
+        return subtotal + tax
+
+    def get_lines(self):
+        """returns (SKU, quantity, unit cents) for every line."""
+        return list(_LINE.iter_unpack(self._view[_RECORD.size:]))
+
+    def to_order(self):
+        """returns an Order holding the record's specs, priced from the current menu."""
+        order = Order()
+        for sku, quantity, _ in _LINE.iter_unpack(self._view[_RECORD.size:]):
+            order.add_item(decode_sku(sku), quantity)
+        return order
+
+    def __repr__(self):
+        return f"LedgerRecord({self._day}, order {self.get_order_id()}, kind {self.get_kind()})"
+
+
+def _pack_record(kind, order_id, reference, micros, lines, subtotal, tax):
+    record = bytearray(_RECORD.size + len(lines) * _LINE.size)
+    _RECORD.pack_into(record, 0, _MAGIC, _VERSION, kind, len(lines), order_id, reference, micros,
+                      subtotal, tax)
+    for position, line in enumerate(lines):
+        _LINE.pack_into(record, _RECORD.size + position * _LINE.size, *line)
+    return record
+
+
+class SalesLedger:
+    """The day partitions and monthly archives under one directory."""
+
+    __slots__ = ("_directory", "_sync", "_maps", "_index", "_reversed")
+
+    def __init__(self, directory, sync=False):
+        """opens the ledger in directory, creating it; with sync, every append is fsynced."""
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._sync = sync
+        self._maps = {}  # day -> (mapped size, memoryview) of the partition
+        self._index = None  # order id -> (day, offset), built on first use
+        self._reversed = None  # sale id -> [voided, cents reversed], built on first reversal
+
+    def _path(self, day, suffix):
+        return os.path.join(self._directory, f"{day}.{suffix}")
+
+    def _archive_path(self, month):
+        return os.path.join(self._directory, f"archive-{month}.zip")
+
+    def _live_days(self):
+        return sorted(name[:-len(".ledger")] for name in os.listdir(self._directory)
+                      if name.endswith(".ledger"))
+
+    def _archives(self):
+        """returns month -> archive path for every archive, oldest first."""
+        return {name[len("archive-"):-len(".zip")]: os.path.join(self._directory, name)
+                for name in sorted(os.listdir(self._directory))
+                if name.startswith("archive-") and name.endswith(".zip")}
+
+    def get_days(self):
+        """returns every day in the ledger, archived or live, oldest first."""
+        days = set(self._live_days())
+        for path in self._archives().values():
+            with zipfile.ZipFile(path) as archive:
+                days.update(name[:-len(".ledger")] for name in archive.namelist() if name.endswith(".ledger"))
+        return sorted(days)
+
+    def _view(self, day):
+        """returns a memoryview of a day's records: mapped when live, decompressed when archived."""
+        path = self._path(day, "ledger")
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return self._archived_view(day)
+        cached = self._maps.get(day)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        if not size:
+            return _EMPTY
+        with open(path, "rb") as file:
+            view = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        # an older map stays valid for the records already handed out and is
+        # released with the last of them.
+        self._maps[day] = (size, view)
+        return view
+
+    def _archived_view(self, day):
+        cached = self._maps.get(day)
+        if cached is not None:
+            return cached[1]
+        path = self._archives().get(day[:7])
+        if path is not None:
+            with zipfile.ZipFile(path) as archive:
+                if f"{day}.ledger" in archive.namelist():
+                    view = memoryview(archive.read(f"{day}.ledger"))
+                    self._maps[day] = (None, view)
+                    return view
+        raise KeyError(f"The ledger has no day {day}.")
+
+    def scan(self, day):
+        """yields a LedgerRecord for every record of a day, in the order they were appended."""
+        view = self._view(day)
+        offset = 0
+        while True:
+            size = _record_size(view, offset)
+            if not size:
+                return
+            yield LedgerRecord(view[offset:offset + size], day)
+            offset += size
+
+    def _load_index(self):
+        """builds the order id index from every day's sidecar, live and archived."""
+        index = {}
+        for path in self._archives().values():
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name.endswith(".index"):
+                        day = name[:-len(".index")]
+                        for order_id, offset in _INDEX.iter_unpack(archive.read(name)):
+                            index[order_id] = (day, offset)
+        self._index = index
+        for day in self._live_days():
+            self._check_tail(day)
+        return index
+
+    def _check_tail(self, day):
+        """loads a live day's sidecar, repairing it and the partition after a crash.
+
+        records appended after the last indexed one are indexed, and a
+        record cut short by a crash is truncated away.
+        """
+        index = self._index
+        end = 0
+        try:
+            with open(self._path(day, "index"), "rb") as file:
+                entries = file.read()
+        except FileNotFoundError:
+            entries = b""
+        whole = entries[:len(entries) - len(entries) % _INDEX.size]
+        view = self._view(day)
+        for order_id, offset in _INDEX.iter_unpack(whole):
+            index[order_id] = (day, offset)
+            end = offset + _record_size(view, offset)
+        missing = bytearray()
+        while True:
+            size = _record_size(view, end)
+            if not size:
+                break
+            order_id = _RECORD.unpack_from(view, end)[4]
+            index[order_id] = (day, end)
+            missing += _INDEX.pack(order_id, end)
+            end += size
+        if missing or len(whole) != len(entries) or not os.path.exists(self._path(day, "index")):
+            with open(self._path(day, "index"), "wb") as file:
+                file.write(whole + missing)
+        if end < len(view):
+            del view
+            self._maps.pop(day, None)
+            os.truncate(self._path(day, "ledger"), end)
+
+    def append(self, order_id, order, kind=SALE, reference=0, when=None):
+        """appends a finalized order to the partition of its day and returns its LedgerRecord.
+
+        order ids must be unique across the ledger. refunds and voids name
+        the order they reverse as reference.
+        """
+        if kind not in _KINDS:
+            raise ValueError(f"Unknown record kind {kind}.")
+        lines = [(item.get_sku(), quantity, order.get_unit_cents(item)) for item, quantity in order.get_lines()]
+        return self._append(kind, order_id, reference, when, lines, order.get_subtotal_cents(),
+                            order.get_tax_cents())
+
+    def _append(self, kind, order_id, reference, when, lines, subtotal, tax):
+        index = self._index if self._index is not None else self._load_index()
+        if order_id in index:
+            raise ValueError(f"Order {order_id} is already in the ledger.")
+        when = when or datetime.now(timezone.utc)
+        day = when.date().isoformat()
+        record = _pack_record(kind, order_id, reference, round(when.timestamp() * 1_000_000), lines,
+                              subtotal, tax)
+        with open(self._path(day, "ledger"), "ab") as data, open(self._path(day, "index"), "ab") as sidecar:
+            offset = data.tell()
+            data.write(record)
+            data.flush()
+            if self._sync:
+                os.fsync(data.fileno())
+            # the sidecar goes second: after a crash it may lag the data, never lead it.
+            sidecar.write(_INDEX.pack(order_id, offset))
+        index[order_id] = (day, offset)
+        return LedgerRecord(memoryview(record), day)
+
+    def find(self, order_id):
+        """returns the LedgerRecord of an order id, or None if it is not in the ledger."""
+        index = self._index if self._index is not None else self._load_index()
+        found = index.get(order_id)
+        if found is None:
+            return None
+        day, offset = found
+        view = self._view(day)
+        return LedgerRecord(view[offset:offset + _record_size(view, offset)], day)
+
+    def _load_reversed(self):
+        """totals the refunds and voids of every sale, from the record headers of every day."""
+        reversals = {}
+        unpack = _RECORD.unpack_from
+        for day in self.get_days():
+            view = self._view(day)
+            offset = 0
+            while True:
+                size = _record_size(view, offset)
+                if not size:
+                    break
+                _, _, kind, _, _, reference, _, subtotal, tax = unpack(view, offset)
+                if kind != SALE:
+                    totals = reversals.setdefault(reference, [False, 0])
+                    totals[0] = totals[0] or kind == VOID
+                    totals[1] += subtotal + tax
+                offset += size
+        self._reversed = reversals
+        return reversals
+
+    def _reverse(self, kind, order_id, original_id, order, when):
+        original = self.find(original_id)
+        if original is None:
+            raise KeyError(f"Order {original_id} is not in the ledger.")
+        if original.get_kind() != SALE:
+            raise ValueError(f"Order {original_id} is not a sale.")
+        reversals = self._reversed if self._reversed is not None else self._load_reversed()
+        voided, cents = reversals.get(original_id, (False, 0))
+        if voided:
+            raise ValueError(f"Order {original_id} was already voided.")
+        if order is None:
+            # the sale's own lines and totals, as charged, whatever the menu says now.
+            lines, subtotal, tax = original.get_lines(), original.get_subtotal_cents(), original.get_tax_cents()
+        else:
+            lines = [(item.get_sku(), quantity, order.get_unit_cents(item))
+                     for item, quantity in order.get_lines()]
+            subtotal, tax = order.get_subtotal_cents(), order.get_tax_cents()
+        if cents + subtotal + tax > original.get_grand_total_cents():
+            raise ValueError(f"Reversing {subtotal + tax} more cents would take order {original_id} "
+                             f"past its grand total.")
+        record = self._append(kind, order_id, original_id, when, lines, subtotal, tax)
+        totals = reversals.setdefault(original_id, [False, 0])
+        totals[0] = kind == VOID
+        totals[1] += subtotal + tax
+        return record
+
+    def refund(self, order_id, original_id, order=None, when=None):
+        """records a refund of a sale, of the lines in order or of the whole sale."""
+        return self._reverse(REFUND, order_id, original_id, order, when)
+
+    def void(self, order_id, original_id, when=None):
+        """records the void of a whole sale."""
+        return self._reverse(VOID, order_id, original_id, None, when)
+
+    def summarize(self, day):
+        """returns a day's record counts and totals in cents by kind, and the net sales."""
+        totals = {kind: [0, 0, 0] for kind in _KINDS}  # records, subtotal, tax
+        view = self._view(day)
+        offset = 0
+        unpack = _RECORD.unpack_from
+        while True:
+            size = _record_size(view, offset)
+            if not size:
+                break
+            _, _, kind, _, _, _, _, subtotal, tax = unpack(view, offset)
+            kind_totals = totals[kind]
+            kind_totals[0] += 1
+            kind_totals[1] += subtotal
+            kind_totals[2] += tax
+            offset += size
+        names = {SALE: "sales", REFUND: "refunds", VOID: "voids"}
+        summary = {names[kind]: {"records": records, "subtotal": subtotal, "tax": tax}
+                   for kind, (records, subtotal, tax) in totals.items()}
+        summary["net"] = sum((1 if kind == SALE else -1) * (subtotal + tax)
+                             for kind, (_, subtotal, tax) in totals.items())
+        return summary
+
+    def compact(self, keep_days=7, retain_days=None, today=None):
+        """folds live days older than keep_days into monthly archives.
+
+        each month's days go into archive-YYYY-MM.zip, compressed with LZMA,
+        and the live files are deleted once the archive is written. with
+        retain_days, archives whose whole month is older than that are
+        deleted too. returns (days archived, months deleted).
+        """
+        today = today or date.today()
+        cutoff = (today - timedelta(days=keep_days)).isoformat()
+        archived = []
+        for day in self._live_days():
+            if day >= cutoff:
+                continue
+            if self._index is None:
+                self._load_index()  # repairs every live day before it is archived
+            with zipfile.ZipFile(self._archive_path(day[:7]), "a", zipfile.ZIP_LZMA) as archive:
+                names = archive.namelist()
+                for suffix in ("ledger", "index"):
+                    if f"{day}.{suffix}" not in names:
+                        archive.write(self._path(day, suffix), f"{day}.{suffix}")
+            for suffix in ("ledger", "index"):
+                os.remove(self._path(day, suffix))
+            self._maps.pop(day, None)
+            archived.append(day)
+        deleted = []
+        if retain_days is not None:
+            oldest = (today - timedelta(days=retain_days)).isoformat()[:7]
+            for month, path in self._archives().items():
+                if month < oldest:
+                    os.remove(path)
+                    deleted.append(month)
+            if deleted:
+                self._maps = {day: entry for day, entry in self._maps.items() if day[:7] >= oldest}
+                self._index = None
+                self._reversed = None
+        return archived, deleted
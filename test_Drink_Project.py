@@ -1,5 +1,16 @@
+import io
+import json
+import os
+import pickle
+import tempfile
+import threading
+import tracemalloc
 import unittest
-from Drink_Project import Drink, Food, IceStorm, IceStormFlavor, Base, Size, Flavor
+from Drink_Project import (Drink, Food, IceStorm, IceStormFlavor, Base, Size, Flavor, Order,
+                           DrinkSpec, FoodSpec, IceStormSpec, encode_sku, decode_sku,
+                           SKU_DRINK, SKU_FOOD, SKU_ICE_STORM, MenuItem, register_line_serializer,
+                           BitSet, FlavorSet, to_cents, to_dollars, tax_cents, format_cents,
+                           Menu, get_menu, publish_menu, load_menu)
 
 # Unit tests for the Drink and Order classes
 class TestDrinkOrder(unittest.TestCase):
@@ -47,5 +58,923 @@ class TestDrinkOrder(unittest.TestCase):
         ice_storm.add_topping("cookie_dough")
         self.assertEqual(ice_storm.get_total(), 3.00 + 0.50 + 1.00)
 
+
+class TestPricing(unittest.TestCase):
+    """Test cases for integer-cent pricing."""
+
+    def test_cent_conversions(self):
+        self.assertEqual(to_cents(2.05), 205)
+        self.assertEqual(to_cents("0.15"), 15)
+        self.assertEqual(to_cents(0.145), 15)
+        self.assertEqual(to_dollars(205), 2.05)
+
+    def test_tax_rounds_half_up(self):
+        self.assertEqual(tax_cents(0), 0)
+        self.assertEqual(tax_cents(200), 15)  # 14.5 cents
+        self.assertEqual(tax_cents(30), 2)  # 2.175 cents
+        self.assertEqual(tax_cents(1000), 73)  # 72.5 cents
+
+    def test_item_cents(self):
+        drink = Drink(Base.SPRITE, Size.LARGE)
+        drink.add_flavor(Flavor.LIME)
+        drink.add_flavor(Flavor.LIME)
+        self.assertEqual(drink.get_total_cents(), 220)
+        food = Food("Hotdog")
+        food.add_topping("chili")
+        self.assertEqual(food.get_total_cents(), 290)
+        self.assertEqual(food.get_total_price(), 2.90)
+        self.assertEqual(IceStorm(IceStormFlavor.BUTTER_PECAN).get_total_cents(), 350)
+
+    def test_ice_storm_flavors_are_distinct(self):
+        self.assertEqual(len(IceStormFlavor), 6)
+        self.assertIsNot(IceStormFlavor.VANILLA_BEAN, IceStormFlavor.CHOCOLATE)
+
+    def test_order_totals_do_not_drift(self):
+        order = Order()
+        for _ in range(1000):
+            drink = Drink(Base.WATER, Size.MEDIUM)
+            drink.add_flavor(Flavor.MINT)
+            order.add_item(drink)
+        self.assertEqual(order.get_subtotal_cents(), 190000)
+        self.assertEqual(order.get_tax_cents(), 13775)
+        receipt = order.get_receipt()
+        self.assertEqual(receipt["subtotal"], 1900.00)
+        self.assertEqual(receipt["tax"], 137.75)
+        self.assertEqual(receipt["grand_total"], 2037.75)
+
+class TestOrderTotals(unittest.TestCase):
+    """Test cases for the running totals kept by Order."""
+
+    def test_totals_follow_add_and_remove(self):
+        order = Order()
+        order.add_item(Drink(Base.WATER, Size.SMALL))
+        order.add_item(Food("corndog"))
+        self.assertEqual(order.get_subtotal_cents(), 350)
+        order.remove_item(0)
+        self.assertEqual(order.get_subtotal_cents(), 200)
+        self.assertEqual(order.get_tax_cents(), 15)
+        order.remove_item(0)
+        self.assertEqual(order.get_subtotal_cents(), 0)
+        self.assertEqual(order.get_num_items(), 0)
+
+    def test_totals_follow_item_changes(self):
+        order = Order()
+        drink = Drink(Base.HILL_FOG, Size.MEGA)
+        food = Food("nacho_chips")
+        order.add_item(drink)
+        order.add_item(drink)
+        order.add_item(food)
+        drink.add_flavor(Flavor.CHERRY)
+        food.add_topping("nacho_cheese")
+        self.assertEqual(order.get_subtotal_cents(), 2 * 230 + 220)
+        order.remove_item(0)
+        drink.add_flavor(Flavor.LEMON)
+        self.assertEqual(order.get_subtotal_cents(), 245 + 220)
+
+    def test_removed_item_no_longer_counted(self):
+        order = Order()
+        drink = Drink(Base.WATER, Size.SMALL)
+        order.add_item(drink)
+        order.remove_item(0)
+        drink.add_flavor(Flavor.MINT)
+        self.assertEqual(order.get_subtotal_cents(), 0)
+
+    def test_item_shared_between_orders(self):
+        first, second = Order(), Order()
+        food = Food("hotdog")
+        first.add_item(food)
+        second.add_item(food)
+        food.add_topping("bacon_bits")
+        self.assertEqual(first.get_subtotal_cents(), 260)
+        self.assertEqual(second.get_subtotal_cents(), 260)
+    def test_many_copies_of_one_item(self):
+        order = Order()
+        food = Food("tater_tots")
+        for _ in range(3):
+            order.add_item(food)
+        order.remove_item(2)
+        food.add_topping("chili")
+        self.assertEqual(order.get_subtotal_cents(), 2 * 230)
+        order.remove_item(0)
+        order.remove_item(0)
+        food.add_topping("mustard")
+        self.assertEqual(order.get_subtotal_cents(), 0)
+        self.assertEqual(food._watchers, ())
+
+    def test_compact_layout(self):
+        for obj in (Drink(Base.WATER, Size.SMALL), Food("hotdog"),
+                    IceStorm(IceStormFlavor.SMORE), Order(), FlavorSet()):
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj).__name__)
+
+class TestBitSet(unittest.TestCase):
+    """Test cases for the bitmask-backed option sets."""
+
+    def test_membership_and_count(self):
+        flavors = FlavorSet([Flavor.MINT, Flavor.LEMON])
+        self.assertIn(Flavor.MINT, flavors)
+        self.assertNotIn(Flavor.LIME, flavors)
+        self.assertNotIn("mint", flavors)
+        self.assertEqual(len(flavors), 2)
+        self.assertEqual(flavors.mask, 0b1001)
+
+    def test_iterates_in_ordinal_order(self):
+        flavors = FlavorSet([Flavor.LIME, Flavor.LEMON, Flavor.MINT])
+        self.assertEqual(list(flavors), [Flavor.LEMON, Flavor.MINT, Flavor.LIME])
+
+    def test_set_operations(self):
+        first = FlavorSet([Flavor.LEMON, Flavor.CHERRY])
+        second = FlavorSet([Flavor.CHERRY, Flavor.MINT])
+        self.assertEqual(first | second, FlavorSet([Flavor.LEMON, Flavor.CHERRY, Flavor.MINT]))
+        self.assertEqual(first & second, FlavorSet([Flavor.CHERRY]))
+        self.assertEqual(first - second, FlavorSet([Flavor.LEMON]))
+        self.assertEqual(first.union([Flavor.LIME]).mask, 0b100011)
+
+    def test_invalid_members(self):
+        with self.assertRaises(KeyError):
+            FlavorSet(["lemon"])
+        with self.assertRaises(ValueError):
+            FlavorSet.from_mask(1 << 6)
+
+    def test_price_table(self):
+        Sizes = BitSet.over("Sizes", ["a", "b", "c"])
+        table = Sizes.price_table({"a": 1, "b": 10, "c": 100})
+        self.assertEqual(table, [0, 1, 10, 11, 100, 101, 110, 111])
+        self.assertEqual(Sizes.price_table({"a": 1, "c": 100}), [0, 1, None, None, 100, 101, None, None])
+
+    def test_items_use_bitsets(self):
+        food = Food("ice_cream")
+        food.add_topping("Caramel_Sauce")
+        food.add_topping("cherry")
+        self.assertEqual(list(food._toppings), ["cherry", "caramel_sauce"])
+        self.assertEqual(food.get_total_cents(), 350)
+        drink = Drink(Base.WATER, Size.SMALL)
+        drink.set_flavors([Flavor.MINT, Flavor.MINT])
+        self.assertEqual(drink.get_num_flavors(), 1)
+
+class TestSpecs(unittest.TestCase):
+    """Test cases for the interned item specs."""
+
+    def test_identical_configurations_are_shared(self):
+        first = DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY])
+        second = DrinkSpec(Base.POKEACOLA, Size.MEDIUM, (Flavor.CHERRY, Flavor.CHERRY))
+        self.assertIs(first, second)
+        self.assertIsNot(first, DrinkSpec(Base.POKEACOLA, Size.LARGE, [Flavor.CHERRY]))
+        self.assertIs(FoodSpec("Hotdog", ["Chili"]), FoodSpec("hotdog", ["chili"]))
+
+    def test_spec_prices(self):
+        self.assertEqual(DrinkSpec(Base.WATER, Size.MEGA, [Flavor.LIME, Flavor.MINT]).get_total_cents(), 245)
+        self.assertEqual(FoodSpec("onion_rings", ["nacho_cheese"]).get_total_price(), 2.05)
+        self.assertEqual(IceStormSpec(IceStormFlavor.BANANA, ["storios"]).get_total_cents(), 450)
+
+    def test_items_map_to_specs(self):
+        drink = Drink(Base.SPRITE, Size.SMALL)
+        drink.add_flavor(Flavor.LEMON)
+        spec = drink.get_spec()
+        self.assertIs(spec, DrinkSpec(Base.SPRITE, Size.SMALL, [Flavor.LEMON]))
+        copy = spec.make()
+        self.assertIsNot(copy, drink)
+        self.assertIs(copy.get_spec(), spec)
+        self.assertEqual(copy.get_total_cents(), drink.get_total_cents())
+        food = FoodSpec("corndog", ["mustard"]).make()
+        self.assertEqual(food.get_num_toppings(), 1)
+        ice_storm = IceStorm(IceStormFlavor.SMORE)
+        ice_storm.add_topping("pecans")
+        self.assertIs(ice_storm.get_spec(), IceStormSpec(IceStormFlavor.SMORE, ["pecans"]))
+
+    def test_specs_are_immutable(self):
+        spec = FoodSpec("hotdog")
+        with self.assertRaises(AttributeError):
+            spec._cents = 0
+
+    def test_invalid_specs(self):
+        with self.assertRaises(ValueError):
+            FoodSpec("pizza")
+        with self.assertRaises(ValueError):
+            FoodSpec("hotdog", ["pineapple"])
+        with self.assertRaises(ValueError):
+            DrinkSpec(Base.WATER, Size.SMALL, ["lemon"])
+
+    def test_orders_hold_specs(self):
+        order = Order()
+        spec = DrinkSpec(Base.LEAF_WINE, Size.LARGE, [Flavor.BLUEBERRY])
+        order.add_item(spec)
+        order.add_item(spec)
+        order.add_item(FoodSpec("french_fries"))
+        self.assertEqual(order.get_subtotal_cents(), 2 * 220 + 150)
+        order.remove_item(0)
+        self.assertEqual(order.get_subtotal_cents(), 220 + 150)
+
+    def test_pickle_reinterns(self):
+        spec = IceStormSpec(IceStormFlavor.CHOCOLATE, ["cherry"])
+        self.assertIs(pickle.loads(pickle.dumps(spec)), spec)
+
+    def test_from_mask(self):
+        mask = Food.get_topping_bits()["chili"] | Food.get_topping_bits()["ketchup"]
+        self.assertIs(FoodSpec.from_mask("hotdog", mask), FoodSpec("hotdog", ["ketchup", "chili"]))
+        self.assertIs(DrinkSpec.from_mask(Base.WATER, Size.SMALL, FlavorSet.bit(Flavor.MINT)),
+                      DrinkSpec(Base.WATER, Size.SMALL, [Flavor.MINT]))
+        with self.assertRaises(ValueError):
+            IceStormSpec.from_mask(IceStormFlavor.BANANA, 1 << len(IceStorm.get_topping_bits()))
+
+class TestOrderLines(unittest.TestCase):
+    """Test cases for quantity-aggregated order lines."""
+
+    def test_same_spec_shares_a_line(self):
+        order = Order()
+        hotdog = FoodSpec("hotdog")
+        for _ in range(150):
+            order.add_item(FoodSpec("hotdog"))
+        order.add_item(hotdog, 50)
+        self.assertEqual(order.get_lines(), [(hotdog, 200)])
+        self.assertEqual(order.get_quantity(hotdog), 200)
+        self.assertEqual(order.get_num_items(), 200)
+        self.assertEqual(order.get_subtotal_cents(), 46000)
+
+    def test_decrement_closes_line(self):
+        order = Order()
+        cola = DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY])
+        order.add_item(cola, 3)
+        order.decrement_item(cola, 2)
+        self.assertEqual(order.get_quantity(cola), 1)
+        order.decrement_item(cola)
+        self.assertEqual(order.get_lines(), [])
+        self.assertEqual(order.get_subtotal_cents(), 0)
+        with self.assertRaises(ValueError):
+            order.decrement_item(cola)
+        with self.assertRaises(ValueError):
+            order.add_item(cola, 0)
+
+    def test_items_expand_lazily(self):
+        order = Order()
+        water = DrinkSpec(Base.WATER, Size.SMALL)
+        sprite = DrinkSpec(Base.SPRITE, Size.SMALL)
+        order.add_item(water, 2)
+        order.add_item(sprite)
+        items = order.get_items()
+        self.assertEqual(next(items), water)
+        self.assertEqual(list(items), [water, sprite])
+        order.remove_item(2)
+        self.assertEqual(list(order.get_items()), [water, water])
+        with self.assertRaises(IndexError):
+            order.remove_item(2)
+
+    def test_receipt_lines_carry_quantity(self):
+        order = Order()
+        order.add_item(DrinkSpec(Base.MR_SALT, Size.LARGE, [Flavor.LIME]), 200)
+        receipt = order.get_receipt()
+        self.assertEqual(receipt["number_drinks"], 200)
+        self.assertEqual(len(receipt["drinks"]), 1)
+        line = receipt["drinks"][0]
+        self.assertEqual(line["quantity"], 200)
+        self.assertEqual(line["total_cost"], 2.20)
+        self.assertEqual(line["line_total"], 440.00)
+        self.assertEqual(receipt["subtotal"], 440.00)
+
+class TestDrinkPriceTable(unittest.TestCase):
+    """Test cases for the precomputed drink price table."""
+
+    def setUp(self):
+        size_costs, flavor_cost = dict(Drink._size_costs), Drink._flavor_cost
+        self.addCleanup(Drink.set_prices, size_costs, flavor_cost)
+
+    def test_table_covers_every_configuration(self):
+        self.assertEqual(len(get_menu()._drinks), 6 * 4 * 64)
+        drink = Drink(Base.LEAF_WINE, Size.MEGA)
+        drink.set_flavors(list(Flavor))
+        self.assertEqual(drink.get_price_key(), len(get_menu()._drinks) - 1)
+        self.assertEqual(drink.get_total_cents(), 215 + 6 * 15)
+
+    def test_bulk_pricing(self):
+        drinks = [Drink(Base.WATER, size) for size in Size]
+        keys = [drink.get_price_key() for drink in drinks]
+        self.assertEqual(Drink.total_cents_for(keys), 150 + 175 + 205 + 215)
+
+    def test_set_flavors_reprices(self):
+        drink = Drink(Base.SPRITE, Size.SMALL)
+        drink.set_flavors([Flavor.MINT, Flavor.LEMON])
+        self.assertEqual(drink.get_total_cents(), 180)
+
+    def test_price_change_rebuilds_table(self):
+        drink = Drink(Base.HILL_FOG, Size.MEDIUM)
+        drink.add_flavor(Flavor.CHERRY)
+        spec = DrinkSpec(Base.HILL_FOG, Size.MEDIUM, [Flavor.CHERRY])
+        order = Order()
+        order.add_item(spec)
+        Drink.set_prices(size_costs={Size.MEDIUM: 180}, flavor_cost=20)
+        self.assertEqual(spec.get_total_cents(), 200)
+        self.assertEqual(spec.make().get_total_cents(), 200)
+        self.assertEqual(Drink(Base.WATER, Size.SMALL).get_total_cents(), 150)
+        # the drink and the order keep the menu they were priced with.
+        self.assertEqual(drink.get_total_cents(), 190)
+        self.assertEqual(drink.get_menu_version(), order.get_menu_version())
+        order.add_item(spec)
+        self.assertEqual(order.get_subtotal_cents(), 380)
+
+class TestMenu(unittest.TestCase):
+    """Test cases for the versioned Menu catalog."""
+
+    def setUp(self):
+        served = get_menu()
+        # versions only go up, so put the prices back as a newer version.
+        self.addCleanup(lambda: publish_menu(served.revise(version=get_menu().get_version() + 1)))
+
+    def next_config(self):
+        config = get_menu().to_config()
+        config["version"] += 1
+        return config
+
+    def test_built_in_menu_round_trips(self):
+        menu = get_menu()
+        copy = Menu.from_config(json.loads(json.dumps(menu.to_config())))
+        self.assertEqual(copy._drinks, menu._drinks)
+        self.assertEqual(copy._foods, menu._foods)
+        self.assertEqual(copy._ice_storms, menu._ice_storms)
+        self.assertEqual(menu.get_price_cents(FoodSpec("hotdog", ["chili"])), 290)
+        drink = pickle.loads(pickle.dumps(Drink(Base.SPRITE, Size.MEGA)))
+        self.assertEqual((drink.get_total_cents(), drink.get_menu_version()), (215, menu.get_version()))
+
+    def test_load_menu_from_file(self):
+        config = self.next_config()
+        config["drinks"]["bases"].remove("leaf wine")
+        config["food"]["toppings"]["chili"] = 90
+        del config["food"]["toppings"]["bacon_bits"]
+        del config["ice_storms"]["flavors"]["smore"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "menu.json")
+            with open(path, "w") as file:
+                json.dump(config, file)
+            menu = load_menu(path)
+        self.assertIs(get_menu(), menu)
+        with self.assertRaises(ValueError):
+            Drink(Base.LEAF_WINE, Size.SMALL)
+        with self.assertRaises(ValueError):
+            IceStorm(IceStormFlavor.SMORE)
+        food = Food("hotdog")
+        food.add_topping("chili")
+        self.assertEqual(food.get_total_cents(), 230 + 90)
+        self.assertEqual(food.get_menu_version(), menu.get_version())
+        with self.assertRaises(ValueError):
+            food.add_topping("bacon_bits")
+        with self.assertRaises(ValueError):
+            DrinkSpec(Base.LEAF_WINE, Size.SMALL).get_total_cents()
+
+    def test_open_orders_keep_their_menu(self):
+        before = Order()
+        before.add_item(FoodSpec("corndog"))
+        config = self.next_config()
+        config["food"]["items"]["corndog"] = 250
+        del config["food"]["items"]["tater_tots"]
+        publish_menu(Menu.from_config(config))
+        before.add_item(FoodSpec("corndog"))
+        before.add_item(FoodSpec("tater_tots"))
+        self.assertEqual(before.get_subtotal_cents(), 200 + 200 + 170)
+        after = Order()
+        after.add_item(FoodSpec("corndog"))
+        self.assertEqual(after.get_subtotal_cents(), 250)
+        with self.assertRaises(ValueError):
+            after.add_items([FoodSpec("corndog"), FoodSpec("tater_tots")])
+        self.assertEqual(after.get_num_items(), 1)
+        self.assertEqual(before.get_receipt()["menu_version"] + 1, after.get_receipt()["menu_version"])
+        self.assertEqual(after.snapshot().get_receipt(), after.get_receipt())
+
+    def test_menus_are_checked(self):
+        menu = get_menu()
+        with self.assertRaises(ValueError):
+            publish_menu(menu.revise(version=menu.get_version()))
+        with self.assertRaises(AttributeError):
+            menu._drinks = ()
+        for change in ({"food_prices": {"pizza": 500}}, {"food_toppings": {"chili": -5}},
+                       {"flavor_cost": 1.5}, {"version": 0}):
+            with self.assertRaises(ValueError):
+                menu.revise(**change)
+
+    def test_readers_see_whole_menus(self):
+        publishing = True
+
+        def publish():
+            for cents in range(100, 200):
+                publish_menu(get_menu().revise(size_costs={**get_menu()._size_costs, Size.SMALL: cents}))
+
+        torn = []
+
+        def read():
+            row = Drink(Base.WATER, Size.SMALL)._row
+            while publishing:
+                menu = get_menu()
+                if menu._drinks[row] != menu._size_costs[Size.SMALL]:
+                    torn.append(menu)
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        publish()
+        publishing = False
+        for reader in readers:
+            reader.join()
+        self.assertEqual(torn, [])
+
+
+class TestSku(unittest.TestCase):
+    """Test cases for 32-bit SKU encoding."""
+
+    def test_layout(self):
+        drink = Drink(Base.SPRITE, Size.LARGE)
+        drink.add_flavor(Flavor.CHERRY)
+        self.assertEqual(encode_sku(drink), SKU_DRINK << 28 | 1 << 20 | 2 << 16 | 0b10)
+        food = Food("corndog")
+        food.add_topping("mustard")
+        self.assertEqual(encode_sku(food), SKU_FOOD << 28 | 1 << 20 | 1 << 8)
+        ice_storm = IceStorm(IceStormFlavor.SMORE)
+        self.assertEqual(encode_sku(ice_storm), SKU_ICE_STORM << 28 | 5 << 20)
+
+    def test_round_trip_every_drink(self):
+        for base in Base:
+            for size in Size:
+                for mask in range(64):
+                    drink = Drink(base, size)
+                    drink.set_flavors(FlavorSet.from_mask(mask))
+                    spec = decode_sku(encode_sku(drink))
+                    self.assertIs(spec, drink.get_spec())
+                    self.assertLess(spec.get_sku(), 1 << 32)
+
+    def test_round_trip_food_and_ice_storms(self):
+        food = FoodSpec("nacho_chips", ["nacho_cheese", "chili", "bacon_bits"])
+        self.assertIs(decode_sku(food.get_sku()), food)
+        ice_storm = IceStormSpec(IceStormFlavor.BUTTER_PECAN, ["pecans", "cookie_dough"])
+        self.assertIs(decode_sku(ice_storm.get_sku()), ice_storm)
+        self.assertEqual(hash(ice_storm), ice_storm.get_sku())
+
+    def test_invalid_skus(self):
+        for sku in (0, SKU_DRINK << 28 | 6 << 20, SKU_DRINK << 28 | 1 << 6,
+                    SKU_FOOD << 28 | 1 << 16, SKU_FOOD << 28 | 1 << 9, 4 << 28):
+            with self.assertRaises(ValueError):
+                decode_sku(sku)
+
+    def test_order_as_sku_array(self):
+        order = Order()
+        cola = DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY])
+        order.add_item(cola, 3)
+        order.add_item(FoodSpec("hotdog"))
+        skus = order.to_skus()
+        self.assertEqual(skus.typecode, "I")
+        self.assertEqual(len(skus), 4)
+        copy = Order.from_skus(skus)
+        self.assertEqual(copy.get_lines(), order.get_lines())
+        self.assertEqual(copy.get_subtotal_cents(), order.get_subtotal_cents())
+
+class TestReceiptCache(unittest.TestCase):
+    """Test cases for memoized receipts."""
+
+    def setUp(self):
+        self.order = Order()
+        self.drink = Drink(Base.SPRITE, Size.MEDIUM)
+        self.spec = DrinkSpec(Base.WATER, Size.SMALL)
+        self.order.add_item(self.drink)
+        self.order.add_item(self.spec, 2)
+
+    def test_unchanged_order_reuses_receipt(self):
+        self.assertIs(self.order.get_receipt(), self.order.get_receipt())
+
+    def test_item_change_rebuilds_only_its_line(self):
+        first = self.order.get_receipt()
+        self.drink.add_flavor(Flavor.LEMON)
+        second = self.order.get_receipt()
+        self.assertIsNot(first, second)
+        self.assertEqual(second["drinks"][0]["flavors"], ["lemon"])
+        self.assertEqual(second["subtotal"], 1.90 + 3.00)
+        self.assertIs(second["drinks"][1], first["drinks"][1])
+        self.assertIsNot(second["drinks"][0], first["drinks"][0])
+
+    def test_every_mutation_invalidates(self):
+        mutations = [
+            lambda: self.order.add_item(self.spec),
+            lambda: self.order.remove_item(3),
+            lambda: self.drink.add_flavor(Flavor.MINT),
+            lambda: self.drink.set_flavors([Flavor.CHERRY]),
+        ]
+        for mutate in mutations:
+            before = self.order.get_receipt()
+            mutate()
+            self.assertIsNot(self.order.get_receipt(), before)
+        receipt = self.order.get_receipt()
+        self.assertEqual(receipt["number_drinks"], 3)
+        self.assertEqual(receipt["drinks"][0]["flavors"], ["cherry"])
+        self.assertEqual(receipt["drinks"][1]["quantity"], 2)
+
+    def test_repeated_flavor_keeps_receipt(self):
+        self.drink.add_flavor(Flavor.LIME)
+        before = self.order.get_receipt()
+        self.drink.add_flavor(Flavor.LIME)
+        self.assertIs(self.order.get_receipt(), before)
+
+    def test_food_topping_invalidates(self):
+        order = Order()
+        food = Food("hotdog")
+        order.add_item(food)
+        order._receipt = {}  # stands in for a cached receipt
+        food.add_topping("chili")
+        self.assertIsNone(order._receipt)
+
+class TestStreamingReceipt(unittest.TestCase):
+    """Test cases for streamed receipts."""
+
+    def make_order(self):
+        order = Order()
+        order.add_item(DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY]), 200)
+        drink = Drink(Base.WATER, Size.SMALL)
+        drink.set_flavors([Flavor.MINT, Flavor.LIME])
+        order.add_item(drink)
+        return order
+
+    def test_format_cents(self):
+        self.assertEqual(format_cents(123405), "$1,234.05")
+        self.assertEqual(format_cents(7), "$0.07")
+        self.assertEqual(format_cents(-150), "-$1.50")
+
+    def test_pieces_match_dict_receipt(self):
+        order = self.make_order()
+        pieces = list(order.iter_receipt())
+        receipt = order.get_receipt()
+        self.assertEqual([kind for kind, _ in pieces], ["header", "line", "line", "footer"])
+        self.assertEqual(pieces[0][1]["number_drinks"], receipt["number_drinks"])
+        self.assertEqual([data for kind, data in pieces if kind == "line"], receipt["drinks"])
+        footer = pieces[-1][1]
+        for key in ("subtotal", "tax", "grand_total"):
+            self.assertEqual(footer[key], receipt[key])
+
+    def test_write_receipt(self):
+        stream = io.StringIO()
+        self.assertEqual(self.make_order().write_receipt(stream), 6)
+        self.assertEqual(stream.getvalue().splitlines(), [
+            f"Order: 201 items, menu version {get_menu().get_version()}",
+            "x200 medium pokecola (cherry)  $380.00",
+            "x1 small water (mint, lime)  $1.80",
+            "Subtotal  $381.80",
+            "Tax  $27.68",
+            "Grand total  $409.48",
+        ])
+
+    def test_streaming_keeps_memory_flat(self):
+        order = Order()
+        for _ in range(5000):
+            order.add_item(Drink(Base.SPRITE, Size.LARGE))
+        tracemalloc.start()
+        for _ in order.iter_receipt():
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak, 20000)
+        self.assertEqual(order._entries, {})
+
+class TestItemProtocol(unittest.TestCase):
+    """Test cases for the common item protocol and receipt serializers."""
+
+    def test_every_kind_in_one_receipt(self):
+        order = Order()
+        drink = Drink(Base.SPRITE, Size.SMALL)
+        drink.add_flavor(Flavor.LIME)
+        food = Food("french_fries")
+        food.add_topping("ketchup")
+        ice_storm = IceStorm(IceStormFlavor.VANILLA_BEAN)
+        ice_storm.add_topping("storios")
+        for item in (drink, food, ice_storm):
+            order.add_item(item)
+        order.add_item(IceStormSpec(IceStormFlavor.SMORE), 2)
+        receipt = order.get_receipt()
+        self.assertEqual([line["kind"] for line in receipt["drinks"]],
+                         ["drink", "food", "ice storm", "ice storm"])
+        self.assertEqual(receipt["drinks"][1]["toppings"], ["ketchup"])
+        self.assertEqual(receipt["drinks"][2]["flavor"], "vanilla bean")
+        self.assertEqual(receipt["drinks"][3]["line_total"], 8.00)
+        self.assertEqual(receipt["subtotal"], 1.65 + 1.50 + 4.00 + 8.00)
+        stream = io.StringIO()
+        order.write_receipt(stream)
+        self.assertIn("x1 vanilla bean ice storm (storios)  $4.00", stream.getvalue())
+
+    def test_common_accessors(self):
+        for item, kind, customizations in (
+                (FoodSpec("hotdog", ["mustard", "chili"]), "food", ["chili", "mustard"]),
+                (DrinkSpec(Base.WATER, Size.SMALL, [Flavor.MINT]), "drink", ["mint"]),
+                (IceStorm(IceStormFlavor.BANANA), "ice storm", [])):
+            self.assertIsInstance(item, MenuItem)
+            self.assertEqual(item.get_kind(), kind)
+            self.assertEqual(item.get_customizations(), customizations)
+            self.assertEqual(item.get_total(), item.get_total_cents() / 100)
+
+    def test_new_category_plugs_in(self):
+        class GiftCard(MenuItem):
+            __slots__ = ("_cents",)
+            _kind = "gift card"
+
+            def __init__(self, cents):
+                self._cents = cents
+
+            def get_total_cents(self):
+                return self._cents
+
+            def get_customizations(self):
+                return []
+
+        order = Order()
+        with self.assertRaises(ValueError):
+            order.add_item(GiftCard(2500))
+
+        @register_line_serializer(GiftCard)
+        def gift_card_line(card, quantity, unit_cents):
+            return {"kind": "gift card", "description": "gift card", "quantity": quantity,
+                    "total_cost": unit_cents / 100, "line_total": unit_cents * quantity / 100}
+
+        order.add_item(GiftCard(2500))
+        self.assertEqual(order.get_receipt()["drinks"][0]["kind"], "gift card")
+        self.assertEqual(order.get_subtotal_cents(), 2500)
+
+    def test_rejects_non_items(self):
+        with self.assertRaises(ValueError):
+            Order().add_item("hotdog")
+
+class TestBulkBuild(unittest.TestCase):
+    """Test cases for bulk item construction and Order.add_items."""
+
+    def test_drink_from_specs(self):
+        drinks = Drink.from_specs([
+            (Base.WATER, Size.SMALL),
+            (Base.SPRITE, Size.MEGA, [Flavor.LIME, Flavor.MINT]),
+            DrinkSpec(Base.HILL_FOG, Size.LARGE, [Flavor.CHERRY]),
+            (Base.SPRITE, Size.MEGA, [Flavor.LIME, Flavor.MINT]),
+        ])
+        self.assertEqual([drink.get_total_cents() for drink in drinks], [150, 245, 220, 245])
+        self.assertIsNot(drinks[1], drinks[3])
+        self.assertEqual(drinks[1].get_flavors(), [Flavor.MINT, Flavor.LIME])
+        drinks[1].add_flavor(Flavor.LEMON)
+        self.assertEqual(drinks[3].get_num_flavors(), 2)
+
+    def test_food_and_ice_storm_from_specs(self):
+        foods = Food.from_specs(["Hotdog", ("nacho_chips", ["chili"]), FoodSpec("corndog")])
+        self.assertEqual([food.get_total_cents() for food in foods], [230, 250, 200])
+        ice_storms = IceStorm.from_specs([IceStormFlavor.SMORE, (IceStormFlavor.BANANA, ["pecans"])])
+        self.assertEqual([ice_storm.get_total_cents() for ice_storm in ice_storms], [400, 400])
+
+    def test_invalid_spec_names_position(self):
+        with self.assertRaisesRegex(ValueError, "Spec 2"):
+            Drink.from_specs([(Base.WATER, Size.SMALL)] * 2 + [(Base.WATER, "huge")])
+        with self.assertRaisesRegex(ValueError, "Spec 1"):
+            Food.from_specs(["hotdog", ("hotdog", ["pineapple"])])
+        with self.assertRaisesRegex(ValueError, "Spec 0"):
+            Food.from_specs([42])
+
+    def test_add_items(self):
+        order = Order()
+        spec = FoodSpec("hotdog")
+        drinks = Drink.from_specs([(Base.WATER, Size.SMALL)] * 3)
+        order.add_item(spec)
+        receipt = order.get_receipt()
+        order.add_items(drinks + [spec, spec, IceStormSpec(IceStormFlavor.CHOCOLATE)])
+        self.assertEqual(order.get_num_items(), 7)
+        self.assertEqual(order.get_quantity(spec), 3)
+        self.assertEqual(order.get_subtotal_cents(), 3 * 150 + 3 * 230 + 300)
+        self.assertIsNot(order.get_receipt(), receipt)
+        self.assertEqual(order.get_receipt()["drinks"][0]["quantity"], 3)
+        drinks[0].add_flavor(Flavor.MINT)
+        self.assertEqual(order.get_subtotal_cents(), 3 * 150 + 3 * 230 + 300 + 15)
+
+    def test_add_items_is_atomic(self):
+        order = Order()
+        drink = Drink(Base.WATER, Size.SMALL)
+        with self.assertRaisesRegex(ValueError, "Item 1"):
+            order.add_items([drink, "hotdog"])
+        self.assertEqual(order.get_num_items(), 0)
+        self.assertEqual(order.get_subtotal_cents(), 0)
+        self.assertEqual(drink._watchers, ())
+
+class TestEditSessions(unittest.TestCase):
+    """Test cases for transactional edits."""
+
+    def test_drink_edit_reprices_and_notifies_once(self):
+        class CountingOrder(Order):
+            __slots__ = ("changes",)
+
+            def _item_changed(self, item):
+                self.changes += 1
+                super()._item_changed(item)
+
+        order = CountingOrder()
+        order.changes = 0
+        drink = Drink(Base.POKEACOLA, Size.LARGE)
+        drink.add_flavor(Flavor.LEMON)
+        order.add_item(drink)
+        with drink.begin_edit() as edit:
+            edit.add_flavor(Flavor.CHERRY).add_flavor(Flavor.MINT)
+            edit.remove_flavor(Flavor.LEMON)
+            self.assertEqual(drink.get_flavors(), [Flavor.LEMON])
+        self.assertEqual(order.changes, 1)
+        self.assertEqual(drink.get_flavors(), [Flavor.CHERRY, Flavor.MINT])
+        self.assertEqual(drink.get_total_cents(), 235)
+        self.assertEqual(order.get_subtotal_cents(), 235)
+
+    def test_cost_matches_contents_after_set_flavors(self):
+        drink = Drink(Base.WATER, Size.SMALL)
+        drink.set_flavors([Flavor.LIME, Flavor.MINT, Flavor.LEMON])
+        self.assertEqual(drink.get_total_cents(), 195)
+        with drink.begin_edit() as edit:
+            edit.set_flavors([Flavor.CHERRY])
+        self.assertEqual(drink.get_total_cents(), 165)
+
+    def test_edit_keeps_changes_made_meanwhile(self):
+        drink = Drink(Base.WATER, Size.SMALL)
+        drink.add_flavor(Flavor.LEMON)
+        edit = drink.begin_edit()
+        drink.add_flavor(Flavor.LIME)
+        edit.add_flavor(Flavor.MINT).remove_flavor(Flavor.LEMON)
+        edit.commit()
+        self.assertEqual(drink.get_flavors(), [Flavor.MINT, Flavor.LIME])
+        food = Food("hotdog")
+        with food.begin_edit() as toppings:
+            toppings.add_topping("chili")
+            food.add_topping("ketchup")
+        self.assertEqual(food.get_toppings(), ["chili", "ketchup"])
+
+    def test_invalid_change_is_rejected_when_staged(self):
+        food = Food("hotdog")
+        edit = food.begin_edit()
+        edit.add_topping("Chili")
+        with self.assertRaises(ValueError):
+            edit.add_topping("pineapple")
+        edit.commit()
+        self.assertEqual(food.get_toppings(), ["chili"])
+        with self.assertRaises(RuntimeError):
+            edit.commit()
+
+    def test_failed_block_discards(self):
+        ice_storm = IceStorm(IceStormFlavor.CHOCOLATE)
+        with self.assertRaises(KeyError):
+            with ice_storm.begin_edit() as edit:
+                edit.add_topping("storios")
+                raise KeyError("register crashed")
+        self.assertEqual(ice_storm.get_total_cents(), 300)
+
+    def test_order_edit(self):
+        order = Order()
+        hotdog = FoodSpec("hotdog")
+        order.add_item(hotdog, 2)
+        receipt = order.get_receipt()
+        edit = order.begin_edit()
+        edit.add_item(DrinkSpec(Base.SPRITE, Size.SMALL), 3)
+        edit.decrement_item(hotdog, 2)
+        self.assertIs(order.get_receipt(), receipt)
+        edit.commit()
+        self.assertEqual(order.get_lines(), [(DrinkSpec(Base.SPRITE, Size.SMALL), 3)])
+        self.assertEqual(order.get_subtotal_cents(), 450)
+        self.assertEqual(order.get_num_items(), 3)
+        with self.assertRaises(ValueError):
+            order.begin_edit().decrement_item(hotdog)
+
+    def test_order_edit_rechecks_at_commit(self):
+        order = Order()
+        hotdog = FoodSpec("hotdog")
+        order.add_item(hotdog)
+        edit = order.begin_edit().decrement_item(hotdog)
+        order.decrement_item(hotdog)
+        with self.assertRaises(ValueError):
+            edit.commit()
+        self.assertEqual(order.get_num_items(), 0)
+
+class TestLineIds(unittest.TestCase):
+    """Test cases for stable line ids."""
+
+    def setUp(self):
+        self.order = Order()
+        self.water = DrinkSpec(Base.WATER, Size.SMALL)
+        self.hotdog = FoodSpec("hotdog")
+        self.drink = Drink(Base.SPRITE, Size.MEDIUM)
+        self.order.add_item(self.water)
+        self.order.add_item(self.hotdog, 4)
+        self.order.add_item(self.drink)
+
+    def test_ids_survive_other_removals(self):
+        hotdog_id = self.order.get_line_id(self.hotdog)
+        drink_id = self.order.get_line_id(self.drink)
+        self.order.remove_line(self.order.get_line_id(self.water))
+        self.assertEqual(self.order.get_line_id(self.hotdog), hotdog_id)
+        self.order.remove_line(drink_id)
+        self.assertEqual(self.order.get_line(hotdog_id), (self.hotdog, 4))
+        self.assertEqual(self.order.get_subtotal_cents(), 4 * 230)
+        with self.assertRaises(KeyError):
+            self.order.remove_line(drink_id)
+
+    def test_partial_removal(self):
+        hotdog_id = self.order.get_line_id(self.hotdog)
+        self.order.remove_line(hotdog_id, 3)
+        self.assertEqual(self.order.get_line(hotdog_id), (self.hotdog, 1))
+        self.assertEqual(self.order.get_num_items(), 3)
+
+    def test_iteration_keeps_insertion_order(self):
+        self.order.remove_line(self.order.get_line_id(self.water))
+        self.order.add_item(self.water)
+        lines = list(self.order.iter_lines())
+        self.assertEqual([item for _, item, _ in lines], [self.hotdog, self.drink, self.water])
+        self.assertEqual([line_id for line_id, _, _ in lines], [2, 3, 4])
+        self.assertEqual([item for item, _ in self.order.get_lines()], [self.hotdog, self.drink, self.water])
+
+    def test_index_api_still_works(self):
+        self.order.remove_item(1)
+        self.assertEqual(self.order.get_quantity(self.hotdog), 3)
+        self.order.remove_item(0)
+        self.assertIsNone(self.order.get_line_id(self.water))
+        self.drink.add_flavor(Flavor.MINT)
+        self.assertEqual(self.order.get_subtotal_cents(), 3 * 230 + 190)
+
+    def test_bulk_paths_keep_ids(self):
+        edit = self.order.begin_edit()
+        edit.decrement_item(self.drink)
+        edit.add_item(FoodSpec("corndog"))
+        edit.commit()
+        self.assertIsNone(self.order.get_line_id(self.drink))
+        self.assertEqual(self.order.get_line_id(FoodSpec("corndog")), 4)
+        self.assertEqual([line_id for line_id, _, _ in self.order.iter_lines()], [1, 2, 4])
+
+class TestSnapshots(unittest.TestCase):
+    """Test cases for order snapshots and undo."""
+
+    def setUp(self):
+        self.order = Order()
+        self.water = DrinkSpec(Base.WATER, Size.SMALL)
+        self.drink = Drink(Base.SPRITE, Size.MEDIUM)
+        self.order.add_item(self.water, 2)
+        self.order.add_item(self.drink)
+
+    def test_snapshot_is_frozen(self):
+        snapshot = self.order.snapshot()
+        receipt = self.order.get_receipt()
+        self.drink.add_flavor(Flavor.MINT)
+        self.order.add_item(FoodSpec("hotdog"))
+        self.order.remove_line(self.order.get_line_id(self.water))
+        self.assertEqual(snapshot.get_lines(), [(self.water, 2), (DrinkSpec(Base.SPRITE, Size.MEDIUM), 1)])
+        self.assertEqual(snapshot.get_subtotal_cents(), 2 * 150 + 175)
+        self.assertEqual(snapshot.get_num_items(), 3)
+        self.assertEqual(snapshot.get_receipt(), receipt)
+
+    def test_versions_share_structure(self):
+        order = Order()
+        for _ in range(2000):
+            order.add_item(Drink(Base.WATER, Size.SMALL))  # a line each
+        before = order.snapshot()
+        order.remove_line(1500)
+        after = order.snapshot()
+        self.assertEqual(list(before._tree.changed_keys(after._tree)), [1500])
+        shared = set(map(id, before._tree._root)) & set(map(id, after._tree._root))
+        self.assertEqual(len(shared), len(before._tree._root) - 1)
+        self.assertEqual(len(list(after._tree.items())), 1999)
+
+    def test_undo_and_redo(self):
+        self.order.enable_undo()
+        self.assertFalse(self.order.can_undo())
+        self.order.add_item(self.water)
+        self.order.remove_line(self.order.get_line_id(self.drink))
+        self.assertTrue(self.order.undo())
+        self.assertEqual(self.order.get_lines(), [(self.water, 3), (self.drink, 1)])
+        self.assertEqual(self.order.get_line_id(self.drink), 2)
+        self.assertTrue(self.order.undo())
+        self.assertEqual(self.order.get_subtotal_cents(), 2 * 150 + 175)
+        self.assertFalse(self.order.undo())
+        self.assertTrue(self.order.redo())
+        self.assertTrue(self.order.redo())
+        self.assertFalse(self.order.redo())
+        self.assertEqual(self.order.get_lines(), [(self.water, 3)])
+        self.assertEqual(self.order.get_receipt()["grand_total"], to_dollars(450 + tax_cents(450)))
+
+    def test_undo_restores_item_changes(self):
+        self.order.enable_undo()
+        self.drink.set_flavors([Flavor.LIME, Flavor.CHERRY])
+        self.assertEqual(self.order.get_subtotal_cents(), 2 * 150 + 205)
+        self.order.undo()
+        self.assertEqual(self.drink.get_customizations(), [])
+        self.assertEqual(self.order.get_subtotal_cents(), 2 * 150 + 175)
+        # the drink still tells the order about changes after undo.
+        self.drink.add_flavor(Flavor.MINT)
+        self.assertEqual(self.order.get_subtotal_cents(), 2 * 150 + 190)
+        self.assertFalse(self.order.can_redo())
+
+    def test_undo_brings_lines_back_in_place(self):
+        self.order.enable_undo()
+        self.order.remove_line(1)
+        self.order.add_item(FoodSpec("corndog"))
+        self.order.undo()
+        self.order.undo()
+        self.assertEqual([line_id for line_id, _, _ in self.order.iter_lines()], [1, 2])
+        self.assertEqual(next(self.order.get_items()), self.water)
+        self.order.add_item(FoodSpec("corndog"))
+        self.assertEqual(self.order.get_line_id(FoodSpec("corndog")), 4)
+
+    def test_undo_limit(self):
+        self.order.enable_undo(limit=2)
+        for _ in range(5):
+            self.order.add_item(self.water)
+        self.assertTrue(self.order.undo())
+        self.assertTrue(self.order.undo())
+        self.assertFalse(self.order.undo())
+        self.assertEqual(self.order.get_quantity(self.water), 5)
+        with self.assertRaises(ValueError):
+            self.order.enable_undo(limit=0)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
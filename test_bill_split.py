@@ -0,0 +1,65 @@
+import unittest
+from Drink_Project import Drink, Order, Base, Size, Flavor, DrinkSpec, FoodSpec
+from bill_split import EvenSplit, BySeat, ByItem, allocate_cents, split_order
+
+
+class TestBillSplit(unittest.TestCase):
+    """Test cases for splitting an order's bill."""
+
+    def setUp(self):
+        self.order = Order()
+        self.order.add_item(DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY]), 3)  # line 1, 190 each
+        self.order.add_item(FoodSpec("hotdog", ["ketchup"]), 2)  # line 2
+        drink = Drink(Base.WATER, Size.SMALL)
+        self.order.add_item(drink)  # line 3, 150
+
+    def assertAddsUp(self, bills):
+        self.assertEqual(sum(b.get_subtotal_cents() for b in bills), self.order.get_subtotal_cents())
+        self.assertEqual(sum(b.get_tax_cents() for b in bills), self.order.get_tax_cents())
+        self.assertEqual(sum(b.get_grand_total_cents() for b in bills), self.order.get_grand_total_cents())
+
+    def test_allocate_cents(self):
+        self.assertEqual(allocate_cents(100, [1, 1, 1]), [34, 33, 33])
+        self.assertEqual(allocate_cents(10, [1, 2, 7]), [1, 2, 7])
+        self.assertEqual(allocate_cents(5, [1, 3]), [1, 4])
+        self.assertEqual(allocate_cents(0, [0, 0]), [0, 0])
+        with self.assertRaises(ValueError):
+            allocate_cents(1, [0, 0])
+
+    def test_even_split(self):
+        for ways in range(1, 12):
+            bills = split_order(self.order, EvenSplit(ways))
+            self.assertEqual([b.get_payer() for b in bills], list(range(1, ways + 1)))
+            self.assertAddsUp(bills)
+            totals = [b.get_grand_total_cents() for b in bills]
+            self.assertLessEqual(max(totals) - min(totals), 2)
+
+    def test_by_seat(self):
+        bills = split_order(self.order, BySeat({1: "ann", 2: ("ann", "bob"), 3: "bob"}))
+        self.assertEqual([b.get_payer() for b in bills], ["ann", "bob"])
+        hotdogs = self.order.get_unit_cents(FoodSpec("hotdog", ["ketchup"])) * 2
+        self.assertEqual(bills[0].get_subtotal_cents(), 3 * 190 + hotdogs // 2)
+        self.assertEqual(bills[1].get_subtotal_cents(), 150 + hotdogs // 2)
+        self.assertEqual(len(bills[0].get_lines()), 2)
+        self.assertAddsUp(bills)
+
+    def test_by_item(self):
+        bills = split_order(self.order, ByItem({1: {"ann": 1, "bob": 2}, 2: {"bob": 2}, 3: {"cy": 1}}))
+        self.assertEqual(bills[0].get_subtotal_cents(), 190)
+        self.assertEqual(bills[2].get_subtotal_cents(), 150)
+        self.assertAddsUp(bills)
+        with self.assertRaises(ValueError):
+            split_order(self.order, ByItem({1: {"ann": 1}, 2: {"bob": 2}, 3: {"cy": 1}}))
+
+    def test_unassigned_line(self):
+        with self.assertRaises(ValueError):
+            split_order(self.order, BySeat({1: "ann", 2: "bob"}))
+
+    def test_split_is_deterministic(self):
+        policy = BySeat({1: ("a", "b", "c"), 2: ("a", "b", "c"), 3: "c"})
+        first = [b.get_grand_total_cents() for b in split_order(self.order, policy)]
+        self.assertEqual(first, [b.get_grand_total_cents() for b in split_order(self.order, policy)])
+        self.assertAddsUp(split_order(self.order, policy))
+
+if __name__ == '__main__':
+    unittest.main()
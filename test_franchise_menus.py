@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+import unittest
+from Drink_Project import Drink, Food, DrinkSpec, FoodSpec, Base, Size, Flavor, get_menu, publish_menu
+from franchise_menus import Franchise, MenuOverlay
+
+
+class TestFranchiseMenus(unittest.TestCase):
+    """Test cases for layered franchise menus."""
+
+    def setUp(self):
+        self.franchise = Franchise()
+        self.franchise.set_region("north", MenuOverlay(food_toppings={"chili": 75}, size_costs={Size.MEGA: 230}))
+        self.franchise.set_store(1, "north", MenuOverlay(bases={Base.LEAF_WINE: False}))
+        self.franchise.set_store(2, "north", MenuOverlay(food_toppings={"chili": 90}))
+        self.franchise.set_store(3)
+
+    def test_layers_are_flattened(self):
+        chili_dog = FoodSpec("hotdog", ["chili"])
+        one, two, three = (self.franchise.get_store_menu(store) for store in (1, 2, 3))
+        self.assertEqual(one.get_price_cents(chili_dog), 230 + 75)
+        self.assertEqual(two.get_price_cents(chili_dog), 230 + 90)
+        self.assertEqual(three.get_price_cents(chili_dog), 230 + 60)
+        self.assertEqual(two.get_price_cents(DrinkSpec(Base.WATER, Size.MEGA, [Flavor.LIME])), 230 + 15)
+        with self.assertRaises(ValueError):
+            one.get_price_cents(DrinkSpec(Base.LEAF_WINE, Size.SMALL))
+        self.assertEqual(two.get_price_cents(DrinkSpec(Base.LEAF_WINE, Size.SMALL)), 150)
+
+    def test_store_orders_use_the_store_menu(self):
+        order = self.franchise.open_order(1)
+        order.add_item(FoodSpec("hotdog", ["chili"]), 2)
+        order.add_item(Drink(Base.SPRITE, Size.MEGA))
+        self.assertEqual(order.get_subtotal_cents(), 2 * 305 + 230)
+        self.assertEqual(order.get_menu_version(), self.franchise.get_store_menu(1).get_version())
+        with self.assertRaises(ValueError):
+            order.add_item(Drink(Base.LEAF_WINE, Size.SMALL))
+        with self.assertRaises(ValueError):
+            self.franchise.open_order(4)
+
+    def test_store_orders_refuse_withdrawn_options(self):
+        self.franchise.set_store(4, overlay=MenuOverlay(flavors={Flavor.LEMON: False},
+                                                        food_toppings={"chili": None}))
+        order = self.franchise.open_order(4)
+        drink = Drink(Base.WATER, Size.SMALL)
+        food = Food("hotdog")
+        order.add_item(drink)
+        order.add_item(food)
+        with self.assertRaises(ValueError):
+            drink.add_flavor(Flavor.LEMON)
+        with self.assertRaises(ValueError):
+            food.add_topping("chili")
+        with self.assertRaises(ValueError):
+            drink.set_flavors([Flavor.MINT, Flavor.LEMON])
+        with self.assertRaises(ValueError):
+            with food.begin_edit() as edit:
+                edit.add_topping("chili")
+        self.assertEqual((drink.get_flavors(), food.get_toppings()), ([], []))
+        self.assertEqual(order.get_subtotal_cents(), 150 + 230)
+        self.assertNotIn("chili", str(order.get_receipt()))
+        drink.add_flavor(Flavor.MINT)
+        self.assertEqual(order.get_subtotal_cents(), 165 + 230)
+
+    def test_items_can_be_bound_to_a_store_menu(self):
+        menu = self.franchise.get_store_menu(2)
+        drink = Drink(Base.SPRITE, Size.MEGA, menu=menu)
+        food = FoodSpec("hotdog", ["chili"]).make(menu)
+        self.assertEqual((drink.get_total_cents(), food.get_total_cents()), (230, 320))
+        self.assertEqual(drink.get_menu_version(), menu.get_version())
+        with self.assertRaises(ValueError):
+            Drink(Base.LEAF_WINE, Size.SMALL, menu=self.franchise.get_store_menu(1))
+        self.assertEqual([d.get_total_cents() for d in Drink.from_specs([(Base.WATER, Size.MEGA)], menu)], [230])
+
+    def test_changes_rebuild_the_stores_they_reach(self):
+        before = self.franchise.get_store_menus()
+        self.franchise.set_region("north", MenuOverlay(food_toppings={"chili": None}))
+        after = self.franchise.get_store_menus()
+        self.assertIs(after[3], before[3])
+        with self.assertRaises(ValueError):
+            after[1].get_price_cents(FoodSpec("hotdog", ["chili"]))
+        self.assertEqual(after[2].get_price_cents(FoodSpec("hotdog", ["chili"])), 320)
+        self.franchise.set_corporate_menu(get_menu().revise(flavor_cost=20))
+        latest = self.franchise.get_store_menus()
+        versions = [menu.get_version() for menu in latest.values()]
+        self.assertEqual(len(set(versions)), len(versions))
+        self.assertEqual(max(versions), self.franchise.get_version())
+        self.assertGreater(min(versions), max(menu.get_version() for menu in before.values()))
+        self.assertEqual(latest[3].get_price_cents(DrinkSpec(Base.WATER, Size.SMALL, [Flavor.MINT])), 170)
+
+    def test_untouched_tables_are_shared(self):
+        menus = self.franchise.get_store_menus()
+        self.assertIs(menus[1]._foods, get_menu().revise(food_toppings={**get_menu()._food_toppings,
+                                                                       "chili": 75})._foods)
+        self.assertIs(menus[2]._drinks, menus[1].revise(bases=set(Base))._drinks)
+        self.assertIs(menus[3]._ice_storms, menus[1]._ice_storms)
+
+    def test_store_registers_can_publish_their_menu(self):
+        served = get_menu()
+        self.addCleanup(lambda: publish_menu(served.revise(version=get_menu().get_version() + 1)))
+        publish_menu(self.franchise.get_store_menu(1))
+        with self.assertRaises(ValueError):
+            Drink(Base.LEAF_WINE, Size.SMALL)
+
+    def test_store_menus_are_newer_than_a_new_corporate_menu(self):
+        served = get_menu()
+        self.addCleanup(lambda: publish_menu(served.revise(version=get_menu().get_version() + 1)))
+        corporate = served.revise(version=self.franchise.get_version() + 5, flavor_cost=20)
+        publish_menu(corporate)
+        self.franchise.set_corporate_menu(corporate)
+        store_menu = self.franchise.get_store_menu(3)
+        self.assertGreater(store_menu.get_version(), corporate.get_version())
+        publish_menu(store_menu)
+        drink = Drink(Base.WATER, Size.SMALL)
+        drink.add_flavor(Flavor.MINT)
+        self.assertEqual(drink.get_total_cents(), 170)
+
+    def test_overlays_are_checked(self):
+        with self.assertRaises(ValueError):
+            MenuOverlay(food_prices={"pizza": 500})
+        with self.assertRaises(ValueError):
+            MenuOverlay(bases={Base.WATER: 0})
+        with self.assertRaises(ValueError):
+            self.franchise.set_store(5, "south")
+        with self.assertRaises(ValueError):
+            self.franchise.set_store(5, overlay=MenuOverlay(food_prices={"hotdog": -1}))
+
+    def test_load_from_file(self):
+        config = {
+            "regions": {"north": {"food": {"toppings": {"chili": 75}}}},
+            "stores": {
+                "17": {"region": "north", "drinks": {"bases": {"leaf wine": False}, "sizes": {"mega": None}}},
+                "18": {"food": {"items": {"corndog": 250}}},
+            },
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "franchise.json")
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(config, file)
+            franchise = Franchise.load(path)
+        seventeen = franchise.get_store_menu("17")
+        self.assertEqual(seventeen.get_price_cents(FoodSpec("hotdog", ["chili"])), 305)
+        with self.assertRaises(ValueError):
+            seventeen.get_price_cents(DrinkSpec(Base.WATER, Size.MEGA))
+        self.assertEqual(franchise.get_store_menu("18").get_price_cents(FoodSpec("corndog")), 250)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from Drink_Project import Drink, Food, Order, get_menu, publish_menu, Base, Size, Flavor, DrinkSpec, FoodSpec, IceStormSpec, IceStormFlavor, decode_sku
+
+try:
+    import numpy
+    from order_batch import OrderBatch
+except ImportError:  # numpy is optional, only the batch module needs it
+    numpy = None
+
+
+def sample_orders():
+    """builds a few orders mixing specs, mutable items and an empty order."""
+    first = Order()
+    first.add_item(DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY]), 3)
+    food = Food("nacho_chips")
+    food.add_topping("nacho_cheese")
+    food.add_topping("chili")
+    first.add_item(food)
+    second = Order()
+    drink = Drink(Base.LEAF_WINE, Size.MEGA)
+    drink.set_flavors([Flavor.LIME, Flavor.MINT, Flavor.LEMON])
+    second.add_item(drink, 2)
+    second.add_item(FoodSpec("hotdog", ["ketchup"]), 200)
+    return [first, Order(), second]
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestOrderBatch(unittest.TestCase):
+    """Test cases for columnar order batches."""
+
+    def test_totals_match_receipts(self):
+        orders = sample_orders()
+        batch = OrderBatch.from_orders(orders)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.get_num_lines(), 4)
+        self.assertEqual(batch.subtotals_cents().tolist(), [o.get_subtotal_cents() for o in orders])
+        self.assertEqual(batch.taxes_cents().tolist(), [o.get_tax_cents() for o in orders])
+        self.assertEqual(batch.grand_totals_cents().tolist(), [o.get_grand_total_cents() for o in orders])
+        for order, grand_total in zip(orders, batch.grand_totals_cents().tolist()):
+            self.assertEqual(grand_total / 100, order.get_receipt()["grand_total"])
+
+    def test_totals_match_drink_receipt(self):
+        order = Order()
+        order.add_item(DrinkSpec(Base.MR_SALT, Size.SMALL, [Flavor.STRAWBERRY]), 7)
+        order.add_item(Drink(Base.WATER, Size.LARGE))
+        receipt = order.get_receipt()
+        batch = OrderBatch.from_orders([order])
+        self.assertEqual(batch.subtotals_cents()[0] / 100, receipt["subtotal"])
+        self.assertEqual(batch.taxes_cents()[0] / 100, receipt["tax"])
+        self.assertEqual(batch.grand_totals_cents()[0] / 100, receipt["grand_total"])
+
+    def test_columns(self):
+        batch = OrderBatch.from_orders(sample_orders())
+        self.assertEqual(batch.offsets.tolist(), [0, 2, 2, 4])
+        self.assertEqual(batch.flavor_count.tolist(), [1, 0, 3, 0])
+        self.assertEqual(batch.quantity.tolist(), [3, 1, 2, 200])
+
+    def test_settle(self):
+        orders = sample_orders()
+        totals = OrderBatch.from_orders(orders).settle()
+        self.assertEqual(totals["orders"], 3)
+        self.assertEqual(totals["items"], 206)
+        self.assertEqual(totals["grand_total"], sum(o.get_grand_total_cents() for o in orders))
+
+    def test_orders_settle_at_the_prices_they_charged(self):
+        served = get_menu()
+        self.addCleanup(lambda: publish_menu(served.revise(version=get_menu().get_version() + 1)))
+        orders = sample_orders()
+        Drink.set_prices(size_costs={Size.SMALL: 999, Size.MEDIUM: 999, Size.MEGA: 999})
+        batch = OrderBatch.from_orders(orders)
+        self.assertEqual(batch.subtotals_cents().tolist(), [o.get_subtotal_cents() for o in orders])
+        self.assertEqual(batch.settle()["grand_total"], sum(o.get_grand_total_cents() for o in orders))
+        repriced = batch.subtotals_cents(get_menu()).tolist()
+        self.assertEqual(repriced[0], 3 * (999 + 15) + orders[0].get_subtotal_cents() - 3 * 190)
+
+    def test_round_trip(self):
+        orders = sample_orders()
+        rebuilt = OrderBatch.from_orders(orders).to_orders()
+        self.assertEqual([o.get_subtotal_cents() for o in rebuilt], [o.get_subtotal_cents() for o in orders])
+        self.assertEqual(rebuilt[0].get_lines()[1], (FoodSpec("nacho_chips", ["nacho_cheese", "chili"]), 1))
+
+    def test_round_trip_reprices_with_the_menu_given(self):
+        orders = sample_orders()
+        menu = get_menu().revise(version=get_menu().get_version() + 1,
+                                 size_costs={**get_menu()._size_costs, Size.MEDIUM: 999})
+        batch = OrderBatch.from_orders(orders)
+        rebuilt = batch.to_orders(menu)
+        self.assertNotEqual(rebuilt[0].get_subtotal_cents(), orders[0].get_subtotal_cents())
+        self.assertEqual([o.get_menu_version() for o in rebuilt], [menu.get_version()] * len(orders))
+        self.assertEqual([o.get_subtotal_cents() for o in rebuilt], batch.subtotals_cents(menu).tolist())
+
+    def test_ice_storm_lines(self):
+        spec = IceStormSpec(IceStormFlavor.BANANA, ["storios", "pecans"])
+        batch = OrderBatch.from_skus([spec.get_sku()], [4], [0, 1])
+        self.assertEqual(batch.subtotals_cents().tolist(), [4 * 500])
+
+    def test_invalid_offsets(self):
+        with self.assertRaises(ValueError):
+            OrderBatch.from_skus([FoodSpec("hotdog").get_sku()], [1], [0, 2])
+
+    def test_invalid_skus_are_not_priced(self):
+        for sku in (0x10900000, 0x20c00000, 0x30600000, 0x10040000):
+            with self.assertRaises(ValueError):
+                decode_sku(sku)
+            with self.assertRaises(ValueError):
+                OrderBatch.from_skus([sku], [1], [0, 1]).unit_cents(get_menu())
+
+if __name__ == '__main__':
+    unittest.main()
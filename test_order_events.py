@@ -0,0 +1,133 @@
+import os
+import sys
+import tempfile
+import unittest
+from Drink_Project import Drink, Food, IceStorm, Base, Size, Flavor, IceStormFlavor, DrinkSpec
+from order_events import (EventLog, TabState, ITEM_ADDED, FLAVOR_ADDED, TOPPING_ADDED, OPTIONS_SET,
+                          ITEM_REMOVED, PAID, VOIDED, MUTABLE)
+
+
+def lines_of(order):
+    return [(order.get_line_id(item), item.get_sku(), quantity) for item, quantity in order.get_lines()]
+
+
+def fill(log, tab):
+    """returns a tab with a spec line, a drink given a flavor later and a food reduced by one."""
+    order = log.open_tab(tab)
+    order.add_item(DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY]), 2)
+    drink = Drink(Base.SPRITE, Size.LARGE)
+    order.add_item(drink)
+    food = Food("hotdog")
+    order.add_item(food, 3)
+    drink.add_flavor(Flavor.LIME)
+    food.add_topping("ketchup")
+    order.decrement_item(food)
+    return order
+
+
+class TestOrderEvents(unittest.TestCase):
+    """Test cases for the order event log and its replay."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_changes_are_logged_as_events(self):
+        log = EventLog()
+        order = fill(log, 7)
+        events = [tuple(log._events[i:i + 5]) for i in range(0, len(log._events), 5)]
+        self.assertEqual([event[0] for event in events],
+                         [ITEM_ADDED, ITEM_ADDED, ITEM_ADDED, FLAVOR_ADDED, TOPPING_ADDED, ITEM_REMOVED])
+        self.assertTrue(all(event[1] == 7 for event in events))
+        self.assertEqual(events[1][3] | events[3][3], order.get_lines()[1][0].get_sku() | MUTABLE)
+        self.assertEqual(events[5][2:4], (3, 1))
+        order.remove_line(1)
+        self.assertEqual(tuple(log._events[-5:-2]), (ITEM_REMOVED, 7, 1))
+
+    def test_replay_rebuilds_the_order(self):
+        log = EventLog()
+        order = fill(log, 7)
+        rebuilt = log.get_state().get_open_tabs()[7]
+        self.assertEqual(lines_of(rebuilt), lines_of(order))
+        self.assertEqual(rebuilt.get_grand_total_cents(), order.get_grand_total_cents())
+        self.assertEqual(rebuilt.get_receipt(), order.get_receipt())
+
+    def test_removed_options_are_set(self):
+        log = EventLog()
+        order = log.open_tab(1)
+        drink = Drink(Base.WATER, Size.SMALL)
+        drink.add_flavor(Flavor.MINT)
+        order.add_item(drink)
+        drink.set_flavors([Flavor.LEMON])
+        self.assertEqual(log._events[-5], OPTIONS_SET)
+        self.assertEqual(lines_of(log.get_state().get_open_tabs()[1]), lines_of(order))
+
+    def test_paid_and_voided_tabs_are_closed(self):
+        log = EventLog()
+        paid = fill(log, 1)
+        paid.pay()
+        fill(log, 2).void()
+        fill(log, 3)
+        state = log.get_state()
+        self.assertEqual(state.get_status(1), (PAID, paid.get_grand_total_cents()))
+        self.assertEqual(state.get_status(2), (VOIDED, 0))
+        self.assertIsNone(state.get_status(3))
+        self.assertEqual(list(state.get_open_tabs()), [3])
+
+    def test_undo_is_logged(self):
+        log = EventLog()
+        order = log.open_tab(1)
+        order.enable_undo()
+        ice_storm = IceStorm(IceStormFlavor.VANILLA_BEAN)
+        order.add_item(ice_storm, 2)
+        order.add_item(Food("corndog"))
+        order.undo()
+        order.undo()
+        order.redo()
+        self.assertEqual(lines_of(log.get_state().get_open_tabs()[1]), lines_of(order))
+
+    def test_recovery_replays_only_the_tail(self):
+        log = EventLog(self.directory, snapshot_every=4)
+        orders = {tab: fill(log, tab) for tab in range(3)}
+        orders[0].pay()
+        log.flush()
+        # a write cut short by a crash
+        with open(os.path.join(self.directory, "events.log"), "ab") as file:
+            file.write(b"\x01\x00\x00")
+        with open(os.path.join(self.directory, "snapshot.bin"), "rb") as file:
+            position = int.from_bytes(file.read(8), sys.byteorder)
+        self.assertEqual(position, len(log) - len(log) % 4)
+        recovered = EventLog.recover(self.directory, snapshot_every=4)
+        self.assertEqual(len(recovered), len(log))
+        tabs = recovered.get_state().get_open_tabs(recovered)
+        self.assertEqual(sorted(tabs), [1, 2])
+        for tab, order in tabs.items():
+            self.assertEqual(lines_of(order), lines_of(orders[tab]))
+        # recovered tabs go on logging on the same lines
+        tabs[1].add_item(DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY]))
+        tabs[1].add_item(Food("nacho_chips"))
+        recovered.flush()
+        again = EventLog.recover(self.directory).get_state().get_open_tabs()[1]
+        self.assertEqual(lines_of(again), lines_of(tabs[1]))
+        self.assertEqual(lines_of(again)[-1][0], 4)
+
+    def test_snapshot_round_trip(self):
+        log = EventLog()
+        for tab in range(5):
+            fill(log, tab)
+        log.open_tab(5).void()
+        state = log.get_state()
+        copy = TabState.from_bytes(state.to_bytes())
+        self.assertEqual(copy.get_tabs(), state.get_tabs())
+        self.assertEqual(copy.get_status(5), (VOIDED, 0))
+        with self.assertRaises(ValueError):
+            TabState.from_bytes(state.to_bytes()[:-24])
+
+    def test_tab_ids_are_checked(self):
+        with self.assertRaises(ValueError):
+            EventLog().open_tab(-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
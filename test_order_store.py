@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from Drink_Project import Food, IceStorm, Order, Base, Size, Flavor, IceStormFlavor, DrinkSpec
+from order_store import OrderStore, _DAILY_TOTALS, _SALES_BY_KIND, _OPTION_COUNTS
+
+
+def at(day):
+    return datetime(2026, 10, day, 9, 30, tzinfo=timezone.utc)
+
+
+def sample_order():
+    order = Order()
+    order.add_item(DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY, Flavor.LIME]), 2)
+    food = Food("hotdog")
+    food.add_topping("ketchup")
+    order.add_item(food)
+    ice_storm = IceStorm(IceStormFlavor.BANANA)
+    ice_storm.add_topping("pecans")
+    order.add_item(ice_storm, 3)
+    return order
+
+
+class TestOrderStore(unittest.TestCase):
+    """Test cases for the SQLite order store."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "orders.db")
+        self.store = OrderStore(self.path)
+        self.addCleanup(self.store.close)
+
+    def test_save_and_load(self):
+        order = sample_order()
+        self.store.save(1, order, at(1))
+        loaded = self.store.load_order(1)
+        self.assertEqual(loaded.get_lines(), [(item.get_spec(), quantity) for item, quantity in order.get_lines()])
+        self.assertIsNone(self.store.load_order(2))
+
+    def test_reports(self):
+        self.store.save_orders([(1, sample_order(), at(1)), (2, sample_order(), at(1)), (3, sample_order(), at(2))])
+        single = sample_order()
+        self.assertEqual(self.store.daily_totals("2026-10-01", "2026-10-01"),
+                         [("2026-10-01", 2, 12, 2 * single.get_subtotal_cents(), 2 * single.get_tax_cents())])
+        self.assertIn(("drink", "pokecola", 6, 6 * 205), self.store.sales_by_kind("2026-10-01", "2026-10-31"))
+        self.assertEqual(self.store.option_counts("drink", "2026-10-01", "2026-10-31"), [("cherry", 6), ("lime", 6)])
+        self.assertEqual(self.store.option_counts("ice storm", "2026-10-02", "2026-10-02"), [("pecans", 3)])
+
+    def test_batch_is_atomic(self):
+        self.store.save(1, sample_order(), at(1))
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.store.save_orders([(2, sample_order(), at(1)), (1, sample_order(), at(1))])
+        self.assertIsNone(self.store.load_order(2))
+
+    def test_wal_and_covering_indexes(self):
+        mode = self.store._connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+        for sql, parameters in ((_DAILY_TOTALS, ("a", "b")), (_SALES_BY_KIND, ("a", "b")),
+                                (_OPTION_COUNTS, ("drink", "a", "b"))):
+            self.assertTrue(any("COVERING INDEX" in step for step in self.store.explain(sql, parameters)),
+                            self.store.explain(sql, parameters))
+
+    def test_reads_during_writes(self):
+        self.store.save(1, sample_order(), at(1))
+        with OrderStore(self.path) as reader:
+            self.assertEqual(len(reader.daily_totals("2026-10-01", "2026-10-31")), 1)
+            self.store.save(2, Order(), at(3))
+            self.assertEqual(len(reader.daily_totals("2026-10-01", "2026-10-31")), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from Drink_Project import Drink, Food, Base, Size, Flavor
+from order_events import EventLog
+from order_wal import WriteAheadLog, SyncEachMutation, SyncEveryMilliseconds, SyncEveryRecords
+from test_order_events import lines_of
+
+
+def fill(log, tab, count=5):
+    order = log.open_tab(tab)
+    for i in range(count):
+        drink = Drink(list(Base)[i % len(Base)], Size.LARGE)
+        order.add_item(drink, i + 1)
+        drink.add_flavor(Flavor.MINT)
+        order.add_item(Food("hotdog"))
+    return order
+
+
+class CountingFile:
+    """wraps a file, recording the size of every write."""
+
+    def __init__(self, file):
+        self.file = file
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(len(data))
+        return self.file.write(data)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+class FailingFile(CountingFile):
+    """wraps a file whose writes fail, as on a full disk."""
+
+    def write(self, data):
+        raise OSError("No space left on device")
+
+
+class BrokenFile(CountingFile):
+    """wraps a file whose writes fail with an error other than OSError."""
+
+    def write(self, data):
+        raise RuntimeError("Broken file")
+
+
+class TestWriteAheadLog(unittest.TestCase):
+    """Test cases for the write-ahead log and its sync policies."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "wal")
+
+    def read(self):
+        with open(self.path, "rb") as file:
+            return file.read()
+
+    def test_each_mutation_is_on_disk_when_append_returns(self):
+        with WriteAheadLog(self.path, SyncEachMutation()) as wal:
+            self.assertEqual(wal.append(b"ab"), 1)
+            self.assertEqual(wal.append(b"cd"), 2)
+            self.assertEqual(wal.get_durable(), 2)
+            self.assertEqual(self.read(), b"abcd")
+
+    def test_every_records_syncs_in_batches(self):
+        wal = WriteAheadLog(self.path, SyncEveryRecords(3))
+        wal.append(b"a")
+        wal.append(b"b")
+        self.assertEqual(self.read(), b"")
+        wal.append(b"c")
+        self.assertEqual(self.read(), b"abc")
+        wal.append(b"d")
+        wal.close()
+        self.assertEqual(self.read(), b"abcd")
+        with self.assertRaises(ValueError):
+            wal.append(b"e")
+
+    def test_every_milliseconds_syncs_in_the_background(self):
+        with WriteAheadLog(self.path, SyncEveryMilliseconds(1)) as wal:
+            wal.append(b"a")
+            deadline = time.monotonic() + 5
+            while wal.get_durable() < 1 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            self.assertEqual(self.read(), b"a")
+
+    def test_concurrent_appends_share_syncs(self):
+        wal = WriteAheadLog(self.path, SyncEachMutation())
+        wal._file = counting = CountingFile(wal._file)
+
+        def register(number):
+            for _ in range(50):
+                wal.append(bytes([number]) * 4)
+        threads = [threading.Thread(target=register, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wal.close()
+        data = self.read()
+        self.assertEqual(len(data), 8 * 50 * 4)
+        self.assertEqual(sum(counting.writes), len(data))
+        for number in range(8):
+            self.assertEqual(data.count(bytes([number]) * 4), 50)
+        self.assertLessEqual(len(counting.writes), 8 * 50)
+
+    def test_a_failed_write_fails_the_log(self):
+        wal = WriteAheadLog(self.path, SyncEveryRecords(10))
+        file = wal._file
+        wal._file = FailingFile(file)
+        wal.append(b"A")
+        with self.assertRaises(OSError):
+            wal.sync()
+        wal._file = file  # the disk has room again, but record A is lost
+        with self.assertRaises(OSError):
+            wal.append(b"B")
+        with self.assertRaises(OSError):
+            wal.sync()
+        self.assertEqual(wal.get_durable(), 0)
+        with self.assertRaises(OSError):
+            wal.close()
+        self.assertEqual(self.read(), b"")
+
+    def test_a_failed_background_sync_fails_the_log_quietly(self):
+        unhandled = []
+        hook = threading.excepthook
+        threading.excepthook = unhandled.append
+        self.addCleanup(setattr, threading, "excepthook", hook)
+        wal = WriteAheadLog(self.path, SyncEveryMilliseconds(1))
+        file = wal._file
+        wal._file = BrokenFile(file)
+        wal.append(b"A")
+        wal._thread.join(5)
+        self.assertFalse(wal._thread.is_alive())
+        self.assertEqual(unhandled, [])
+        wal._file = file
+        with self.assertRaises(OSError):
+            wal.append(b"B")
+        with self.assertRaises(OSError):
+            wal.close()
+        self.assertEqual(self.read(), b"")
+
+    def test_policies_are_checked(self):
+        with self.assertRaises(ValueError):
+            SyncEveryRecords(0)
+        with self.assertRaises(ValueError):
+            SyncEveryMilliseconds(0)
+        with self.assertRaises(ValueError):
+            EventLog(sync=SyncEachMutation())
+
+    def test_open_tabs_survive_a_crash(self):
+        log = EventLog(self.directory, snapshot_every=7, sync=SyncEachMutation())
+        orders = {tab: fill(log, tab) for tab in range(4)}
+        orders[2].pay()
+        # the register dies without closing the log.
+        recovered = EventLog.recover(self.directory, snapshot_every=7, sync=SyncEachMutation())
+        tabs = recovered.get_state().get_open_tabs(recovered)
+        self.assertEqual(sorted(tabs), [0, 1, 3])
+        for tab, order in tabs.items():
+            self.assertEqual(lines_of(order), lines_of(orders[tab]))
+        tabs[0].add_item(Food("corndog"))
+        again = EventLog.recover(self.directory).get_state().get_open_tabs()
+        self.assertEqual(lines_of(again[0]), lines_of(tabs[0]))
+        recovered.close()
+        log.close()
+
+    def test_a_crash_loses_only_records_since_the_last_sync(self):
+        log = EventLog(self.directory, sync=SyncEveryRecords(4))
+        fill(log, 1, count=3)  # nine events, two synced batches
+        state = EventLog.recover(self.directory).get_state()
+        self.assertEqual(sum(units for _, _, units in state.get_tabs()[1]), 1 + 1 + 2 + 1 + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from Drink_Project import Order, get_menu, Base, Size, Flavor, IceStormFlavor, DrinkSpec, FoodSpec, IceStormSpec
+from pos_ingest import RowError, read_orders, read_file_parallel
+
+JSONL = "\n".join(json.dumps(row) for row in [
+    {"order": "A1", "kind": "drink", "item": "pokecola", "size": "medium", "options": ["cherry"], "quantity": 2},
+    {"order": "A1", "kind": "food", "item": "hotdog", "options": ["ketchup", "chili"]},
+    {"order": "A2", "kind": "ice storm", "item": "banana", "options": ["pecans"], "quantity": 3},
+    {"order": "A2", "kind": "drink", "item": "Mr. Salt", "size": "SMALL"},
+]) + "\n"
+
+CSV = """order,kind,item,size,options,quantity
+A1,drink,pokecola,medium,cherry,2
+A1,food,hotdog,,ketchup;chili,1
+A2,ice storm,banana,,pecans,3
+A2,drink,mr. salt,small,,
+"""
+
+
+class TestPosIngest(unittest.TestCase):
+    """Test cases for reading POS exports."""
+
+    def check_sample(self, orders):
+        self.assertEqual([order_id for order_id, _ in orders], ["A1", "A2"])
+        self.assertEqual(orders[0][1].get_lines(), [
+            (DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY]), 2),
+            (FoodSpec("hotdog", ["ketchup", "chili"]), 1)])
+        self.assertEqual(orders[1][1].get_lines(), [
+            (IceStormSpec(IceStormFlavor.BANANA, ["pecans"]), 3),
+            (DrinkSpec(Base.MR_SALT, Size.SMALL), 1)])
+
+    def test_jsonl(self):
+        self.check_sample(list(read_orders(io.StringIO(JSONL))))
+
+    def test_csv(self):
+        self.check_sample(list(read_orders(io.StringIO(CSV), format="csv")))
+
+    def test_small_chunks(self):
+        self.check_sample(list(read_orders(io.StringIO(CSV), format="csv", chunk_size=1)))
+
+    def test_as_skus(self):
+        (_, skus), _ = read_orders(io.StringIO(JSONL), as_skus=True)
+        self.assertEqual(Order.from_skus(skus).get_subtotal_cents(), 2 * 190 + 290)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        text = CSV + "A3,drink,pokecola,medium,cheery,1\nA3,food,pizza,,,1\nA3,food,hotdog,,,0\n" \
+                     "A3,food,corndog,,,1\nA3,food\n"
+        errors = []
+        orders = list(read_orders(io.StringIO(text), format="csv", errors=errors))
+        self.assertEqual(orders[2][1].get_lines(), [(FoodSpec("corndog"), 1)])
+        self.assertEqual(errors, [
+            RowError(6, "unknown flavor 'cheery'"),
+            RowError(7, "unknown food type 'pizza'"),
+            RowError(8, "quantity must be at least 1, not 0"),
+            RowError(10, "expected 6 fields, found 2")])
+
+    def test_bad_json_rows(self):
+        text = '{"order": 1, "kind": "food"}\nnot json\n[1]\n\n{"order": 1, "kind": "food", "item": "hotdog"}\n'
+        errors = []
+        orders = list(read_orders(io.StringIO(text), errors=errors))
+        self.assertEqual(len(orders), 1)
+        self.assertEqual([error.row for error in errors], [1, 2, 3])
+        self.assertEqual(errors[0].message, "missing field 'item'")
+
+    def test_rows_off_the_menu_are_reported(self):
+        menu = get_menu().revise(food_toppings={"ketchup": 0}, bases=set(Base) - {Base.MR_SALT})
+        errors = []
+        orders = dict(read_orders(io.StringIO(JSONL), errors=errors, menu=menu))
+        self.assertEqual([error.row for error in errors], [2, 4])
+        self.assertIn(f"menu version {menu.get_version()}", errors[0].message)
+        self.assertEqual(orders["A1"].get_menu_version(), menu.get_version())
+        self.assertEqual(orders["A2"].get_num_items(), 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rows.jsonl")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(JSONL)
+            parallel_errors = []
+            parallel = list(read_file_parallel(path, errors=parallel_errors, processes=2, menu=menu))
+        self.assertEqual(parallel_errors, errors)
+        self.assertEqual([order.get_subtotal_cents() for _, order in parallel],
+                         [order.get_subtotal_cents() for order in orders.values()])
+
+    def test_csv_needs_header(self):
+        with self.assertRaises(ValueError):
+            list(read_orders(io.StringIO("a,b\n"), format="csv"))
+
+    def test_parallel_matches_serial(self):
+        rows = []
+        for number in range(300):
+            rows.append(f"O{number // 7},drink,sprite,large,lime;mint,{number % 3 + 1}\n")
+            if number % 50 == 0:
+                rows.append(f"O{number // 7},food,nope,,,1\n")
+        text = "order,kind,item,size,options,quantity\n" + "".join(rows)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.csv")
+            with open(path, "w") as file:
+                file.write(text)
+            serial_errors, parallel_errors = [], []
+            serial = list(read_orders(io.StringIO(text), format="csv", errors=serial_errors, as_skus=True))
+            parallel = list(read_file_parallel(path, format="csv", errors=parallel_errors,
+                                               as_skus=True, processes=4))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel_errors, serial_errors)
+        self.assertEqual(len(serial_errors), 6)
+
+if __name__ == '__main__':
+    unittest.main()
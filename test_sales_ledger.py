@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from Drink_Project import Drink, Order, Base, Size, Flavor, DrinkSpec, FoodSpec, get_menu, publish_menu
+from sales_ledger import SalesLedger, SALE, REFUND, VOID
+
+
+def make_order(cups):
+    order = Order()
+    order.add_item(DrinkSpec(Base.SPRITE, Size.LARGE, [Flavor.LIME]), cups)
+    order.add_item(FoodSpec("corndog", ["mustard"]))
+    return order
+
+
+def at(day, hour=12):
+    return datetime(2026, 10, day, hour, tzinfo=timezone.utc)
+
+
+class TestSalesLedger(unittest.TestCase):
+    """Test cases for the day-partitioned sales ledger."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.ledger = SalesLedger(self.directory.name)
+
+    def test_append_and_scan(self):
+        order = make_order(3)
+        drink = Drink(Base.WATER, Size.SMALL)
+        order.add_item(drink)
+        self.ledger.append(1, order, when=at(1))
+        self.ledger.append(2, make_order(1), when=at(1, 18))
+        self.ledger.append(3, make_order(2), when=at(2))
+        records = list(self.ledger.scan("2026-10-01"))
+        self.assertEqual([record.get_order_id() for record in records], [1, 2])
+        first = records[0]
+        self.assertEqual(first.get_kind(), SALE)
+        self.assertEqual(first.get_time(), at(1))
+        self.assertEqual(first.get_grand_total_cents(), order.get_grand_total_cents())
+        self.assertEqual(first.get_lines(), [(item.get_sku(), quantity, order.get_unit_cents(item))
+                                             for item, quantity in order.get_lines()])
+        self.assertEqual(first.to_order().get_subtotal_cents(), order.get_subtotal_cents())
+        self.assertEqual(self.ledger.get_days(), ["2026-10-01", "2026-10-02"])
+
+    def test_refund_and_void_lookups(self):
+        sale = make_order(4)
+        self.ledger.append(10, sale, when=at(3))
+        self.ledger.append(11, make_order(1), when=at(3))
+        partial = Order()
+        partial.add_item(DrinkSpec(Base.SPRITE, Size.LARGE, [Flavor.LIME]))
+        refund = self.ledger.refund(20, 10, partial, when=at(4))
+        void = self.ledger.void(21, 11, when=at(4))
+        self.assertEqual(refund.get_reference(), 10)
+        self.assertEqual(refund.get_kind(), REFUND)
+        self.assertEqual(self.ledger.find(21).get_kind(), VOID)
+        self.assertEqual(self.ledger.find(10).get_order_id(), 10)
+        self.assertIsNone(self.ledger.find(99))
+        with self.assertRaises(ValueError):
+            self.ledger.refund(22, 20)
+        with self.assertRaises(ValueError):
+            self.ledger.append(10, sale, when=at(4))
+        summary = self.ledger.summarize("2026-10-04")
+        self.assertEqual(summary["refunds"]["records"], 1)
+        self.assertEqual(summary["voids"]["subtotal"], make_order(1).get_subtotal_cents())
+        self.assertEqual(summary["net"], -(partial.get_grand_total_cents() + void.get_grand_total_cents()))
+
+    def test_voids_reverse_what_was_charged(self):
+        served = get_menu()
+        self.addCleanup(lambda: publish_menu(served.revise(version=get_menu().get_version() + 1)))
+        sale = self.ledger.append(1, make_order(2), when=at(5))
+        publish_menu(served.revise(size_costs={Size.SMALL: 999}, food_prices={"hotdog": 230}))
+        void = self.ledger.void(2, 1, when=at(5))
+        self.assertEqual(void.get_lines(), sale.get_lines())
+        self.assertEqual(void.get_grand_total_cents(), sale.get_grand_total_cents())
+        self.assertEqual(self.ledger.summarize("2026-10-05")["net"], 0)
+
+    def test_sales_are_reversed_at_most_once(self):
+        sale = make_order(3)
+        self.ledger.append(1, sale, when=at(6))
+        self.ledger.void(2, 1, when=at(6))
+        with self.assertRaises(ValueError):
+            self.ledger.void(3, 1, when=at(6))
+        self.ledger.append(4, sale, when=at(6))
+        one = Order()
+        one.add_item(DrinkSpec(Base.SPRITE, Size.LARGE, [Flavor.LIME]), 2)
+        self.ledger.refund(5, 4, one, when=at(7))
+        reopened = SalesLedger(self.directory.name)
+        with self.assertRaises(ValueError):
+            reopened.refund(6, 4, one, when=at(7))
+        with self.assertRaises(ValueError):
+            reopened.void(6, 4, when=at(7))
+        with self.assertRaises(ValueError):
+            reopened.void(6, 1, when=at(7))
+        self.assertIsNone(reopened.find(6))
+
+    def test_reopen_uses_sidecar_index(self):
+        self.ledger.append(5, make_order(1), when=at(5))
+        self.ledger.append(6, make_order(2), when=at(5))
+        reopened = SalesLedger(self.directory.name)
+        self.assertEqual(reopened.find(6).get_subtotal_cents(), make_order(2).get_subtotal_cents())
+
+    def test_crash_recovery(self):
+        self.ledger.append(1, make_order(1), when=at(6))
+        self.ledger.append(2, make_order(2), when=at(6))
+        path = os.path.join(self.directory.name, "2026-10-06")
+        with open(path + ".index", "r+b") as sidecar:
+            sidecar.truncate(20)  # the second entry and half the first never reached the disk
+        with open(path + ".ledger", "ab") as data:
+            data.write(b"LR\x01")  # a record cut short
+        reopened = SalesLedger(self.directory.name)
+        self.assertEqual(reopened.find(2).get_order_id(), 2)
+        self.assertEqual(len(list(reopened.scan("2026-10-06"))), 2)
+        reopened.append(3, make_order(3), when=at(6))
+        self.assertEqual([r.get_order_id() for r in SalesLedger(self.directory.name).scan("2026-10-06")], [1, 2, 3])
+
+    def test_compaction_and_retention(self):
+        self.ledger.append(1, make_order(1), when=datetime(2026, 8, 30, tzinfo=timezone.utc))
+        self.ledger.append(2, make_order(1), when=at(1))
+        self.ledger.append(3, make_order(2), when=at(2))
+        self.ledger.append(4, make_order(3), when=at(15))
+        archived, deleted = self.ledger.compact(keep_days=7, today=date(2026, 10, 16))
+        self.assertEqual(archived, ["2026-08-30", "2026-10-01", "2026-10-02"])
+        self.assertEqual(deleted, [])
+        names = sorted(os.listdir(self.directory.name))
+        self.assertEqual(names, ["2026-10-15.index", "2026-10-15.ledger", "archive-2026-08.zip",
+                                 "archive-2026-10.zip"])
+        reopened = SalesLedger(self.directory.name)
+        self.assertEqual(reopened.find(3).get_subtotal_cents(), make_order(2).get_subtotal_cents())
+        self.assertEqual([r.get_order_id() for r in reopened.scan("2026-10-01")], [2])
+        self.assertEqual(reopened.summarize("2026-10-02")["sales"]["records"], 1)
+        _, deleted = reopened.compact(retain_days=30, today=date(2026, 10, 16))
+        self.assertEqual(deleted, ["2026-08"])
+        self.assertIsNone(reopened.find(1))
+        self.assertIsNotNone(reopened.find(2))
+
+if __name__ == '__main__':
+    unittest.main()
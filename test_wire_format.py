@@ -0,0 +1,114 @@
+import json
+import unittest
+from Drink_Project import (Drink, Food, IceStorm, Order, Base, Size, Flavor, IceStormFlavor,
+                           DrinkSpec, FoodSpec)
+from wire_format import (HEADER_SIZE, ORDER, RECEIPT, decode_order, decode_receipt, encode_order,
+                         encode_order_into, encode_receipt, encode_receipt_into, read_header, read_receipt,
+                         read_menu_version, _varint)
+
+
+def sample_order():
+    order = Order()
+    order.add_item(DrinkSpec(Base.POKEACOLA, Size.MEDIUM, [Flavor.CHERRY, Flavor.LIME]), 300)
+    food = Food("nacho_chips")
+    food.add_topping("chili")
+    order.add_item(food, 2)
+    ice_storm = IceStorm(IceStormFlavor.SMORE)
+    ice_storm.add_topping("storios")
+    order.add_item(ice_storm)
+    order.add_item(Drink(Base.MR_SALT, Size.MEGA))
+    return order
+
+
+class TestWireFormat(unittest.TestCase):
+    """Test cases for the binary order and receipt encoding."""
+
+    def test_order_round_trip(self):
+        order = sample_order()
+        decoded = decode_order(encode_order(order))
+        self.assertEqual(decoded.get_lines(), [(item.get_spec(), quantity) for item, quantity in order.get_lines()])
+        self.assertEqual(decoded.get_grand_total_cents(), order.get_grand_total_cents())
+
+    def test_receipt_matches_json(self):
+        for order in (sample_order(), Order()):
+            self.assertEqual(decode_receipt(encode_receipt(order)), json.loads(json.dumps(order.get_receipt())))
+        order = sample_order()
+        self.assertLess(len(encode_receipt(order)), len(json.dumps(order.get_receipt())) // 10)
+
+    def test_receipt_keeps_charged_prices(self):
+        order = Order()
+        drink = Drink(Base.WATER, Size.SMALL)
+        order.add_item(drink)
+        receipt = order.get_receipt()
+        try:
+            Drink.set_prices(size_costs={Size.SMALL: 999})
+            self.assertEqual(decode_receipt(encode_receipt(order)), receipt)
+        finally:
+            Drink.set_prices(size_costs={Size.SMALL: 150})
+
+    def test_read_receipt(self):
+        order = sample_order()
+        lines, subtotal, tax = read_receipt(encode_receipt(order))
+        self.assertEqual(lines, [(item.get_spec(), quantity, order.get_unit_cents(item))
+                                 for item, quantity in order.get_lines()])
+        self.assertEqual((subtotal, tax), (order.get_subtotal_cents(), order.get_tax_cents()))
+
+    def test_header(self):
+        message = encode_order(sample_order())
+        self.assertEqual(message[:2], b"PD")
+        self.assertEqual(read_header(message), (ORDER, len(message) - HEADER_SIZE))
+
+    def test_receipt_menu_version(self):
+        order = sample_order()
+        message = encode_receipt(order)
+        self.assertEqual(read_menu_version(message), order.get_menu_version())
+        # a version 1 receipt is the same without the menu version.
+        cut = len(_varint(order.get_menu_version()))
+        old = b"PD\x01" + message[3:4] + (len(message) - HEADER_SIZE - cut).to_bytes(4, "little") \
+            + message[HEADER_SIZE:-cut]
+        self.assertIsNone(read_menu_version(old))
+        self.assertEqual(read_receipt(old), read_receipt(message))
+        with self.assertRaises(ValueError):
+            read_header(b"PD\x03" + message[3:])
+
+    def test_into_buffer_and_memoryview(self):
+        order = sample_order()
+        buffer = bytearray(1024)
+        middle = encode_order_into(order, buffer, 10)
+        end = encode_receipt_into(order, buffer, middle)
+        view = memoryview(buffer)
+        self.assertEqual(read_header(view, middle)[0], RECEIPT)
+        self.assertEqual(decode_order(view, 10).get_subtotal_cents(), order.get_subtotal_cents())
+        self.assertEqual(decode_receipt(view, middle), order.get_receipt())
+        self.assertEqual(end - middle, len(encode_receipt(order)))
+        with self.assertRaises(ValueError):
+            encode_order_into(order, bytearray(HEADER_SIZE + 3))
+
+    def test_large_numbers(self):
+        order = Order()
+        order.add_item(FoodSpec("hotdog"), 10 ** 9)
+        self.assertEqual(decode_receipt(encode_receipt(order)), order.get_receipt())
+
+    def test_bad_messages(self):
+        message = encode_receipt(sample_order())
+        short = bytearray(message)
+        short[HEADER_SIZE - 4] -= 1  # a payload length one byte short of the lines and totals
+        for bad in (message[:5], message[:-1], b"XX" + message[2:], message[:2] + b"\x09" + message[3:],
+                    bytes(short[:-1])):
+            with self.assertRaises(ValueError):
+                decode_receipt(bad)
+        with self.assertRaises(ValueError):
+            decode_order(message)
+
+    def test_wrong_tax_is_rejected(self):
+        order = sample_order()
+        message = encode_receipt(order)
+        cut = len(_varint(order.get_tax_cents())) + len(_varint(order.get_menu_version()))
+        wrong = _varint(order.get_tax_cents() + 1)
+        self.assertEqual(len(wrong), cut - len(_varint(order.get_menu_version())))
+        bad = message[:-cut] + wrong + _varint(order.get_menu_version())
+        with self.assertRaises(ValueError):
+            read_receipt(bad)
+
+if __name__ == '__main__':
+    unittest.main()
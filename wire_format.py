@@ -0,0 +1,251 @@
+"""A compact, versioned binary encoding of orders and receipts.
+
+Every message starts with a fixed 8-byte header: the magic b"PD", the
+format version, the message type (ORDER or RECEIPT) and the payload length
+as a little-endian uint32. An order payload holds the number of lines and
+then the SKU and quantity of every line. A receipt payload also holds every
+line's unit price, then the subtotal and tax, all in integer cents, and
+since version 2 the version of the menu the order was priced with. Numbers
+are unsigned LEB128 varints, so a quantity or price under 128 takes a byte.
+Version 1 messages can still be read; their receipts have no menu version.
+
+Encoders can write straight into a caller's buffer (encode_*_into), and
+decoders read any bytes-like object through a memoryview, without copying
+the message out of it.
+"""
+import struct
+from functools import lru_cache
+
+from Drink_Project import Order, decode_sku, tax_cents, to_dollars, serialize_line
+
+MAGIC = b"PD"
+VERSION = 2
+_READABLE_VERSIONS = (1, 2)
+ORDER = 1
+RECEIPT = 2
+_HEADER = struct.Struct("<2sBBI")
+HEADER_SIZE = _HEADER.size
+
+
+@lru_cache(maxsize=1 << 12)
+def _varint(value):
+    """returns the LEB128 bytes of a non-negative int; SKUs and prices repeat, so they are cached."""
+    if value < 0:
+        raise ValueError(f"Cannot encode negative number {value}.")
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(view, offset):
+    """returns the varint at offset in a memoryview and the offset after it."""
+    byte = view[offset]
+    if byte < 0x80:
+        return byte, offset + 1
+    result = byte & 0x7F
+    shift = 7
+    while True:
+        offset += 1
+        byte = view[offset]
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset + 1
+        shift += 7
+        if shift > 63:
+            raise ValueError("Varint is too long.")
+
+
+def _order_pieces(order):
+    lines = order.get_lines()
+    pieces = [_varint(len(lines))]
+    for item, quantity in lines:
+        pieces.append(_varint(item.get_sku()))
+        pieces.append(_varint(quantity))
+    return pieces
+
+
+def _receipt_pieces(order):
+    lines = order.get_lines()
+    pieces = [_varint(len(lines))]
+    for item, quantity in lines:
+        pieces.append(_varint(item.get_sku()))
+        pieces.append(_varint(quantity))
+        pieces.append(_varint(order.get_unit_cents(item)))
+    pieces.append(_varint(order.get_subtotal_cents()))
+    pieces.append(_varint(order.get_tax_cents()))
+    pieces.append(_varint(order.get_menu_version()))
+    return pieces
+
+
+def _write(message_type, pieces, buffer, offset):
+    """writes a header and the payload pieces into buffer at offset, returning the end offset."""
+    length = sum(map(len, pieces))
+    view = _byte_view(buffer)
+    if offset + HEADER_SIZE + length > len(view):
+        raise ValueError(f"Buffer too small: the message needs {HEADER_SIZE + length} bytes.")
+    _HEADER.pack_into(view, offset, MAGIC, VERSION, message_type, length)
+    position = offset + HEADER_SIZE
+    for piece in pieces:
+        end = position + len(piece)
+        view[position:end] = piece
+        position = end
+    return position
+
+
+def _encode(message_type, pieces):
+    buffer = bytearray(HEADER_SIZE + sum(map(len, pieces)))
+    _write(message_type, pieces, buffer, 0)
+    return buffer
+
+
+def encode_order(order):
+    """returns an order's lines as an ORDER message, in a new bytearray."""
+    return _encode(ORDER, _order_pieces(order))
+
+
+def encode_order_into(order, buffer, offset=0):
+    """writes an ORDER message into a writable buffer at offset, returning the offset after it."""
+    return _write(ORDER, _order_pieces(order), buffer, offset)
+
+
+def encode_receipt(order):
+    """returns an order's receipt, with the prices it charged, as a RECEIPT message in a new bytearray."""
+    return _encode(RECEIPT, _receipt_pieces(order))
+
+
+def encode_receipt_into(order, buffer, offset=0):
+    """writes a RECEIPT message into a writable buffer at offset, returning the offset after it."""
+    return _write(RECEIPT, _receipt_pieces(order), buffer, offset)
+
+
+def _byte_view(buffer):
+    view = memoryview(buffer)
+    return view if view.format == "B" else view.cast("B")
+
+
+def read_header(buffer, offset=0):
+    """returns the (message type, payload length) of the message at offset.
+
+    the message ends at offset + HEADER_SIZE + length. raises ValueError for
+    a bad magic, an unknown version or a truncated message.
+    """
+    _, message_type, length = _read_header(buffer, offset)
+    return message_type, length
+
+
+def _read_header(buffer, offset):
+    view = _byte_view(buffer)
+    if offset + HEADER_SIZE > len(view):
+        raise ValueError("Truncated message header.")
+    magic, version, message_type, length = _HEADER.unpack_from(view, offset)
+    if magic != MAGIC:
+        raise ValueError(f"Not an order message: bad magic {bytes(magic)!r}.")
+    if version not in _READABLE_VERSIONS:
+        raise ValueError(f"Unsupported message version {version}.")
+    if offset + HEADER_SIZE + length > len(view):
+        raise ValueError("Truncated message payload.")
+    return version, message_type, length
+
+
+def _payload(buffer, offset, expected_type):
+    """returns the version and a memoryview of the payload of the message at offset, checking its type."""
+    version, message_type, length = _read_header(buffer, offset)
+    if message_type != expected_type:
+        raise ValueError(f"Expected message type {expected_type}, found {message_type}.")
+    start = offset + HEADER_SIZE
+    return version, _byte_view(buffer)[start:start + length]
+
+
+def _read_lines(view, with_cents):
+    """returns a list of (spec, quantity, unit cents or None), one per line, and the offset after them."""
+    count, position = _read_varint(view, 0)
+    lines = []
+    for _ in range(count):
+        sku, position = _read_varint(view, position)
+        quantity, position = _read_varint(view, position)
+        cents = None
+        if with_cents:
+            cents, position = _read_varint(view, position)
+        if not quantity:
+            raise ValueError("Line quantity must be at least 1.")
+        lines.append((decode_sku(sku), quantity, cents))
+    return lines, position
+
+
+@lru_cache(maxsize=1 << 12)
+def _line_template(spec, unit_cents):
+    """returns the receipt entry of one unit of a spec; receipts repeat lines, so they are cached."""
+    return serialize_line(spec, 1, unit_cents)
+
+
+def _receipt_entry(spec, quantity, unit_cents):
+    entry = _line_template(spec, unit_cents).copy()
+    for name, value in entry.items():
+        if type(value) is list:
+            entry[name] = value.copy()
+    entry["quantity"] = quantity
+    entry["line_total"] = to_dollars(unit_cents * quantity)
+    return entry
+
+
+def decode_order(buffer, offset=0):
+    """returns an Order holding the specs of the ORDER message at offset, priced from the menu."""
+    _, view = _payload(buffer, offset, ORDER)
+    try:
+        lines, position = _read_lines(view, False)
+    except IndexError:
+        raise ValueError("Truncated order payload.") from None
+    if position != len(view):
+        raise ValueError("Order payload has trailing bytes.")
+    order = Order()
+    for spec, quantity, _ in lines:
+        order.add_item(spec, quantity)
+    return order
+
+
+def read_receipt(buffer, offset=0):
+    """returns the RECEIPT message at offset as (lines, subtotal cents, tax cents).
+
+    lines is a list of (spec, quantity, unit cents). this skips building
+    receipt dicts, for readers that only need the numbers.
+    """
+    return _read_receipt(buffer, offset)[:3]
+
+
+def read_menu_version(buffer, offset=0):
+    """returns the menu version of the RECEIPT message at offset, None for a version 1 message."""
+    return _read_receipt(buffer, offset)[3]
+
+
+def _read_receipt(buffer, offset):
+    version, view = _payload(buffer, offset, RECEIPT)
+    menu_version = None
+    try:
+        lines, position = _read_lines(view, True)
+        subtotal, position = _read_varint(view, position)
+        tax, position = _read_varint(view, position)
+        if version >= 2:
+            menu_version, position = _read_varint(view, position)
+    except IndexError:
+        raise ValueError("Truncated receipt payload.") from None
+    if position != len(view):
+        raise ValueError("Receipt payload has trailing bytes.")
+    if subtotal != sum(cents * quantity for _, quantity, cents in lines) or tax != tax_cents(subtotal):
+        raise ValueError("Receipt totals do not match its lines.")
+    return lines, subtotal, tax, menu_version
+
+
+def decode_receipt(buffer, offset=0):
+    """returns the RECEIPT message at offset in the form of Order.get_receipt()."""
+    lines, subtotal, tax, menu_version = _read_receipt(buffer, offset)
+    return {
+        "number_drinks": sum(quantity for _, quantity, _ in lines),
+        "drinks": [_receipt_entry(spec, quantity, cents) for spec, quantity, cents in lines],
+        "subtotal": to_dollars(subtotal),
+        "tax": to_dollars(tax),
+        "grand_total": to_dollars(subtotal + tax),
+        "menu_version": menu_version
+    }